@@ -0,0 +1,125 @@
+"""
+Admission control in front of the LLM backend
+Bounds concurrent calls and queued waiters, and rejects fast when saturated
+"""
+
+import asyncio
+import math
+import statistics
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, Optional
+
+# Used for Retry-After until a real service time has been observed
+DEFAULT_SERVICE_SECONDS = 30.0
+
+_USE_DEFAULT = object()
+
+
+class Overloaded(Exception):
+    """The work queue is full; the caller should retry after `retry_after` seconds"""
+
+    status_code = 429
+
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class DeadlineExceeded(Overloaded):
+    """The request waited in the queue past its deadline"""
+
+    status_code = 503
+
+
+class AdmissionController:
+    """Concurrency limit plus a bounded wait queue with per-request deadlines"""
+
+    def __init__(self, max_concurrency: int = 2, max_queue: int = 16, deadline: Optional[float] = 30.0):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.deadline = deadline
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+
+        self.in_flight = 0
+        self.queued = 0
+        self.peak_queued = 0
+        self.admitted = 0
+        self.rejected_full = 0
+        self.rejected_deadline = 0
+        self._waits = deque(maxlen=1000)
+        self._service_ewma: Optional[float] = None
+
+    def retry_after(self) -> int:
+        """Seconds until a slot is likely to free up, from the current backlog"""
+        service = self._service_ewma or DEFAULT_SERVICE_SECONDS
+        backlog = (self.queued + self.in_flight) / self.max_concurrency
+        return max(1, math.ceil(service * max(backlog, 1.0)))
+
+    def saturated(self) -> bool:
+        """True when every slot is busy and the wait queue is full"""
+        return self.in_flight >= self.max_concurrency and self.queued >= self.max_queue
+
+    def check(self):
+        """Raise Overloaded now if a new request could not even be queued"""
+        if self.saturated():
+            self.rejected_full += 1
+            raise Overloaded(
+                f"LLM backend saturated ({self.in_flight} running, {self.queued} queued)",
+                self.retry_after(),
+            )
+
+    @asynccontextmanager
+    async def slot(self, deadline=_USE_DEFAULT) -> AsyncIterator[None]:
+        """Hold one backend slot; waits at most `deadline` seconds in the queue"""
+        self.check()
+        timeout = self.deadline if deadline is _USE_DEFAULT else deadline
+
+        start = time.monotonic()
+        if not self._semaphore.locked():
+            # Free slot: take it without entering the queue
+            await self._semaphore.acquire()
+        else:
+            self.queued += 1
+            self.peak_queued = max(self.peak_queued, self.queued)
+            try:
+                if timeout is None:
+                    await self._semaphore.acquire()
+                else:
+                    await asyncio.wait_for(self._semaphore.acquire(), timeout)
+            except asyncio.TimeoutError:
+                self.rejected_deadline += 1
+                raise DeadlineExceeded(f"Waited more than {timeout}s for an LLM slot", self.retry_after())
+            finally:
+                self.queued -= 1
+
+        self._waits.append(time.monotonic() - start)
+        self.admitted += 1
+        self.in_flight += 1
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+            self._semaphore.release()
+            elapsed = time.monotonic() - started
+            self._service_ewma = elapsed if self._service_ewma is None else 0.8 * self._service_ewma + 0.2 * elapsed
+
+    def stats(self) -> Dict:
+        """Queue depth and wait-time metrics for sizing hardware"""
+        waits = sorted(self._waits)
+        return {
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "deadline": self.deadline,
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "peak_queued": self.peak_queued,
+            "admitted": self.admitted,
+            "rejected_full": self.rejected_full,
+            "rejected_deadline": self.rejected_deadline,
+            "wait_mean_s": statistics.fmean(waits) if waits else 0.0,
+            "wait_p95_s": waits[int(0.95 * (len(waits) - 1))] if waits else 0.0,
+            "service_ewma_s": self._service_ewma,
+        }
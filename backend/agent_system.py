@@ -4,11 +4,12 @@ Agent with RAG tool (Qdrant embeddings) + Web tool (Tavily) + Cohere tools
 """
 
 import os
-import json
 from typing import Dict, List, Optional, Any
 from dotenv import load_dotenv
 import openai
+from pydantic import ValidationError
 from rag_system import get_rag_context, initialize_rag_system
+from mcq_schema import parse_mcq_strict
 
 # Load environment variables
 load_dotenv()
@@ -34,9 +35,11 @@ client = openai.OpenAI()
 class NPTEAgent:
     """Agent with tool-belt for NPTE MCQ generation"""
     
-    def __init__(self):
+    def __init__(self, max_attempts: int = 3):
         self.rag_system = initialize_rag_system()
         self.conversation_history = []
+        # LLM calls allowed per MCQ before returning the fallback
+        self.max_attempts = max_attempts
         
         # ============================================================================
         # PLACEHOLDER: Initialize Cohere tools
@@ -187,54 +190,36 @@ class NPTEAgent:
             "Use the provided context to create accurate, relevant questions. "
             "Return ONLY a JSON object with this exact format: {\"question\": \"Clinical scenario with question?\", "
             "\"choices\": [\"A. First choice\", \"B. Second choice\", \"C. Third choice\", \"D. Fourth choice\"], \"correct\": 2, "
-            "\"explanations\": {0: \"Why A is wrong\", 1: \"Why B is wrong\", 2: \"Why C is correct\", 3: \"Why D is wrong\"}, "
-            "\"links\": {0: [\"https://...\"], 1: [\"https://...\"], 2: [\"https://...\"], 3: [\"https://...\"]}}. "
+            "\"explanations\": {\"0\": \"Why A is wrong\", \"1\": \"Why B is wrong\", \"2\": \"Why C is correct\", \"3\": \"Why D is wrong\"}, "
+            "\"links\": {\"0\": [\"https://...\"], \"1\": [\"https://...\"], \"2\": [\"https://...\"], \"3\": [\"https://...\"]}}. "
             "Use A, B, C, D format for choices. 'correct' is 0-based index (0=A, 1=B, 2=C, 3=D). "
             "Explanations should be detailed clinical reasoning. Links should be relevant medical resources."
         )
         
         user_prompt = f"Topic: {topic}\n\nContext:\n{context}\n\nGenerate an MCQ as described."
         
-        try:
-            response = client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt}
-                ],
-                max_tokens=800,
-                temperature=0.7,
-            )
-            
-            content = response.choices[0].message.content.strip()
-            
-            # Parse JSON response
+        for attempt in range(1, self.max_attempts + 1):
             try:
-                start_idx = content.find('{')
-                end_idx = content.rfind('}') + 1
-                if start_idx != -1 and end_idx > start_idx:
-                    json_str = content[start_idx:end_idx]
-                    mcq_data = json.loads(json_str)
-                    
-                    question = mcq_data.get("question", "")
-                    choices = mcq_data.get("choices", [])
-                    correct = mcq_data.get("correct", 0)
-                    explanations = mcq_data.get("explanations", {})
-                    links = mcq_data.get("links", {})
-                    
-                    if isinstance(choices, list) and len(choices) == 4:
-                        return {
-                            "question": question,
-                            "choices": choices,
-                            "correct": correct,
-                            "explanations": explanations,
-                            "links": links
-                        }
-            except Exception as e:
-                print(f"JSON parsing failed: {e}")
+                response = client.chat.completions.create(
+                    model="gpt-3.5-turbo",
+                    messages=[
+                        {"role": "system", "content": system_prompt},
+                        {"role": "user", "content": user_prompt}
+                    ],
+                    max_tokens=800,
+                    temperature=0.7,
+                    response_format={"type": "json_object"},
+                )
                 
-        except Exception as e:
-            print(f"LLM call failed: {e}")
+                content = response.choices[0].message.content
+                
+                # Single-pass strict parse; a drifted answer spends one attempt
+                return parse_mcq_strict(content)
+                
+            except ValidationError as e:
+                print(f"Attempt {attempt}/{self.max_attempts}: MCQ failed schema validation ({e.error_count()} errors)")
+            except Exception as e:
+                print(f"LLM call failed: {e}")
         
         # Fallback
         return self._get_fallback_mcq(topic)
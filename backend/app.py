@@ -1,7 +1,8 @@
 import os
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import BaseModel, Field
 from random import randint
 import openai
 from dotenv import load_dotenv
@@ -12,6 +13,9 @@ from typing import Dict, List, Optional
 
 # Import agent system
 from ollama_agent import get_ollama_agent
+from mcq_pool import MCQPool
+from admission import AdmissionController, Overloaded
+from mcq_schema import MCQGenerationError
 from fastapi import HTTPException
 
 load_dotenv()  # Load .env file
@@ -44,6 +48,7 @@ app.add_middleware(
 
 class PromptRequest(BaseModel):
     prompt: str
+    session_id: Optional[str] = None
 
 class MCQResponse(BaseModel):
     question: str
@@ -52,6 +57,13 @@ class MCQResponse(BaseModel):
     explanations: dict
     links: dict
 
+class BatchPromptRequest(BaseModel):
+    prompt: str
+    count: int = Field(default=5, ge=1, le=10)
+
+class BatchMCQResponse(BaseModel):
+    questions: list[MCQResponse]
+
 # Removed AnswerRequest and AnswerValidationResponse classes - no longer needed
 
 class DocumentUploadResponse(BaseModel):
@@ -66,16 +78,39 @@ user_progress: Dict[str, Dict] = {}  # topic -> {correct_count, total_count, mas
 
 # Initialize agent
 agent = None
+mcq_pool = None
 
 @app.on_event("startup")
 async def startup_event():
     """Initialize agent and RAG system on startup"""
-    global agent
+    global agent, mcq_pool
     try:
-        # Initialize Ollama agent
-        agent = get_ollama_agent()
+        # Initialize Ollama agent behind a bounded admission queue
+        deadline = float(os.getenv("LLM_QUEUE_DEADLINE", "30"))
+        hedge_percentile = float(os.getenv("OLLAMA_HEDGE_PERCENTILE", "0"))
+        agent = get_ollama_agent(
+            base_urls=[url.strip() for url in os.getenv("OLLAMA_BASE_URLS", "http://localhost:11434").split(",") if url.strip()],
+            hedge_percentile=hedge_percentile if hedge_percentile > 0 else None,
+            admission=AdmissionController(
+                max_concurrency=int(os.getenv("LLM_MAX_CONCURRENCY", "2")),
+                max_queue=int(os.getenv("LLM_MAX_QUEUE", "16")),
+                deadline=deadline if deadline > 0 else None,
+            )
+        )
+        agent.start_health_checks()
         print("✅ Ollama agent system initialized successfully")
         
+        # Warm per-topic MCQ pools; the agent is the producer
+        mcq_pool = MCQPool(
+            agent,
+            depth=int(os.getenv("MCQ_POOL_DEPTH", "5")),
+            low_water=int(os.getenv("MCQ_POOL_LOW_WATER", "2")),
+            workers=int(os.getenv("MCQ_POOL_WORKERS", "2")),
+            batch_size=int(os.getenv("MCQ_POOL_BATCH", "3")),
+        )
+        await mcq_pool.start()
+        print("✅ MCQ pool refill workers started")
+        
         # TODO: Initialize RAG system and load documents
         # from rag_system import NPTERAGSystem
         # rag_system = NPTERAGSystem()
@@ -86,22 +121,87 @@ async def startup_event():
         print(f"⚠️ System initialization failed: {e}")
         agent = None
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop pool workers and release the agent's pooled Ollama connections"""
+    if mcq_pool is not None:
+        await mcq_pool.stop()
+    if agent is not None:
+        await agent.aclose()
+
+@app.exception_handler(Overloaded)
+async def overloaded_handler(request, exc: Overloaded):
+    """Reject fast with Retry-After when the LLM backend is saturated"""
+    return JSONResponse(
+        status_code=exc.status_code,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
 @app.post("/api/ask", response_model=MCQResponse)
 async def ask(request: PromptRequest):
-    """Generate MCQ using agent with tool-belt"""
+    """Serve an MCQ from the warm topic pool"""
     global agent
     
-    if agent is None:
+    if agent is None or mcq_pool is None:
         raise HTTPException(status_code=503, detail="Agent system not initialized")
     
     try:
-        mcq_data = agent.generate_mcq(request.prompt)
+        mcq_data = await mcq_pool.get(request.prompt, session_id=request.session_id)
         return MCQResponse(**mcq_data)
+    except Overloaded:
+        raise
+    except MCQGenerationError as e:
+        raise HTTPException(status_code=502, detail=str(e))
+    except TimeoutError as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         print(f"Ollama MCQ generation failed: {e}")
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=f"Failed to generate MCQ for {request.prompt}: {e}")
 
+@app.post("/api/ask_batch", response_model=BatchMCQResponse)
+async def ask_batch(request: BatchPromptRequest):
+    """Generate several distinct MCQs for one topic in a single LLM call"""
+    global agent
+    
+    if agent is None:
+        raise HTTPException(status_code=503, detail="Agent system not initialized")
+    
+    try:
+        mcqs = await agent.agenerate_mcq_batch(request.prompt, request.count)
+        return BatchMCQResponse(questions=[MCQResponse(**mcq) for mcq in mcqs])
+    except Overloaded:
+        raise
+    except MCQGenerationError as e:
+        raise HTTPException(status_code=502, detail=str(e))
+    except Exception as e:
+        print(f"Ollama batch MCQ generation failed: {e}")
+        traceback.print_exc()
+        raise HTTPException(status_code=500, detail=f"Failed to generate MCQs for {request.prompt}: {e}")
+
+@app.get("/api/ask_stream")
+async def ask_stream(prompt: str):
+    """Stream MCQ generation as server-sent events, one event per completed field"""
+    global agent
+    
+    if agent is None:
+        raise HTTPException(status_code=503, detail="Agent system not initialized")
+    
+    # Reject before the 200 response starts; a stream cannot change its status later
+    if agent.admission is not None:
+        agent.admission.check()
+    
+    async def event_source():
+        async for event, data in agent.astream_mcq(prompt):
+            yield f"event: {event}\ndata: {json.dumps(data)}\n\n"
+    
+    return StreamingResponse(
+        event_source(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 # Removed /api/validate_answer endpoint - validation now handled client-side
 
 @app.post("/api/upload_documents", response_model=DocumentUploadResponse)
@@ -131,6 +231,16 @@ async def upload_documents():
 #     pass
 # ============================================================================
 
+@app.get("/api/metrics")
+async def metrics():
+    """Runtime counters for capacity planning"""
+    return {
+        "pool": mcq_pool.stats() if mcq_pool is not None else None,
+        "generation": agent.generation_metrics() if agent is not None else None,
+        "admission": agent.admission.stats() if agent is not None and agent.admission is not None else None,
+        "backends": agent.balancer.stats() if agent is not None else None,
+    }
+
 @app.get("/")
 def read_root():
     return {"message": "FastAPI backend is running!"}
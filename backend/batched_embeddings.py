@@ -0,0 +1,232 @@
+"""
+Client-side batching for Ollama embedding calls
+Splits large embed_documents calls into batches sent concurrently, adapting batch size to latency and errors
+"""
+
+import asyncio
+import logging
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+from langchain_core.embeddings import Embeddings
+
+logger = logging.getLogger(__name__)
+
+
+class BatchedEmbeddings(Embeddings):
+    """Drop-in Embeddings wrapper that keeps `concurrency` batches in flight
+
+    Batch size is adjusted after every call: it grows while batches finish
+    well under `target_seconds` and shrinks when they run over. A failed
+    batch halves the batch size, is split in two and retried after an
+    exponential back-off, so an overloaded server sees less load rather
+    than the same load again. With `adaptive=False` the batch size stays
+    fixed (used by the benchmark). The async methods apply the same
+    batching and retries with `concurrency` batches awaited at once.
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        batch_size: int = 16,
+        concurrency: int = 4,
+        min_batch: int = 1,
+        max_batch: int = 256,
+        target_seconds: float = 2.0,
+        max_attempts: int = 4,
+        backoff_base: float = 0.5,
+        adaptive: bool = True,
+    ):
+        self.embeddings = embeddings
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.min_batch = min_batch
+        self.max_batch = max_batch
+        self.target_seconds = target_seconds
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.adaptive = adaptive
+        self.stats_counters = {"texts": 0, "batches": 0, "errors": 0, "retries": 0, "seconds": 0.0}
+        self._lock = threading.Lock()
+
+    @property
+    def model(self) -> str:
+        """Wrapped model name, so caches key on the real model"""
+        return getattr(self.embeddings, "model", type(self.embeddings).__name__)
+
+    def _adapt(self, size: int, seconds: float):
+        if not self.adaptive:
+            return
+        with self._lock:
+            if seconds < self.target_seconds / 2 and size >= self.batch_size:
+                self.batch_size = min(self.max_batch, max(self.batch_size + 1, int(self.batch_size * 1.5)))
+            elif seconds > self.target_seconds:
+                self.batch_size = max(self.min_batch, int(self.batch_size * 0.7))
+
+    def _shrink_after_error(self):
+        with self._lock:
+            self.batch_size = max(self.min_batch, self.batch_size // 2)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        if len(texts) <= self.batch_size:
+            return self._embed_serial(texts)
+
+        results: List[Optional[List[float]]] = [None] * len(texts)
+        # (start, end, attempt) ranges that failed and wait to be retried
+        retries = deque()
+        cursor = [0]
+        failure: List[BaseException] = []
+
+        def next_range():
+            with self._lock:
+                if failure:
+                    return None
+                if retries:
+                    return retries.popleft()
+                start = cursor[0]
+                if start >= len(texts):
+                    return None
+                cursor[0] = min(len(texts), start + self.batch_size)
+                return start, cursor[0], 0
+
+        def worker():
+            while True:
+                work = next_range()
+                if work is None:
+                    return
+                start, end, attempt = work
+                began = time.monotonic()
+                try:
+                    vectors = self.embeddings.embed_documents(texts[start:end])
+                except Exception as e:
+                    self._on_error(start, end, attempt, e, retries, failure)
+                    continue
+                elapsed = time.monotonic() - began
+                results[start:end] = vectors
+                self._record(end - start, elapsed)
+                self._adapt(end - start, elapsed)
+
+        began = time.monotonic()
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            # A worker may exit while another is still producing retries, so loop until drained
+            while True:
+                for future in [executor.submit(worker) for _ in range(self.concurrency)]:
+                    future.result()
+                with self._lock:
+                    if failure or (not retries and cursor[0] >= len(texts)):
+                        break
+        if failure:
+            raise failure[0]
+        logger.debug(f"Embedded {len(texts)} texts in {time.monotonic() - began:.2f}s (batch size now {self.batch_size})")
+        return results
+
+    def _embed_serial(self, texts: List[str], attempt: int = 0) -> List[List[float]]:
+        """Embed one batch; `attempt` carries over into the halves, so max_attempts bounds the whole call"""
+        while True:
+            began = time.monotonic()
+            try:
+                vectors = self.embeddings.embed_documents(texts)
+            except Exception as e:
+                attempt += 1
+                with self._lock:
+                    self.stats_counters["errors"] += 1
+                if attempt >= self.max_attempts:
+                    raise
+                self._shrink_after_error()
+                self._back_off(attempt, e)
+                with self._lock:
+                    self.stats_counters["retries"] += 1
+                if len(texts) > 1:
+                    # Retry in smaller pieces
+                    middle = len(texts) // 2
+                    return self._embed_serial(texts[:middle], attempt) + self._embed_serial(texts[middle:], attempt)
+                continue
+            elapsed = time.monotonic() - began
+            self._record(len(texts), elapsed)
+            self._adapt(len(texts), elapsed)
+            return vectors
+
+    def _on_error(self, start: int, end: int, attempt: int, error: Exception, retries: deque, failure: List[BaseException]):
+        with self._lock:
+            self.stats_counters["errors"] += 1
+        if attempt + 1 >= self.max_attempts:
+            with self._lock:
+                failure.append(error)
+            return
+        self._shrink_after_error()
+        self._back_off(attempt + 1, error)
+        with self._lock:
+            self.stats_counters["retries"] += 1
+            if end - start > 1:
+                middle = (start + end) // 2
+                retries.extend([(start, middle, attempt + 1), (middle, end, attempt + 1)])
+            else:
+                retries.append((start, end, attempt + 1))
+
+    def _back_off_delay(self, attempt: int, error: Exception) -> float:
+        delay = self.backoff_base * (2 ** (attempt - 1)) * random.uniform(0.5, 1.5)
+        logger.warning(f"Embedding batch failed ({error}); retrying in {delay:.1f}s with batch size {self.batch_size}")
+        return delay
+
+    def _back_off(self, attempt: int, error: Exception):
+        time.sleep(self._back_off_delay(attempt, error))
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def embed(batch: List[str]) -> List[List[float]]:
+            async with semaphore:
+                return await self._aembed_serial(batch)
+
+        size = self.batch_size
+        batches = await asyncio.gather(*(embed(texts[i:i + size]) for i in range(0, len(texts), size)))
+        return [vector for batch in batches for vector in batch]
+
+    async def _aembed_serial(self, texts: List[str], attempt: int = 0) -> List[List[float]]:
+        """Embed one batch; `attempt` carries over into the halves, so max_attempts bounds the whole call"""
+        while True:
+            began = time.monotonic()
+            try:
+                vectors = await self.embeddings.aembed_documents(texts)
+            except Exception as e:
+                attempt += 1
+                with self._lock:
+                    self.stats_counters["errors"] += 1
+                if attempt >= self.max_attempts:
+                    raise
+                self._shrink_after_error()
+                await asyncio.sleep(self._back_off_delay(attempt, e))
+                with self._lock:
+                    self.stats_counters["retries"] += 1
+                if len(texts) > 1:
+                    middle = len(texts) // 2
+                    return await self._aembed_serial(texts[:middle], attempt) + await self._aembed_serial(texts[middle:], attempt)
+                continue
+            elapsed = time.monotonic() - began
+            self._record(len(texts), elapsed)
+            self._adapt(len(texts), elapsed)
+            return vectors
+
+    def _record(self, size: int, seconds: float):
+        with self._lock:
+            self.stats_counters["texts"] += size
+            self.stats_counters["batches"] += 1
+            self.stats_counters["seconds"] += seconds
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embeddings.embed_query(text)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return await self.embeddings.aembed_query(text)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {**self.stats_counters, "batch_size": self.batch_size, "concurrency": self.concurrency}
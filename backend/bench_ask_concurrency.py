@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Benchmark /api/ask throughput as concurrency grows
+
+Start the backend first (one worker):
+    uvicorn app:app --host 0.0.0.0 --port 8000
+then run:
+    python bench_ask_concurrency.py --levels 1 2 4 8 --requests 16
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+
+TOPICS = [
+    "Cardiovascular and pulmonary systems",
+    "Musculoskeletal system",
+    "Neuromuscular and nervous systems",
+    "Integumentary system",
+]
+
+async def run_level(client: httpx.AsyncClient, url: str, concurrency: int, total: int) -> dict:
+    """Fire `total` requests with at most `concurrency` in flight"""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    errors = 0
+
+    async def one(i: int):
+        nonlocal errors
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                response = await client.post(url, json={"prompt": TOPICS[i % len(TOPICS)]})
+                response.raise_for_status()
+                latencies.append(time.perf_counter() - start)
+            except Exception as e:
+                errors += 1
+                print(f"  ❌ request {i} failed: {e}")
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(total)))
+    elapsed = time.perf_counter() - start
+
+    return {
+        "concurrency": concurrency,
+        "ok": len(latencies),
+        "errors": errors,
+        "elapsed": elapsed,
+        "throughput": len(latencies) / elapsed if elapsed else 0.0,
+        "p50": statistics.median(latencies) if latencies else 0.0,
+        "max": max(latencies) if latencies else 0.0,
+    }
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:8000/api/ask")
+    parser.add_argument("--levels", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--requests", type=int, default=16, help="Requests per concurrency level")
+    args = parser.parse_args()
+
+    print("🧪 /api/ask concurrency benchmark")
+    print("=" * 60)
+
+    async with httpx.AsyncClient(timeout=600) as client:
+        results = []
+        for level in args.levels:
+            print(f"\n▶ concurrency={level}")
+            results.append(await run_level(client, args.url, level, args.requests))
+
+    print("\n" + "=" * 60)
+    print(f"{'conc':>5} {'ok':>4} {'err':>4} {'elapsed s':>10} {'req/s':>8} {'p50 s':>8} {'max s':>8}")
+    for r in results:
+        print(f"{r['concurrency']:>5} {r['ok']:>4} {r['errors']:>4} {r['elapsed']:>10.2f} "
+              f"{r['throughput']:>8.3f} {r['p50']:>8.2f} {r['max']:>8.2f}")
+
+if __name__ == "__main__":
+    asyncio.run(main())
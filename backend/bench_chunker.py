@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark: clean+split throughput and chunk parity, old path vs new
+
+  recursive - DocumentProcessor._clean_text + NPTERAGSystem.text_splitter
+              (RecursiveCharacterTextSplitter 800/100), the previous default
+  sentence  - text_chunker.normalize_text + SentenceChunker (single pass)
+
+Text is extracted once up front so only clean+split is timed. Boundary
+parity is the share of recursive-path chunk ends that the sentence path
+also cuts within --tolerance words.
+Run:
+    python bench_chunker.py --documents documents
+"""
+
+import argparse
+import bisect
+import logging
+import time
+from pathlib import Path
+
+from dedup import group_identical_files
+from document_processor import SUPPORTED_SUFFIXES, DocumentProcessor
+from ingestion_manifest import file_content_hash
+from text_chunker import SentenceChunker, normalize_text
+
+
+def chunk_end_words(text: str, chunks: list) -> list:
+    """Word index at which each chunk ends, comparable across both paths"""
+    ends = []
+    search_from = 0
+    for chunk in chunks:
+        start = text.find(chunk, search_from)
+        start = search_from if start < 0 else start
+        end = start + len(chunk)
+        ends.append(len(text[:end].split()))
+        search_from = start + 1
+    return ends
+
+
+def time_best(fn, texts: list, repeat: int):
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = [fn(text) for text in texts]
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--documents", default="documents")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--tolerance", type=int, default=5, help="Words a boundary may move and still count as matching")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.ERROR)
+
+    paths = [str(p) for p in sorted(Path(args.documents).rglob("*")) if p.suffix.lower() in SUPPORTED_SUFFIXES]
+    processor = DocumentProcessor(chunker="recursive")
+    units = {"pdf": processor.iter_pdf_pages, "docx": processor.iter_docx_paragraphs, "txt": processor.iter_text_paragraphs}
+    texts = []
+    for path in sorted(group_identical_files({path: file_content_hash(path) for path in paths})):
+        kind = SUPPORTED_SUFFIXES[Path(path).suffix.lower()]
+        texts.append("\n".join(text for _, text in units[kind](path)))
+    megabytes = sum(len(text.encode("utf-8")) for text in texts) / 1e6
+
+    print("🧪 Clean + split microbenchmark")
+    print("=" * 60)
+    print(f"📄 {len(texts)} distinct files, {megabytes:.2f} MB of extracted text")
+
+    chunker = SentenceChunker(processor.chunk_size, processor.chunk_overlap)
+    paths_under_test = {
+        "recursive": (processor._clean_text, processor.text_splitter.split_text),
+        "sentence": (normalize_text, chunker.split_text),
+    }
+    results = {}
+    for name, (clean, split) in paths_under_test.items():
+        clean_seconds, cleaned = time_best(clean, texts, args.repeat)
+        split_seconds, chunks = time_best(split, cleaned, args.repeat)
+        results[name] = {"clean": clean_seconds, "split": split_seconds, "cleaned": cleaned, "chunks": chunks}
+
+    print(f"\n{'path':>10} {'clean s':>8} {'split s':>8} {'MB/s':>7} {'chunks':>7} {'avg len':>8}")
+    for name, r in results.items():
+        count = sum(map(len, r["chunks"]))
+        total = r["clean"] + r["split"]
+        average = sum(len(c) for chunks in r["chunks"] for c in chunks) / max(1, count)
+        print(f"{name:>10} {r['clean']:>8.3f} {r['split']:>8.3f} {megabytes / total:>7.1f} {count:>7} {average:>8.0f}")
+
+    old, new = results["recursive"], results["sentence"]
+    matched = boundaries = 0
+    for old_text, old_chunks, new_text, new_chunks in zip(old["cleaned"], old["chunks"], new["cleaned"], new["chunks"]):
+        new_ends = chunk_end_words(new_text, new_chunks)
+        for end in chunk_end_words(old_text, old_chunks):
+            i = bisect.bisect_left(new_ends, end - args.tolerance)
+            matched += i < len(new_ends) and new_ends[i] <= end + args.tolerance
+            boundaries += 1
+    old_count, new_count = sum(map(len, old["chunks"])), sum(map(len, new["chunks"]))
+    speedup = (old["clean"] + old["split"]) / (new["clean"] + new["split"])
+    print(f"\n⚡ Speed-up: {speedup:.2f}x")
+    print(f"🔢 Chunk count: {new_count} vs {old_count} ({100 * (new_count - old_count) / max(1, old_count):+.1f}%)")
+    print(f"📐 Boundaries within ±{args.tolerance} words: {100 * matched / max(1, boundaries):.1f}%")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Benchmark embedding throughput (chunks/sec) against batch size and concurrency
+
+Chunks come from the canonical copies of the files in documents/, exactly as
+ingestion would produce them. The embedding cache is bypassed. Start Ollama
+with the embedding model pulled, then run:
+    python bench_embeddings.py --chunks 512 --batch-sizes 1 8 32 128 --concurrency 1 2 4 8
+Without a GPU, `python ollama_stub.py --port 11501 --delay 1` and
+`--base-url http://localhost:11501` exercise the same code path.
+"""
+
+import argparse
+import logging
+import time
+from pathlib import Path
+
+from langchain_ollama import OllamaEmbeddings
+
+from batched_embeddings import BatchedEmbeddings
+from dedup import group_identical_files
+from document_processor import SUPPORTED_SUFFIXES, DocumentProcessor
+from ingestion_manifest import file_content_hash
+
+
+def load_chunks(directory: str, limit: int) -> list:
+    """Chunk text from one copy of each distinct file, up to `limit` chunks"""
+    paths = [str(p) for p in sorted(Path(directory).rglob("*")) if p.suffix.lower() in SUPPORTED_SUFFIXES]
+    canonical = group_identical_files({path: file_content_hash(path) for path in paths})
+    processor = DocumentProcessor()
+    texts = []
+    for path in sorted(canonical):
+        texts.extend(doc.page_content for doc in processor.process_file(path))
+        if len(texts) >= limit:
+            break
+    return texts[:limit]
+
+
+def run(embeddings, texts: list) -> dict:
+    start = time.perf_counter()
+    embeddings.embed_documents(texts)
+    elapsed = time.perf_counter() - start
+    stats = embeddings.stats()
+    return {
+        "elapsed": elapsed,
+        "throughput": len(texts) / elapsed if elapsed else 0.0,
+        "errors": stats["errors"],
+        "final_batch": stats["batch_size"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--documents", default="documents")
+    parser.add_argument("--model", default="nomic-embed-text")
+    parser.add_argument("--base-url", default="http://localhost:11434")
+    parser.add_argument("--chunks", type=int, default=512)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 8, 32, 128])
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 4, 8])
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+
+    print("🧪 Embedding throughput benchmark")
+    print("=" * 60)
+    texts = load_chunks(args.documents, args.chunks)
+    print(f"📄 {len(texts)} chunks, avg {sum(map(len, texts)) / max(1, len(texts)):.0f} chars")
+
+    ollama = OllamaEmbeddings(model=args.model, base_url=args.base_url)
+    ollama.embed_documents(texts[:1])  # load the model before timing
+
+    results = []
+    for concurrency in args.concurrency:
+        for batch_size in args.batch_sizes:
+            print(f"\n▶ batch={batch_size} concurrency={concurrency}")
+            embeddings = BatchedEmbeddings(ollama, batch_size=batch_size, concurrency=concurrency, adaptive=False)
+            results.append({"mode": "fixed", "batch": batch_size, "concurrency": concurrency, **run(embeddings, texts)})
+        print(f"\n▶ adaptive concurrency={concurrency}")
+        embeddings = BatchedEmbeddings(ollama, batch_size=min(args.batch_sizes), concurrency=concurrency)
+        results.append({"mode": "adaptive", "batch": min(args.batch_sizes), "concurrency": concurrency, **run(embeddings, texts)})
+
+    print("\n" + "=" * 60)
+    print(f"{'mode':>8} {'batch':>6} {'conc':>5} {'elapsed s':>10} {'chunks/s':>9} {'errors':>7} {'end batch':>10}")
+    for r in results:
+        print(f"{r['mode']:>8} {r['batch']:>6} {r['concurrency']:>5} {r['elapsed']:>10.2f} "
+              f"{r['throughput']:>9.1f} {r['errors']:>7} {r['final_batch']:>10}")
+    best = max(results, key=lambda r: r["throughput"])
+    print(f"\n🏆 Best: {best['mode']} batch={best['batch']} concurrency={best['concurrency']} "
+          f"-> {best['throughput']:.1f} chunks/s (set EMBED_BATCH_SIZE / EMBED_CONCURRENCY)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Benchmark topic-filtered vs unfiltered vector search as the collection grows
+
+Synthetic 768-d chunks are spread over the NPTE topics (plus "General") with
+the same payload layout the LangChain wrapper writes, so the filter is the
+one retrieve_relevant_context sends: metadata.topic == <topic>. Each size is
+measured with and without the keyword payload indexes from setup_collection.
+Embedded Qdrant (the default, as in NPTERAGSystem) ignores payload indexes and
+scans; point --url at a Qdrant server to measure the indexed path:
+    docker run -p 6333:6333 qdrant/qdrant
+    python bench_filtered_search.py --url http://localhost:6333 --sizes 1000 10000 100000
+"""
+
+import argparse
+import logging
+import statistics
+import time
+import warnings
+
+import numpy as np
+from qdrant_client import QdrantClient
+from qdrant_client.models import Distance, PointStruct, VectorParams
+
+from mcq_pool import NPTE_TOPICS
+from rag_system import INDEXED_METADATA_FIELDS, NPTERAGSystem
+
+DIMENSION = 768
+COLLECTION = "bench_filtered_search"
+
+
+def fill(client: QdrantClient, size: int, rng: np.random.Generator, batch: int = 1024):
+    """Create the collection with `size` random unit vectors and chunk-like payloads"""
+    if client.collection_exists(COLLECTION):
+        client.delete_collection(COLLECTION)
+    client.create_collection(COLLECTION, vectors_config=VectorParams(size=DIMENSION, distance=Distance.COSINE))
+    topics = NPTE_TOPICS + ["General"]
+    for offset in range(0, size, batch):
+        count = min(batch, size - offset)
+        vectors = rng.standard_normal((count, DIMENSION), dtype=np.float32)
+        points = [
+            PointStruct(
+                id=offset + i,
+                vector=vector.tolist(),
+                payload={
+                    "page_content": f"chunk {offset + i}",
+                    "metadata": {
+                        "source": f"documents/file_{(offset + i) // 50}.pdf",
+                        "chunk_id": (offset + i) % 50,
+                        "type": "pdf",
+                        "topic": topics[rng.integers(len(topics))],
+                    },
+                },
+            )
+            for i, vector in enumerate(vectors)
+        ]
+        client.upsert(COLLECTION, points=points, wait=True)
+
+
+def time_queries(rag: NPTERAGSystem, queries: np.ndarray, k: int, topic_filter) -> list:
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        rag.search_by_vector(query.tolist(), k=k, query_filter=topic_filter)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="Qdrant server URL (default: embedded in-memory Qdrant)")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 5000, 20000])
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--topic", default=NPTE_TOPICS[0])
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.ERROR)
+    warnings.simplefilter("ignore", UserWarning)
+
+    client = QdrantClient(url=args.url) if args.url else QdrantClient(":memory:")
+    # Only the search and index helpers are exercised, so skip embeddings and storage setup
+    rag = NPTERAGSystem.__new__(NPTERAGSystem)
+    rag.qdrant_client, rag.collection_name = client, COLLECTION
+    topic_filter = NPTERAGSystem.metadata_filter(topic=args.topic)
+    rng = np.random.default_rng(0)
+    queries = rng.standard_normal((args.queries, DIMENSION), dtype=np.float32)
+
+    print("🧪 Filtered vs unfiltered search benchmark")
+    print("=" * 60)
+    print(f"🗄️  {'Qdrant server ' + args.url if args.url else 'embedded Qdrant (payload indexes ignored)'}")
+    print(f"🔎 {args.queries} queries, k={args.k}, filter metadata.topic == {args.topic!r}")
+
+    results = []
+    for size in args.sizes:
+        print(f"\n▶ {size} points")
+        fill(client, size, rng)
+        row = {"size": size, "unfiltered": time_queries(rag, queries, args.k, None)}
+        row["filtered"] = time_queries(rag, queries, args.k, topic_filter)
+        rag._ensure_payload_indexes()
+        row["indexed"] = time_queries(rag, queries, args.k, topic_filter)
+        results.append(row)
+    client.delete_collection(COLLECTION)
+
+    print("\n" + "=" * 60)
+    print(f"{'points':>8} {'unfiltered p50':>15} {'filtered p50':>13} {'indexed p50':>12} {'indexed p95':>12}")
+    for row in results:
+        p95 = statistics.quantiles(row["indexed"], n=20)[-1]
+        print(f"{row['size']:>8} {statistics.median(row['unfiltered']):>12.2f} ms "
+              f"{statistics.median(row['filtered']):>10.2f} ms {statistics.median(row['indexed']):>9.2f} ms "
+              f"{p95:>9.2f} ms")
+    print(f"\n📇 Indexed fields: {', '.join('metadata.' + field for field in INDEXED_METADATA_FIELDS)}")
+
+
+if __name__ == "__main__":
+    main()
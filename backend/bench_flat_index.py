@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Benchmark the memory-mapped flat index against embedded Qdrant
+
+Synthetic 768-d chunks spread over the NPTE topics are written to a scratch
+embedded Qdrant collection and exported with FlatIndex.from_qdrant, exactly
+as VECTOR_BACKEND=flat does after ingestion. Reported per backend:
+  cold start  - open + first query in a freshly spawned process
+  p50 / p95   - query latency, unfiltered and topic-filtered
+  shared qps  - summed throughput of --workers processes reading at once
+                (embedded Qdrant locks its directory, so one reader only)
+Run:
+    python bench_flat_index.py --sizes 2000 20000 --workers 4
+"""
+
+import argparse
+import logging
+import multiprocessing
+import shutil
+import statistics
+import tempfile
+import time
+import warnings
+from pathlib import Path
+
+import numpy as np
+from qdrant_client import QdrantClient
+from qdrant_client.models import Distance, PointStruct, VectorParams
+
+from flat_index import FlatIndex
+from mcq_pool import NPTE_TOPICS
+from rag_system import NPTERAGSystem
+
+DIMENSION = 768
+COLLECTION = "bench_flat_index"
+
+
+def build(directory: Path, size: int, rng: np.random.Generator):
+    """Scratch embedded Qdrant collection plus float32 and float16 flat exports of it"""
+    client = QdrantClient(path=str(directory / "qdrant"))
+    client.create_collection(COLLECTION, vectors_config=VectorParams(size=DIMENSION, distance=Distance.COSINE))
+    topics = NPTE_TOPICS + ["General"]
+    for offset in range(0, size, 1024):
+        count = min(1024, size - offset)
+        vectors = rng.standard_normal((count, DIMENSION), dtype=np.float32)
+        client.upsert(COLLECTION, points=[
+            PointStruct(id=offset + i, vector=vector.tolist(), payload={
+                "page_content": f"chunk {offset + i} " + "lorem ipsum " * 60,
+                "metadata": {"source": f"documents/file_{(offset + i) // 50}.pdf", "chunk_id": (offset + i) % 50,
+                             "type": "pdf", "topic": topics[rng.integers(len(topics))]},
+            })
+            for i, vector in enumerate(vectors)
+        ])
+    for dtype in ("float32", "float16"):
+        FlatIndex.from_qdrant(client, COLLECTION, str(directory / dtype), dtype=dtype)
+    client.close()
+
+
+def open_backend(directory: str, backend: str):
+    """A search function over the backend: (vector, k, topic) -> documents"""
+    if backend == "qdrant":
+        rag = NPTERAGSystem.__new__(NPTERAGSystem)
+        rag.qdrant_client, rag.collection_name = QdrantClient(path=str(Path(directory) / "qdrant")), COLLECTION
+        return lambda vector, k, topic: rag.search_by_vector(
+            vector, k=k, query_filter=NPTERAGSystem.metadata_filter(topic=topic)
+        )
+    index = FlatIndex(str(Path(directory) / backend))
+    return index.search
+
+
+def cold_start(directory: str, backend: str, query: list) -> float:
+    """Runs in a spawned process: seconds from opening the backend to the first result"""
+    warnings.simplefilter("ignore")
+    start = time.perf_counter()
+    open_backend(directory, backend)(query, 5, None)
+    return time.perf_counter() - start
+
+
+def read_load(directory: str, backend: str, queries: np.ndarray, rounds: int) -> tuple:
+    """Runs in a spawned process: answers every query `rounds` times, returns (count, seconds)"""
+    warnings.simplefilter("ignore")
+    search = open_backend(directory, backend)
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for query in queries:
+            search(query.tolist(), 5, None)
+    return rounds * len(queries), time.perf_counter() - start
+
+
+def latencies(search, queries: np.ndarray, k: int, topic) -> list:
+    times = []
+    for query in queries:
+        start = time.perf_counter()
+        search(query.tolist(), k, topic)
+        times.append((time.perf_counter() - start) * 1000)
+    return times
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[2000, 20000])
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--rounds", type=int, default=5, help="Passes over the queries per shared reader")
+    parser.add_argument("--topic", default=NPTE_TOPICS[0])
+    args = parser.parse_args()
+    logging.getLogger().setLevel(logging.ERROR)  # rag_system configures INFO on import
+    warnings.simplefilter("ignore")
+
+    rng = np.random.default_rng(0)
+    queries = rng.standard_normal((args.queries, DIMENSION), dtype=np.float32)
+    spawn = multiprocessing.get_context("spawn")
+
+    print("🧪 Flat index vs embedded Qdrant benchmark")
+    print("=" * 60)
+    print(f"🔎 {args.queries} queries, k={args.k}, filter topic == {args.topic!r}, {args.workers} shared readers")
+
+    results = []
+    for size in args.sizes:
+        print(f"\n▶ {size} points")
+        directory = Path(tempfile.mkdtemp(prefix="bench_flat_index_"))
+        try:
+            build(directory, size, rng)
+            for backend in ("qdrant", "float32", "float16"):
+                with spawn.Pool(1) as pool:
+                    cold = pool.apply(cold_start, (str(directory), backend, queries[0].tolist()))
+                search = open_backend(str(directory), backend)
+                plain = latencies(search, queries, args.k, None)
+                filtered = latencies(search, queries, args.k, args.topic)
+                del search  # releases the embedded Qdrant lock before the readers start
+                workers = 1 if backend == "qdrant" else args.workers
+                with spawn.Pool(workers) as pool:
+                    loads = pool.starmap(read_load, [(str(directory), backend, queries, args.rounds)] * workers)
+                qps = sum(count / seconds for count, seconds in loads)
+                results.append({"size": size, "backend": backend, "cold": cold, "plain": plain,
+                                "filtered": filtered, "workers": workers, "qps": qps})
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+
+    print("\n" + "=" * 60)
+    print(f"{'points':>7} {'backend':>8} {'cold ms':>8} {'p50 ms':>7} {'p95 ms':>7} {'topic p50':>10} {'readers':>8} {'qps':>7}")
+    for r in results:
+        p95 = statistics.quantiles(r["plain"], n=20)[-1]
+        print(f"{r['size']:>7} {r['backend']:>8} {1000 * r['cold']:>8.1f} {statistics.median(r['plain']):>7.2f} "
+              f"{p95:>7.2f} {statistics.median(r['filtered']):>10.2f} {r['workers']:>8} {r['qps']:>7.0f}")
+    print("\n💡 Cold start is open + first result in a new process; qps sums the readers' query loops")
+
+
+if __name__ == "__main__":
+    main()
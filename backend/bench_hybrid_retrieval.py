@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Benchmark hybrid (BM25 + dense) retrieval against dense-only and lexical-only
+
+Each query is built from one chunk of the collection: its --terms rarest
+words, the way a question names a test, measure or eponym ("Kleiger test",
+"FEV1"). A query is recalled when that chunk is in the top-k. All three
+modes go through retrieve_relevant_context with the retrieval cache and
+context pools disabled, so dense and hybrid latency includes the Ollama
+query embedding and lexical latency shows the no-Ollama fast path. Needs
+an ingested collection (upload_documents.py builds the BM25 index) and
+Ollama with nomic-embed-text; the stub (`python ollama_stub.py --port
+11501`, OLLAMA_HOST=http://localhost:11501) only exercises the plumbing,
+since its vectors carry no meaning. Stop the backend first; embedded
+Qdrant allows one process. Run:
+    python bench_hybrid_retrieval.py --queries 200 --k 5
+"""
+
+import argparse
+import logging
+import random
+import statistics
+import time
+
+from bm25_index import tokenize
+from rag_system import NPTERAGSystem
+from retrieval_cache import RetrievalCache
+
+MODES = ("dense", "hybrid", "lexical")
+
+
+def make_queries(index, count: int, terms: int, rng: random.Random) -> list:
+    """(query, (source, chunk_id)) pairs from the rarest words of sampled chunks"""
+    queries = []
+    for row in rng.sample(range(len(index)), min(count, len(index))):
+        payload = index.payload(row)
+        words = sorted(set(tokenize(payload["page_content"] or "")), key=index.document_frequency)[:terms]
+        if words:
+            metadata = payload["metadata"]
+            queries.append((" ".join(words), (metadata.get("source"), metadata.get("chunk_id"))))
+    return queries
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--terms", type=int, default=2, help="rare words per query")
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    logging.getLogger().setLevel(logging.ERROR)  # rag_system configures INFO on import
+
+    rag = NPTERAGSystem()
+    rag.context_pool_size = 0
+    rag.retrieval_cache = RetrievalCache(max_entries=0)
+    rag.setup_collection()
+    if not rag.open_bm25_index():
+        print("🔨 No BM25 index yet; building it from the collection")
+        rag.export_bm25_index()
+    if not len(rag.bm25_index):
+        print("❌ The collection is empty; run upload_documents.py first")
+        return
+
+    queries = make_queries(rag.bm25_index, args.queries, args.terms, random.Random(args.seed))
+    print("🧪 Hybrid retrieval benchmark")
+    print("=" * 60)
+    print(f"🔎 {len(queries)} queries of {args.terms} rare words, k={args.k}, "
+          f"{len(rag.bm25_index)} chunks, fusion depth {rag.fusion_depth}")
+
+    results = []
+    for mode in MODES:
+        rag.retrieval_mode = mode
+        latencies, hits = [], 0
+        for query, target in queries:
+            start = time.perf_counter()
+            docs = rag.retrieve_relevant_context(query, k=args.k)
+            latencies.append((time.perf_counter() - start) * 1000)
+            hits += target in [(doc.metadata.get("source"), doc.metadata.get("chunk_id")) for doc in docs]
+        latencies.sort()
+        results.append({"mode": mode, "recall": hits / len(queries), "p50": statistics.median(latencies),
+                        "p95": latencies[int(0.95 * (len(latencies) - 1))], "mean": statistics.mean(latencies)})
+        print(f"  ✅ {mode}: recall@{args.k} {hits / len(queries):.3f}")
+
+    print("\n" + "=" * 60)
+    print(f"{'mode':>8} {f'recall@{args.k}':>10} {'p50 ms':>8} {'p95 ms':>8} {'mean ms':>8}")
+    for r in results:
+        print(f"{r['mode']:>8} {r['recall']:>10.3f} {r['p50']:>8.2f} {r['p95']:>8.2f} {r['mean']:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
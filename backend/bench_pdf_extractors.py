@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Benchmark PDF extractors: pages/sec and text fidelity over the documents/ corpus
+
+Identical copies (documents/ vs documents/data/) are measured once. There is
+no ground-truth text, so fidelity is reported as signals of broken output:
+  agree  - word-frequency overlap with the other extractors' text (0-1)
+  glued  - share of words longer than 25 characters (lost spaces), per-file mean
+  junk   - share of control or replacement characters, per-file mean
+Run:
+    python bench_pdf_extractors.py --documents documents
+"""
+
+import argparse
+import logging
+import re
+import time
+from collections import Counter
+from pathlib import Path
+
+from dedup import group_identical_files
+from ingestion_manifest import file_content_hash
+from pdf_extractors import PDF_EXTRACTORS, get_pdf_extractor
+
+WORD = re.compile(r"\w+")
+
+
+def word_overlap(a: Counter, b: Counter) -> float:
+    """Multiset Jaccard similarity of two word counts"""
+    union = sum((a | b).values())
+    return sum((a & b).values()) / union if union else 1.0
+
+
+def fidelity(text: str) -> dict:
+    words = WORD.findall(text)
+    junk = sum(1 for ch in text if ch == "�" or (ord(ch) < 32 and ch not in "\n\t\r"))
+    return {
+        "glued": sum(1 for word in words if len(word) > 25) / max(1, len(words)),
+        "junk": junk / max(1, len(text)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--documents", default="documents")
+    parser.add_argument("--extractors", nargs="+", default=sorted(PDF_EXTRACTORS))
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.ERROR)
+
+    paths = [str(p) for p in sorted(Path(args.documents).rglob("*.pdf"))]
+    pdfs = sorted(group_identical_files({path: file_content_hash(path) for path in paths}))
+    print("🧪 PDF extractor benchmark")
+    print("=" * 60)
+    print(f"📄 {len(pdfs)} distinct PDFs ({len(paths)} files)")
+
+    totals = {
+        name: {"pages": 0, "chars": 0, "seconds": 0.0, "failures": 0, "glued": 0.0, "junk": 0.0, "agree": [], "docs": 0}
+        for name in args.extractors
+    }
+    for path in pdfs:
+        texts = {}
+        for name in args.extractors:
+            extractor = get_pdf_extractor(name)
+            start = time.perf_counter()
+            try:
+                pages = list(extractor.extract_pages(path))
+            except Exception as e:
+                print(f"  ❌ {name} failed on {Path(path).name}: {e}")
+                totals[name]["failures"] += 1
+                continue
+            totals[name]["seconds"] += time.perf_counter() - start
+            totals[name]["pages"] += len(pages)
+            texts[name] = "\n".join(pages)
+            totals[name]["chars"] += len(texts[name])
+            totals[name]["docs"] += 1
+            for key, value in fidelity(texts[name]).items():
+                totals[name][key] += value
+
+        counts = {name: Counter(WORD.findall(text.lower())) for name, text in texts.items()}
+        for name in counts:
+            others = [word_overlap(counts[name], counts[other]) for other in counts if other != name]
+            if others:
+                totals[name]["agree"].append(sum(others) / len(others))
+
+    print("\n" + "=" * 60)
+    print(f"{'extractor':>10} {'pages':>6} {'seconds':>8} {'pages/s':>8} {'chars/pg':>9} "
+          f"{'agree':>6} {'glued %':>8} {'junk %':>7} {'fail':>5}")
+    for name, t in totals.items():
+        pages, docs = max(1, t["pages"]), max(1, t["docs"])
+        agree = sum(t["agree"]) / len(t["agree"]) if t["agree"] else float("nan")
+        print(f"{name:>10} {t['pages']:>6} {t['seconds']:>8.2f} {t['pages'] / t['seconds'] if t['seconds'] else 0:>8.1f} "
+              f"{t['chars'] / pages:>9.0f} {agree:>6.3f} {100 * t['glued'] / docs:>8.2f} {100 * t['junk'] / docs:>7.3f} "
+              f"{t['failures']:>5}")
+
+
+if __name__ == "__main__":
+    main()
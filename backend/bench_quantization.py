@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+Benchmark quantized vector storage: memory saved, search speed, recall@k lost
+
+Corpus vectors are read from the npte_materials collection in ./qdrant_data
+(synthetic clustered vectors if it is empty). --queries of them are held out
+as queries and the exact float32 top-k over the rest is the ground truth.
+
+Recall is measured by encoding the vectors the way Qdrant does (int8 over
+the 0.99 quantile range, 1 bit per dimension for binary), taking the top
+k * oversampling candidates by quantized score and, when rescoring, re-ranking
+them in float32. Embedded Qdrant searches exactly and ignores quantization,
+so search speed needs a Qdrant server:
+    docker run -p 6333:6333 qdrant/qdrant
+    python bench_quantization.py --url http://localhost:6333
+Choose a mode for the app with VECTOR_QUANTIZATION, VECTOR_ON_DISK and
+QUANTIZATION_OVERSAMPLING.
+"""
+
+import argparse
+import logging
+import statistics
+import time
+import warnings
+
+import numpy as np
+from qdrant_client import QdrantClient
+from qdrant_client.models import Distance, PointStruct, VectorParams
+
+from vector_quantization import QUANTIZATION_MODES, bytes_per_vector, quantization_config, quantization_search_params
+
+POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+def load_vectors(path: str, collection: str, synthetic: int, dimension: int, rng: np.random.Generator) -> tuple:
+    """Unit-length corpus vectors, and whether they came from the real collection"""
+    client = QdrantClient(path=path)
+    vectors = []
+    if client.collection_exists(collection):
+        offset = None
+        while True:
+            points, offset = client.scroll(collection, limit=1024, offset=offset, with_vectors=True, with_payload=False)
+            vectors.extend(point.vector for point in points)
+            if offset is None:
+                break
+    client.close()
+    if vectors:
+        matrix, real = np.asarray(vectors, dtype=np.float32), True
+    else:
+        # Topic-like clusters, so neighbours are meaningful
+        centres = rng.standard_normal((50, dimension), dtype=np.float32)
+        matrix = centres[rng.integers(50, size=synthetic)] + 0.6 * rng.standard_normal((synthetic, dimension), dtype=np.float32)
+        real = False
+    return matrix / np.linalg.norm(matrix, axis=1, keepdims=True), real
+
+
+def quantized_scores(mode: str, corpus: np.ndarray, queries: np.ndarray) -> np.ndarray:
+    """Approximate query-corpus scores as computed over Qdrant's quantized vectors"""
+    if mode == "int8":
+        low, high = np.quantile(corpus, [0.005, 0.995])
+        scale = (high - low) / 255
+
+        def encode(x):
+            return np.round((np.clip(x, low, high) - low) / scale) * scale + low
+
+        return encode(queries) @ encode(corpus).T
+    bits = np.packbits(corpus > 0, axis=1)
+    query_bits = np.packbits(queries > 0, axis=1)
+    return -np.stack([POPCOUNT[np.bitwise_xor(bits, q)].sum(axis=1, dtype=np.int32) for q in query_bits])
+
+
+def recall_at_k(scores: np.ndarray, exact: np.ndarray, truth: np.ndarray, k: int, oversampling: float, rescore: bool) -> float:
+    limit = max(k, int(k * oversampling))
+    candidates = np.argpartition(-scores, limit - 1, axis=1)[:, :limit]
+    if rescore:
+        order = np.argsort(-np.take_along_axis(exact, candidates, axis=1), axis=1)
+    else:
+        order = np.argsort(-np.take_along_axis(scores, candidates, axis=1), axis=1)
+    found = np.take_along_axis(candidates, order[:, :k], axis=1)
+    return float(np.mean([len(set(f) & set(t)) / k for f, t in zip(found, truth)]))
+
+
+def server_search(url: str, mode: str, corpus: np.ndarray, queries: np.ndarray, truth: np.ndarray, k: int,
+                  oversamplings: list) -> list:
+    """(oversampling, p50 ms, recall@k) per oversampling on a Qdrant server collection stored with `mode`"""
+    client = QdrantClient(url=url)
+    name = f"bench_quantization_{mode}"
+    if client.collection_exists(name):
+        client.delete_collection(name)
+    client.create_collection(
+        name,
+        vectors_config=VectorParams(size=corpus.shape[1], distance=Distance.COSINE, on_disk=mode != "none"),
+        quantization_config=quantization_config(mode),
+    )
+    for offset in range(0, len(corpus), 512):
+        client.upsert(name, points=[
+            PointStruct(id=offset + i, vector=vector.tolist()) for i, vector in enumerate(corpus[offset:offset + 512])
+        ], wait=True)
+    results = []
+    for oversampling in oversamplings:
+        params = quantization_search_params(mode, oversampling)
+        latencies, recalls = [], []
+        for query, expected in zip(queries, truth):
+            start = time.perf_counter()
+            points = client.query_points(name, query=query.tolist(), limit=k, search_params=params).points
+            latencies.append((time.perf_counter() - start) * 1000)
+            recalls.append(len({point.id for point in points} & set(expected.tolist())) / k)
+        results.append((oversampling, statistics.median(latencies), float(np.mean(recalls))))
+    client.delete_collection(name)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--qdrant-path", default="./qdrant_data")
+    parser.add_argument("--collection", default="npte_materials")
+    parser.add_argument("--url", help="Qdrant server URL for search-speed measurements")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--oversampling", type=float, nargs="+", default=[1.0, 2.0, 4.0])
+    parser.add_argument("--synthetic", type=int, default=20000, help="Vector count when the collection is empty")
+    parser.add_argument("--dimension", type=int, default=768)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.ERROR)
+    warnings.simplefilter("ignore", UserWarning)
+
+    rng = np.random.default_rng(0)
+    vectors, real = load_vectors(args.qdrant_path, args.collection, args.synthetic, args.dimension, rng)
+    held_out = rng.choice(len(vectors), size=min(args.queries, len(vectors) // 10), replace=False)
+    queries = vectors[held_out]
+    corpus = np.delete(vectors, held_out, axis=0)
+    exact = queries @ corpus.T
+    truth = np.argpartition(-exact, args.k - 1, axis=1)[:, :args.k]
+
+    print("🧪 Quantized vector storage benchmark")
+    print("=" * 60)
+    print(f"📄 {len(corpus)} {'corpus' if real else 'synthetic'} vectors x {corpus.shape[1]} dims, "
+          f"{len(queries)} held-out queries, k={args.k}")
+
+    print(f"\n{'mode':>7} {'RAM MB':>7} {'saved':>6} {'disk MB':>8}   (originals on disk when quantized)")
+    float_bytes = len(corpus) * bytes_per_vector("none", corpus.shape[1])
+    for mode in QUANTIZATION_MODES:
+        ram = len(corpus) * bytes_per_vector(mode, corpus.shape[1])
+        disk = float_bytes if mode != "none" else 0
+        print(f"{mode:>7} {ram / 1e6:>7.1f} {100 * (1 - ram / float_bytes):>5.0f}% {disk / 1e6:>8.1f}")
+
+    print(f"\n{'mode':>7} {'oversample':>10} {'recall':>7} {'rescored':>9}")
+    for mode in QUANTIZATION_MODES[1:]:
+        scores = quantized_scores(mode, corpus, queries)
+        for oversampling in args.oversampling:
+            plain = recall_at_k(scores, exact, truth, args.k, oversampling, rescore=False)
+            rescored = recall_at_k(scores, exact, truth, args.k, oversampling, rescore=True)
+            print(f"{mode:>7} {oversampling:>10.1f} {plain:>7.3f} {rescored:>9.3f}")
+
+    if not args.url:
+        print("\n⏱️  Search speed: pass --url to time a Qdrant server (embedded mode ignores quantization)")
+        return
+    print(f"\n{'mode':>7} {'oversample':>10} {'p50 ms':>7} {'recall':>7}   ({args.url})")
+    for mode in QUANTIZATION_MODES:
+        oversamplings = args.oversampling if mode != "none" else [1.0]
+        for oversampling, latency, recall in server_search(args.url, mode, corpus, queries, truth, args.k, oversamplings):
+            print(f"{mode:>7} {oversampling:>10.1f} {latency:>7.2f} {recall:>7.3f}")
+
+
+if __name__ == "__main__":
+    main()
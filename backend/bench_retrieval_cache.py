@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Benchmark the retrieval cache on a stream of MCQ context requests
+
+Replays --requests calls to get_rag_context over the NPTE topics (skewed
+toward the first topics, like real traffic) twice: once with the cache
+disabled and once enabled. Halfway through, the collection epoch is bumped,
+as an ingestion run would, to show invalidation. Needs an ingested collection
+and Ollama with nomic-embed-text (or `python ollama_stub.py --port 11501` and
+OLLAMA_HOST=http://localhost:11501). Stop the backend first; embedded Qdrant
+allows one process. Run:
+    python bench_retrieval_cache.py --requests 200
+"""
+
+import argparse
+import logging
+import random
+import statistics
+import time
+
+import rag_system
+from mcq_pool import NPTE_TOPICS
+from retrieval_cache import RetrievalCache
+
+
+def replay(rag, topics: list, bump_at: int) -> list:
+    latencies = []
+    for i, topic in enumerate(topics):
+        if i == bump_at:
+            rag.bump_collection_epoch()
+        start = time.perf_counter()
+        rag_system.get_rag_context(topic)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    logging.getLogger().setLevel(logging.ERROR)  # rag_system configures INFO on import
+
+    rng = random.Random(args.seed)
+    weights = [1 / (rank + 1) for rank in range(len(NPTE_TOPICS))]
+    topics = rng.choices(NPTE_TOPICS, weights=weights, k=args.requests)
+
+    print("🧪 Retrieval cache benchmark")
+    print("=" * 60)
+    rag = rag_system.initialize_rag_system()
+    print(f"🔎 {args.requests} requests over {len(NPTE_TOPICS)} topics, epoch bumped at request {args.requests // 2}")
+
+    rag.retrieval_cache = RetrievalCache(max_entries=0)
+    uncached = replay(rag, topics, args.requests // 2)
+    rag.retrieval_cache = RetrievalCache()
+    cached = replay(rag, topics, args.requests // 2)
+    stats = rag.retrieval_cache.stats()
+
+    print("\n" + "=" * 60)
+    print(f"{'cache':>9} {'p50 ms':>8} {'mean ms':>8} {'total s':>8}")
+    for name, latencies in (("disabled", uncached), ("enabled", cached)):
+        print(f"{name:>9} {statistics.median(latencies):>8.2f} {statistics.mean(latencies):>8.2f} "
+              f"{sum(latencies) / 1000:>8.2f}")
+    print(f"\n🎯 Result hit rate: {100 * stats['results']['hit_rate']:.1f}% "
+          f"({stats['results']['hits']} hits, {stats['invalidated']} invalidated by the epoch bump)")
+    print(f"🧮 Embedding hit rate: {100 * stats['embeddings']['hit_rate']:.1f}%")
+    print(f"⏱️  Latency saved: {stats['saved_seconds']:.2f} s "
+          f"({(sum(uncached) - sum(cached)) / 1000:.2f} s measured)")
+
+
+if __name__ == "__main__":
+    main()
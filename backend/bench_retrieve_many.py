@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Benchmark batched multi-query retrieval against a loop of single queries
+
+  loop  - retrieve_relevant_context per query (one embedding round trip and
+          one search each)
+  batch - retrieve_many (one batched embedding call, one Qdrant batch search)
+
+Queries are MCQ-style prompts over the NPTE topics with a per-run nonce, so
+neither path is served from the embedding or retrieval caches, and context
+pools are disabled. Results of both paths are compared for alignment. Needs
+an ingested collection and Ollama with nomic-embed-text (or
+`python ollama_stub.py --port 11501` and OLLAMA_HOST=http://localhost:11501).
+Stop the backend first; embedded Qdrant allows one process. Run:
+    python bench_retrieve_many.py --queries 50 200
+"""
+
+import argparse
+import logging
+import time
+import uuid
+
+from mcq_pool import NPTE_TOPICS
+from rag_system import NPTERAGSystem
+from retrieval_cache import RetrievalCache
+
+ASPECTS = ["examination findings", "contraindications", "interventions", "outcome measures", "red flags"]
+
+
+def make_queries(count: int) -> tuple:
+    nonce = uuid.uuid4().hex[:8]
+    queries, topics = [], []
+    for i in range(count):
+        topic = NPTE_TOPICS[i % len(NPTE_TOPICS)]
+        queries.append(f"{ASPECTS[i % len(ASPECTS)]} for a patient case ({nonce}-{i})")
+        topics.append(topic)
+    return queries, topics
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--queries", type=int, nargs="+", default=[50, 200])
+    parser.add_argument("--k", type=int, default=5)
+    args = parser.parse_args()
+    logging.getLogger().setLevel(logging.ERROR)  # rag_system configures INFO on import
+
+    rag = NPTERAGSystem()
+    rag.context_pool_size = 0
+    if rag.vector_backend != "flat" or not rag.open_flat_index():
+        rag.setup_collection()
+
+    print("🧪 Batched retrieval benchmark")
+    print("=" * 60)
+    print(f"🔎 k={args.k}, backend={'flat index' if rag.flat_index is not None else 'qdrant'}")
+
+    results = []
+    for count in args.queries:
+        print(f"\n▶ {count} queries")
+        rag.retrieval_cache = RetrievalCache(max_entries=0)
+        queries, topics = make_queries(count)
+        start = time.perf_counter()
+        looped = [rag.retrieve_relevant_context(query, topic, k=args.k) for query, topic in zip(queries, topics)]
+        loop_seconds = time.perf_counter() - start
+
+        queries, topics = make_queries(count)
+        start = time.perf_counter()
+        batched = rag.retrieve_many(queries, topics, k=args.k)
+        batch_seconds = time.perf_counter() - start
+        # Same query text must give the same chunks in the same slot
+        check = rag.retrieve_many(queries[:20], topics[:20], k=args.k)
+        aligned = all(
+            [doc.page_content for doc in a] == [doc.page_content for doc in b]
+            for a, b in zip(check, [rag.retrieve_relevant_context(q, t, k=args.k) for q, t in zip(queries[:20], topics[:20])])
+        )
+        results.append({"count": count, "loop": loop_seconds, "batch": batch_seconds, "aligned": aligned,
+                        "empty": sum(1 for docs in batched if not docs) + sum(1 for docs in looped if not docs)})
+
+    print("\n" + "=" * 60)
+    print(f"{'queries':>8} {'loop s':>8} {'batch s':>8} {'loop q/s':>9} {'batch q/s':>10} {'speed-up':>9} {'aligned':>8}")
+    for r in results:
+        print(f"{r['count']:>8} {r['loop']:>8.2f} {r['batch']:>8.2f} {r['count'] / r['loop']:>9.1f} "
+              f"{r['count'] / r['batch']:>10.1f} {r['loop'] / r['batch']:>8.2f}x {'yes' if r['aligned'] else 'NO':>8}")
+    if any(r["empty"] for r in results):
+        print("\n⚠️  Some queries returned no context; is the collection ingested?")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,299 @@
+"""
+Persistent BM25 index for hybrid lexical + dense retrieval
+Memory-mapped inverted index over the chunk collection, fused with dense results by reciprocal rank
+"""
+
+import json
+import logging
+import math
+import mmap
+import os
+import re
+import uuid
+from collections import Counter
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from langchain.schema import Document
+
+logger = logging.getLogger(__name__)
+
+TOKENIZER_VERSION = "1"
+_TOKEN = re.compile(r"[a-z0-9]+")
+_STOPWORDS = frozenset(
+    "a an and are as at be by for from in into is it of on or that the this to was were which with about "
+    "what when where who how not no can may should will".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased word tokens with possessive/plural "s" folded, e.g. "Kleiger's tests" -> kleiger, test
+
+    Apostrophes are dropped first, as the chunk normalizer drops them, so
+    query and chunk text fold the same way. Digits stay attached ("fev1").
+    """
+    tokens = []
+    for token in _TOKEN.findall(text.lower().replace("'", "").replace("’", "")):
+        if token in _STOPWORDS or (len(token) == 1 and not token.isdigit()):
+            continue
+        if len(token) > 3 and token.endswith("s") and not token.endswith(("ss", "us", "is")):
+            token = token[:-1]
+        tokens.append(token)
+    return tokens
+
+
+def chunk_key(doc: Document) -> Tuple:
+    """Identity of a chunk across result lists"""
+    return doc.metadata.get("source"), doc.metadata.get("chunk_id")
+
+
+def reciprocal_rank_fusion(result_lists: Sequence[List[Document]], k: int, rank_constant: int = 60) -> List[Document]:
+    """Merge ranked lists by sum of 1 / (rank_constant + rank); the first list's Document wins for duplicates"""
+    scores: Dict[Tuple, float] = {}
+    documents: Dict[Tuple, Document] = {}
+    for results in result_lists:
+        for rank, doc in enumerate(results, start=1):
+            key = chunk_key(doc)
+            scores[key] = scores.get(key, 0.0) + 1.0 / (rank_constant + rank)
+            documents.setdefault(key, doc)
+    best = sorted(scores, key=scores.get, reverse=True)[:k]
+    return [
+        Document(page_content=documents[key].page_content, metadata={**documents[key].metadata, "score": scores[key]})
+        for key in best
+    ]
+
+
+class BM25Index:
+    """Okapi BM25 over chunk text, stored as a memory-mapped CSR inverted index
+
+    On disk (one directory, one set of files per generation, as FlatIndex):
+      meta.json             - generation, document count, k1, b, topic names
+      terms-<gen>.bin       - sorted vocabulary, newline-separated UTF-8
+      term_offsets-<gen>.npy - (V + 1,) int64 byte offsets into terms.bin
+      postings-<gen>.npy    - (V + 1,) int64 start of each term's postings
+      doc_ids-<gen>.npy     - (nnz,) uint32 row of each posting
+      weights-<gen>.npy     - (nnz,) float32 precomputed BM25 term weight
+      topics-<gen>.npy      - (n,) uint16 index into meta["topics"]
+      payloads-<gen>.jsonl + offsets-<gen>.npy - chunk text and metadata per row
+    BM25 weights (idf times the saturated, length-normalized tf) are
+    computed at build time. A query then costs one binary search per term
+    and one vectorized scatter-add over that term's postings. Nothing is
+    parsed at open, so the index cold-starts in milliseconds and is
+    shared between processes through the page cache.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = Path(directory)
+        self._meta_mtime = None
+        self._files = []
+        self._maps = []
+        self._masks: Dict[str, np.ndarray] = {}
+        self._open()
+
+    @staticmethod
+    def exists(directory: str) -> bool:
+        """Whether an index built with the current tokenizer is in `directory`; an older one needs a rebuild"""
+        try:
+            meta = json.loads((Path(directory) / "meta.json").read_text())
+        except (OSError, ValueError):
+            return False
+        return meta.get("tokenizer") == TOKENIZER_VERSION
+
+    def _open(self):
+        try:
+            self._load_generation()
+        except FileNotFoundError:
+            # A writer published and cleaned up between reading meta.json and the data files
+            self._load_generation()
+
+    def _map(self, path: Path):
+        file = open(path, "rb")
+        size = os.fstat(file.fileno()).st_size
+        self._files.append(file)
+        if not size:
+            return b""
+        mapped = mmap.mmap(file.fileno(), size, access=mmap.ACCESS_READ)
+        self._maps.append(mapped)
+        return mapped
+
+    def _load_generation(self):
+        meta_path = self.directory / "meta.json"
+        self._meta_mtime = meta_path.stat().st_mtime_ns
+        meta = json.loads(meta_path.read_text())
+        if meta.get("tokenizer") != TOKENIZER_VERSION:
+            # Queries would be tokenized differently from the stored postings
+            raise ValueError(
+                f"BM25 index {self.directory} was built with tokenizer version {meta.get('tokenizer')}, "
+                f"not {TOKENIZER_VERSION}; rebuild it"
+            )
+        generation = meta["generation"]
+        self.count = meta["count"]
+        self.topics: List[str] = meta["topics"]
+        arrays = {
+            name: np.load(self.directory / f"{name}-{generation}.npy", mmap_mode="r")
+            for name in ("term_offsets", "postings", "doc_ids", "weights", "topics", "offsets")
+        }
+        self.close()
+        self.term_offsets, self.postings = arrays["term_offsets"], arrays["postings"]
+        self.doc_ids, self.weights = arrays["doc_ids"], arrays["weights"]
+        self.topic_codes, self.offsets = arrays["topics"], arrays["offsets"]
+        self._terms = self._map(self.directory / f"terms-{generation}.bin")
+        self._payloads = self._map(self.directory / f"payloads-{generation}.jsonl")
+        self._masks = {}
+
+    def close(self):
+        for mapped in self._maps:
+            mapped.close()
+        for file in self._files:
+            file.close()
+        self._files, self._maps = [], []
+
+    def refresh(self) -> bool:
+        """Switch to a newer generation if one was published; True if it did"""
+        if (self.directory / "meta.json").stat().st_mtime_ns == self._meta_mtime:
+            return False
+        try:
+            self._open()
+        except ValueError as e:
+            # Published by a build with another tokenizer; keep serving the generation already open
+            logger.warning(f"Not switching BM25 index generation: {e}")
+            self._meta_mtime = (self.directory / "meta.json").stat().st_mtime_ns
+            return False
+        return True
+
+    def __len__(self) -> int:
+        return self.count
+
+    def _term_id(self, term: bytes) -> int:
+        """Binary search of the sorted vocabulary; -1 if absent"""
+        low, high = 0, len(self.term_offsets) - 1
+        while low < high:
+            middle = (low + high) // 2
+            found = self._terms[int(self.term_offsets[middle]):int(self.term_offsets[middle + 1]) - 1]
+            if found < term:
+                low = middle + 1
+            elif found > term:
+                high = middle
+            else:
+                return middle
+        return -1
+
+    def document_frequency(self, term: str) -> int:
+        """Number of chunks containing an already-tokenized term"""
+        term_id = self._term_id(term.encode("utf-8"))
+        return 0 if term_id < 0 else int(self.postings[term_id + 1] - self.postings[term_id])
+
+    def _topic_mask(self, topic: str) -> np.ndarray:
+        if topic not in self._masks:
+            code = self.topics.index(topic) if topic in self.topics else -1
+            self._masks[topic] = np.asarray(self.topic_codes) == code
+        return self._masks[topic]
+
+    def search_rows(self, query: str, k: int = 5, topic: Optional[str] = None) -> List[Tuple[int, float]]:
+        """(row, BM25 score) of the top-k matching rows, best first"""
+        self.refresh()
+        scores = np.zeros(self.count, dtype=np.float32)
+        for term in tokenize(query):
+            term_id = self._term_id(term.encode("utf-8"))
+            if term_id < 0:
+                continue
+            start, end = int(self.postings[term_id]), int(self.postings[term_id + 1])
+            # A term lists each row at most once, so fancy-index += is a correct scatter-add
+            scores[self.doc_ids[start:end]] += self.weights[start:end]
+        if topic:
+            scores[~self._topic_mask(topic)] = 0.0
+        matches = np.flatnonzero(scores)
+        if not len(matches):
+            return []
+        k = min(k, len(matches))
+        top = matches[np.argpartition(-scores[matches], k - 1)[:k]]
+        top = top[np.argsort(-scores[top])]
+        return [(int(row), float(scores[row])) for row in top]
+
+    def payload(self, row: int) -> Dict:
+        return json.loads(self._payloads[int(self.offsets[row]):int(self.offsets[row + 1])])
+
+    def search(self, query: str, k: int = 5, topic: Optional[str] = None) -> List[Document]:
+        """Top-k chunks by BM25, shaped like NPTERAGSystem.search_by_vector results"""
+        documents = []
+        for row, score in self.search_rows(query, k, topic):
+            payload = self.payload(row)
+            documents.append(Document(
+                page_content=payload.get("page_content") or "",
+                metadata={**(payload.get("metadata") or {}), "score": score},
+            ))
+        return documents
+
+    @classmethod
+    def build(cls, directory: str, payloads: List[Dict], k1: float = 1.2, b: float = 0.75) -> "BM25Index":
+        """Index the payloads' page_content as a new generation"""
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        term_counts = [Counter(tokenize(payload.get("page_content") or "")) for payload in payloads]
+        lengths = np.array([sum(counts.values()) for counts in term_counts], dtype=np.float32)
+        average = float(lengths.mean()) if len(lengths) and lengths.mean() > 0 else 1.0
+
+        rows_by_term: Dict[str, List[Tuple[int, int]]] = {}
+        for row, counts in enumerate(term_counts):
+            for term, tf in counts.items():
+                rows_by_term.setdefault(term, []).append((row, tf))
+        terms = sorted(rows_by_term, key=lambda term: term.encode("utf-8"))
+
+        postings = np.zeros(len(terms) + 1, dtype=np.int64)
+        np.cumsum([len(rows_by_term[term]) for term in terms], out=postings[1:])
+        doc_ids = np.empty(int(postings[-1]), dtype=np.uint32)
+        weights = np.empty(int(postings[-1]), dtype=np.float32)
+        for i, term in enumerate(terms):
+            rows = np.array(rows_by_term[term], dtype=np.int64).reshape(-1, 2)
+            idf = math.log(1 + (len(payloads) - len(rows) + 0.5) / (len(rows) + 0.5))
+            tf = rows[:, 1].astype(np.float32)
+            norm = k1 * (1 - b + b * lengths[rows[:, 0]] / average)
+            doc_ids[postings[i]:postings[i + 1]] = rows[:, 0]
+            weights[postings[i]:postings[i + 1]] = idf * tf * (k1 + 1) / (tf + norm)
+
+        encoded_terms = [term.encode("utf-8") + b"\n" for term in terms]
+        term_offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+        np.cumsum([len(term) for term in encoded_terms], out=term_offsets[1:])
+        topics = sorted({(payload.get("metadata") or {}).get("topic") or "" for payload in payloads})
+        codes = {topic: i for i, topic in enumerate(topics)}
+        topic_codes = np.array([codes[(p.get("metadata") or {}).get("topic") or ""] for p in payloads], dtype=np.uint16)
+        encoded = [json.dumps(payload, ensure_ascii=False).encode("utf-8") for payload in payloads]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(line) for line in encoded], out=offsets[1:])
+
+        generation = uuid.uuid4().hex[:12]
+        for name, array in (("term_offsets", term_offsets), ("postings", postings), ("doc_ids", doc_ids),
+                            ("weights", weights), ("topics", topic_codes), ("offsets", offsets)):
+            np.save(directory / f"{name}-{generation}.npy", array)
+        (directory / f"terms-{generation}.bin").write_bytes(b"".join(encoded_terms))
+        (directory / f"payloads-{generation}.jsonl").write_bytes(b"".join(encoded))
+
+        meta = {"generation": generation, "count": len(payloads), "terms": len(terms), "k1": k1, "b": b,
+                "tokenizer": TOKENIZER_VERSION, "topics": topics}
+        tmp_path = directory / "meta.json.tmp"
+        tmp_path.write_text(json.dumps(meta))
+        os.replace(tmp_path, directory / "meta.json")
+        # Open mappings of older generations stay valid after unlink
+        for path in directory.iterdir():
+            if "-" in path.stem and not path.stem.endswith(generation):
+                path.unlink()
+        logger.info(f"Wrote BM25 index generation {generation}: {len(payloads)} chunks, {len(terms)} terms to {directory}")
+        return cls(str(directory))
+
+    @classmethod
+    def from_qdrant(cls, client, collection_name: str, directory: str,
+                    content_key: str = "page_content", metadata_key: str = "metadata") -> "BM25Index":
+        """Index every chunk of a Qdrant collection, in point-id order"""
+        points_by_id = {}
+        offset = None
+        while True:
+            points, offset = client.scroll(collection_name, limit=1024, offset=offset, with_payload=True, with_vectors=False)
+            for point in points:
+                points_by_id[str(point.id)] = {
+                    "page_content": point.payload.get(content_key),
+                    "metadata": point.payload.get(metadata_key) or {},
+                }
+            if offset is None:
+                break
+        return cls.build(directory, [points_by_id[point_id] for point_id in sorted(points_by_id)])
@@ -73,12 +73,12 @@ def check_rag_system():
         print("✅ RAG system initialized successfully")
         
         # Check if vector store has data
-        if rag.vector_store:
+        if rag.vector_store or rag.flat_index:
             print("✅ Vector store is available")
             
             # Try to get some documents
             try:
-                docs = rag.vector_store.similarity_search("NPTE", k=1)
+                docs = rag.retrieve_relevant_context("NPTE", k=1)
                 if docs:
                     print(f"✅ Vector store has {len(docs)} document(s) available")
                     return True
@@ -0,0 +1,63 @@
+"""
+Precomputed per-topic context pools for MCQ generation
+A deep top-N candidate list per topic, sampled per request instead of searched
+"""
+
+import heapq
+import math
+import random
+from collections import Counter
+from typing import List, Optional
+
+from langchain.schema import Document
+
+
+class ContextPool:
+    """The top-N chunks for one topic's query, sampled into diverse top-k sets
+
+    Sampling is weighted without replacement (Efraimidis-Spirakis keys),
+    with weights exp((score - best) / temperature). Close matches dominate,
+    but deeper chunks still appear, so consecutive MCQs for a topic see
+    different context. At most `per_source` chunks come from one source
+    file unless the pool runs out of other sources. A pool is tied to the
+    query and collection epoch it was built for; the caller rebuilds it
+    when either changes. Sampled Documents are shared, so treat them as
+    read-only.
+    """
+
+    def __init__(self, topic: str, query: str, documents: List[Document], epoch: int,
+                 temperature: float = 0.05, per_source: int = 1):
+        self.topic = topic
+        self.query = query
+        self.documents = documents
+        self.epoch = epoch
+        self.per_source = per_source
+        scores = [doc.metadata.get("score", 0.0) for doc in documents]
+        best = max(scores, default=0.0)
+        self._weights = [math.exp((score - best) / temperature) for score in scores]
+        self._sources = [doc.metadata.get("source") for doc in documents]
+
+    def __len__(self) -> int:
+        return len(self.documents)
+
+    def sample(self, k: int, rng: Optional[random.Random] = None) -> List[Document]:
+        """k distinct chunks, relevance-weighted and spread across source files"""
+        rng = rng or random
+        # random() ** (1 / w): the k largest keys are a weighted sample without replacement
+        order = heapq.nlargest(
+            min(len(self.documents), 4 * k + self.per_source * k),
+            range(len(self.documents)),
+            key=lambda i: rng.random() ** (1.0 / self._weights[i]) if self._weights[i] > 0 else 0.0,
+        )
+        picked, skipped, per_source = [], [], Counter()
+        for i in order:
+            if per_source[self._sources[i]] < self.per_source:
+                picked.append(i)
+                per_source[self._sources[i]] += 1
+                if len(picked) == k:
+                    break
+            else:
+                skipped.append(i)
+        picked.extend(skipped[:k - len(picked)])
+        # Present in relevance order, like a search result
+        return [self.documents[i] for i in sorted(picked)]
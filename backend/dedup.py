@@ -0,0 +1,178 @@
+"""
+Duplicate detection for the NPTE RAG ingestion pipeline
+Identical files are grouped by content hash; near-duplicate chunks are found with shingled MinHash and LSH banding
+"""
+
+import logging
+import os
+import re
+import zlib
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Mersenne prime modulus for the MinHash permutations
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+
+
+def group_identical_files(hashes: Dict[str, str]) -> Dict[str, List[str]]:
+    """Map each canonical file to the other paths with the same content hash
+
+    The shallowest path wins (then the lexically first), so `documents/x.pdf`
+    is preferred over its copy in `documents/data/x.pdf`.
+    """
+    by_hash: Dict[str, List[str]] = {}
+    for file_path, sha256 in hashes.items():
+        by_hash.setdefault(sha256, []).append(file_path)
+
+    groups = {}
+    for paths in by_hash.values():
+        paths.sort(key=lambda path: (len(Path(path).parts), path))
+        groups[paths[0]] = paths[1:]
+    return groups
+
+
+class MinHashIndex:
+    """Near-duplicate chunk index: MinHash signatures bucketed by LSH bands
+
+    Two chunks become candidates when any of `bands` signature bands match
+    exactly; a candidate counts as a duplicate only if its estimated Jaccard
+    similarity over word shingles is at least `threshold`. With 128
+    permutations in 16 bands of 8 rows, pairs above ~0.7 similarity are
+    almost always caught.
+    """
+
+    def __init__(self, num_perm: int = 128, bands: int = 16, threshold: float = 0.85, shingle_size: int = 5, seed: int = 1):
+        if num_perm % bands:
+            raise ValueError("num_perm must be divisible by bands")
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.threshold = threshold
+        self.shingle_size = shingle_size
+        self.seed = seed
+
+        generator = np.random.RandomState(seed)
+        self._a = generator.randint(1, 1 << 32, size=num_perm, dtype=np.uint64)
+        self._b = generator.randint(0, 1 << 32, size=num_perm, dtype=np.uint64)
+
+        self.ids: List[str] = []
+        self.sources: List[str] = []
+        self.signatures = np.empty((0, num_perm), dtype=np.uint32)
+        self._pending: List[np.ndarray] = []
+        self._buckets: List[Dict[bytes, List[int]]] = [{} for _ in range(bands)]
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def _shingles(self, text: str) -> np.ndarray:
+        words = re.findall(r"\w+", text.lower())
+        if len(words) < self.shingle_size:
+            words = words + [""] * (self.shingle_size - len(words))
+        return np.fromiter(
+            (zlib.crc32(" ".join(words[i:i + self.shingle_size]).encode("utf-8"))
+             for i in range(len(words) - self.shingle_size + 1)),
+            dtype=np.uint64,
+        )
+
+    def signature(self, text: str) -> np.ndarray:
+        """MinHash signature of the text's word shingles"""
+        shingles = self._shingles(text)
+        hashed = (np.outer(shingles, self._a) + self._b) % _MERSENNE_PRIME & _MAX_HASH
+        return hashed.min(axis=0).astype(np.uint32)
+
+    def _band_keys(self, signature: np.ndarray) -> Iterable[bytes]:
+        for band in range(self.bands):
+            yield signature[band * self.rows:(band + 1) * self.rows].tobytes()
+
+    def _signature_at(self, row: int) -> np.ndarray:
+        stored = len(self.signatures)
+        return self.signatures[row] if row < stored else self._pending[row - stored]
+
+    def find(self, signature: np.ndarray, exclude_source: Optional[str] = None) -> Optional[Tuple[str, str]]:
+        """(point id, source) of an indexed near-duplicate from another file than `exclude_source`, or None"""
+        seen = set()
+        for band, key in enumerate(self._band_keys(signature)):
+            for row in self._buckets[band].get(key, ()):
+                if row in seen or self.sources[row] == exclude_source:
+                    continue
+                seen.add(row)
+                if np.mean(self._signature_at(row) == signature) >= self.threshold:
+                    return self.ids[row], self.sources[row]
+        return None
+
+    def add(self, point_id: str, source: str, signature: np.ndarray):
+        row = len(self.ids)
+        self.ids.append(point_id)
+        self.sources.append(source)
+        self._pending.append(signature)
+        for band, key in enumerate(self._band_keys(signature)):
+            self._buckets[band].setdefault(key, []).append(row)
+
+    def _flush(self):
+        if self._pending:
+            self.signatures = np.vstack([self.signatures, np.stack(self._pending)])
+            self._pending = []
+
+    def _rebuild_buckets(self):
+        self._buckets = [{} for _ in range(self.bands)]
+        for row, signature in enumerate(self.signatures):
+            for band, key in enumerate(self._band_keys(signature)):
+                self._buckets[band].setdefault(key, []).append(row)
+
+    def remove_sources(self, sources: Iterable[str]):
+        """Forget every chunk indexed from the given files"""
+        sources = set(sources)
+        if not sources:
+            return
+        self._flush()
+        keep = [row for row, source in enumerate(self.sources) if source not in sources]
+        if len(keep) == len(self.ids):
+            return
+        self.ids = [self.ids[row] for row in keep]
+        self.sources = [self.sources[row] for row in keep]
+        self.signatures = self.signatures[keep]
+        self._rebuild_buckets()
+
+    def clear(self):
+        self.remove_sources(set(self.sources))
+
+    def _settings(self) -> np.ndarray:
+        return np.array([self.num_perm, self.shingle_size, self.seed])
+
+    def save(self, path: str):
+        """Persist signatures so later incremental runs dedupe against the whole collection"""
+        self._flush()
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = f"{path}.tmp.npz"
+        np.savez(
+            tmp_path,
+            settings=self._settings(),
+            ids=np.array(self.ids, dtype=str),
+            sources=np.array(self.sources, dtype=str),
+            signatures=self.signatures,
+        )
+        os.replace(tmp_path, path)
+
+    def load(self, path: str):
+        if not os.path.exists(path):
+            return
+        try:
+            with np.load(path) as data:
+                settings = data["settings"]
+                signatures = data["signatures"]
+                ids, sources = data["ids"].tolist(), data["sources"].tolist()
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Ignoring unreadable MinHash index {path}: {e}")
+            return
+        if not np.array_equal(settings, self._settings()):
+            # Signatures from other permutations or shingles are not comparable
+            logger.warning(f"Ignoring MinHash index {path} built with different settings")
+            return
+        self.ids, self.sources, self.signatures = ids, sources, signatures.astype(np.uint32)
+        self._pending = []
+        self._rebuild_buckets()
@@ -0,0 +1,314 @@
+"""
+Document extraction and chunking for the NPTE RAG system
+Kept free of vector-store state so it can run in worker processes
+"""
+
+import logging
+import re
+from bisect import bisect_right
+from pathlib import Path
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+from langchain.schema import Document
+
+# Document processing
+import docx
+
+from ingestion_manifest import pipeline_fingerprint
+from pdf_extractors import PyPDF2Extractor, get_pdf_extractor
+from text_chunker import SentenceChunker, normalize_text
+
+logger = logging.getLogger(__name__)
+
+SUPPORTED_SUFFIXES = {".pdf": "pdf", ".docx": "docx", ".doc": "docx", ".txt": "txt", ".md": "txt"}
+
+# Bump whenever extraction or cleaning changes, so the ingestion manifest re-indexes every file
+EXTRACTOR_VERSION = "3"
+
+_KIND_LABELS = {"pdf": "PDF", "docx": "DOCX", "txt": "text file"}
+
+# "sentence": single-pass normalizer + SentenceChunker; "recursive": _clean_text + LangChain splitter
+CHUNKERS = ("sentence", "recursive")
+
+
+class DocumentProcessor:
+    """Extracts, cleans and splits PDF, DOCX and text files into chunks"""
+
+    def __init__(
+        self,
+        chunk_size: int = 800,
+        chunk_overlap: int = 100,
+        separators: Optional[List[str]] = None,
+        pdf_extractor: Optional[str] = None,
+        chunker: str = "sentence",
+    ):
+        if chunker not in CHUNKERS:
+            raise ValueError(f"Unknown chunker {chunker!r}; choose from {CHUNKERS}")
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.separators = separators or ["\n\n", "\n", ". ", " ", ""]
+        self.pdf_extractor = get_pdf_extractor(pdf_extractor)
+        self.text_splitter = RecursiveCharacterTextSplitter(
+            chunk_size=chunk_size,         # Optimal for research paper precision
+            chunk_overlap=chunk_overlap,   # Minimal overlap for dense content
+            separators=self.separators
+        )
+        self.chunker_name = chunker
+        if chunker == "sentence":
+            self.chunker = SentenceChunker(chunk_size, chunk_overlap)
+            self._normalize = normalize_text
+        else:
+            self.chunker = self.text_splitter
+            self._normalize = self._clean_text
+
+    def fingerprint(self) -> str:
+        """Identifies the extractor and splitter settings behind this processor's chunks"""
+        return pipeline_fingerprint(
+            f"{EXTRACTOR_VERSION}:{self.pdf_extractor.name}:{self.chunker_name}",
+            self.chunk_size, self.chunk_overlap, self.separators,
+        )
+
+    def process_file(self, file_path: str) -> List[Document]:
+        """Dispatch on file extension; unsupported files yield no chunks"""
+        kind = SUPPORTED_SUFFIXES.get(Path(file_path).suffix.lower())
+        if kind == "pdf":
+            return self.process_pdf(file_path)
+        if kind == "docx":
+            return self.process_docx(file_path)
+        if kind == "txt":
+            return self.process_text_file(file_path)
+        logger.info(f"Skipping unsupported file: {file_path}")
+        return []
+
+    def iter_file(self, file_path: str) -> Iterator[Document]:
+        """Stream one file's chunks without holding the whole text; extraction errors propagate"""
+        kind = SUPPORTED_SUFFIXES.get(Path(file_path).suffix.lower())
+        if kind is None:
+            logger.info(f"Skipping unsupported file: {file_path}")
+            return
+        units = {
+            "pdf": self.iter_pdf_pages,
+            "docx": self.iter_docx_paragraphs,
+            "txt": self.iter_text_paragraphs,
+        }[kind](file_path)
+        count = 0
+        for document in self._chunk_units(units, file_path, kind):
+            count += 1
+            yield document
+        logger.info(f"Processed {_KIND_LABELS[kind]}: {file_path} -> {count} chunks")
+
+    def process_pdf(self, file_path: str) -> List[Document]:
+        """Extract text from PDF and split into chunks"""
+        try:
+            return list(self._chunk_units(self.iter_pdf_pages(file_path), file_path, "pdf"))
+        except Exception as e:
+            logger.error(f"Error processing PDF {file_path}: {e}")
+            return []
+
+    def process_docx(self, file_path: str) -> List[Document]:
+        """Extract text from DOCX and split into chunks"""
+        try:
+            return list(self._chunk_units(self.iter_docx_paragraphs(file_path), file_path, "docx"))
+        except Exception as e:
+            logger.error(f"Error processing DOCX {file_path}: {e}")
+            return []
+
+    def process_text_file(self, file_path: str) -> List[Document]:
+        """Process plain text files"""
+        try:
+            return list(self._chunk_units(self.iter_text_paragraphs(file_path), file_path, "txt"))
+        except Exception as e:
+            logger.error(f"Error processing text file {file_path}: {e}")
+            return []
+
+    def iter_pdf_pages(self, file_path: str) -> Iterator[Tuple[int, str]]:
+        """(page number, text) per page; falls back to PyPDF2 if the primary extractor fails up front"""
+        yielded = False
+        try:
+            for number, text in enumerate(self.pdf_extractor.extract_pages(file_path), start=1):
+                yielded = True
+                yield number, text
+        except Exception as e:
+            if yielded or isinstance(self.pdf_extractor, PyPDF2Extractor):
+                raise
+            logger.warning(f"{self.pdf_extractor.name} failed on {file_path} ({e}); falling back to PyPDF2")
+            yield from enumerate(PyPDF2Extractor().extract_pages(file_path), start=1)
+
+    def iter_docx_paragraphs(self, file_path: str) -> Iterator[Tuple[int, str]]:
+        """(page number, text) per paragraph; pages follow the breaks Word recorded, so they are approximate"""
+        page = 1
+        for paragraph in docx.Document(file_path).paragraphs:
+            if paragraph._p.xpath("./w:r/w:br[@w:type='page'] | ./w:r/w:lastRenderedPageBreak"):
+                page += 1
+            yield page, paragraph.text
+
+    def iter_text_paragraphs(self, file_path: str, max_unit_chars: int = 65536) -> Iterator[Tuple[int, str]]:
+        """(page number, text) per blank-line separated paragraph; form feeds start a new page"""
+        page = 1
+        lines: List[str] = []
+        size = 0
+        with open(file_path, 'r', encoding='utf-8') as file:
+            for line in file:
+                for i, part in enumerate(line.split("\f")):
+                    if i:
+                        if lines:
+                            yield page, "".join(lines)
+                            lines, size = [], 0
+                        page += 1
+                    lines.append(part)
+                    size += len(part)
+                    if (not part.strip() or size >= max_unit_chars) and lines:
+                        yield page, "".join(lines)
+                        lines, size = [], 0
+        if lines:
+            yield page, "".join(lines)
+
+    def _chunk_units(self, units: Iterable[Tuple[int, str]], file_path: str, doc_type: str) -> Iterator[Document]:
+        """Clean and split a stream of (page, text) units into chunks with metadata
+
+        Cleaned text collects in a window of about eight chunks. When the
+        window fills, every chunk but the last is emitted and the window
+        restarts at the last chunk, which already begins with the overlap
+        from the chunk before it, so overlap carries across page boundaries
+        while memory stays bounded by the window plus one page.
+
+        The sentence chunker's cuts depend only on nearby text, so its
+        streamed chunks match a whole-document split. The recursive
+        splitter only sees one window at a time: with CHUNKER=recursive,
+        boundaries can differ from a whole-document split, and re-ingesting
+        a collection built before page streaming moves them. No text is
+        lost either way.
+        """
+        topic = self._extract_topic_from_filename(file_path)
+        window = 8 * self.chunk_size
+        buffer = ""
+        pages: List[Tuple[int, int]] = []  # (offset in buffer, page) where each unit starts
+        chunk_id = 0
+
+        def documents(chunks):
+            nonlocal chunk_id
+            for chunk, page in chunks:
+                yield Document(
+                    page_content=chunk,
+                    metadata={
+                        "source": file_path,
+                        "chunk_id": chunk_id,
+                        "type": doc_type,
+                        "topic": topic,
+                        "page": page,
+                    }
+                )
+                chunk_id += 1
+
+        for page, text in units:
+            text = self._normalize(text)
+            if not text:
+                continue
+            if buffer:
+                buffer += " "
+            pages.append((len(buffer), page))
+            buffer += text
+            if len(buffer) >= window:
+                chunks, buffer, pages = self._split_window(buffer, pages, final=False)
+                yield from documents(chunks)
+        if buffer:
+            chunks, _, _ = self._split_window(buffer, pages, final=True)
+            yield from documents(chunks)
+
+    def _split_window(self, buffer: str, pages: List[Tuple[int, int]], final: bool):
+        """Split the window; returns ((chunk, page) to emit, carried buffer, carried page offsets)"""
+        located = []
+        search_from = 0
+        for chunk in self.chunker.split_text(buffer):
+            start = buffer.find(chunk, search_from)
+            start = search_from if start < 0 else start
+            located.append((chunk, start))
+            search_from = start + 1
+
+        offsets = [offset for offset, _ in pages]
+
+        def page_at(position: int) -> int:
+            return pages[max(0, bisect_right(offsets, position) - 1)][1]
+
+        if final or not located:
+            return [(chunk, page_at(start)) for chunk, start in located], "", []
+
+        emit, (_, carry_start) = located[:-1], located[-1]
+        carried_pages = [(0, page_at(carry_start))] + [
+            (offset - carry_start, page) for offset, page in pages if offset > carry_start
+        ]
+        return [(chunk, page_at(start)) for chunk, start in emit], buffer[carry_start:], carried_pages
+
+    def _clean_text(self, text: str) -> str:
+        """Clean and normalize text"""
+        # Remove extra whitespace
+        text = re.sub(r'\s+', ' ', text)
+        # Remove special characters that might interfere
+        text = re.sub(r'[^\w\s\.\,\!\?\;\:\-\(\)]', '', text)
+        return text.strip()
+
+    def _extract_topic_from_filename(self, filename: str) -> str:
+        """Extract topic from filename"""
+        filename_lower = filename.lower()
+
+        # Map filename patterns to NPTE topics
+        topic_mapping = {
+            "cardiovascular": "Cardiovascular and pulmonary systems",
+            "cardio": "Cardiovascular and pulmonary systems",
+            "musculoskeletal": "Musculoskeletal system",
+            "musculo": "Musculoskeletal system",
+            "neuromuscular": "Neuromuscular and nervous systems",
+            "neuro": "Neuromuscular and nervous systems",
+            "integumentary": "Integumentary system",
+            "metabolic": "Metabolic and endocrine systems",
+            "endocrine": "Metabolic and endocrine systems",
+            "gastrointestinal": "Gastrointestinal system",
+            "gi": "Gastrointestinal system",
+            "genitourinary": "Genitourinary system",
+            "gu": "Genitourinary system",
+            "lymphatic": "Lymphatic system",
+            "system": "System interactions"
+        }
+
+        for pattern, topic in topic_mapping.items():
+            if pattern in filename_lower:
+                return topic
+
+        return "General"
+
+
+# Per-process processor used by the ingestion pool
+_worker_processor: Optional[DocumentProcessor] = None
+
+
+def init_worker(
+    chunk_size: int,
+    chunk_overlap: int,
+    separators: List[str],
+    pdf_extractor: Optional[str] = None,
+    chunker: str = "sentence",
+):
+    """Process-pool initializer: build one processor per worker"""
+    global _worker_processor
+    logging.basicConfig(level=logging.INFO)
+    _worker_processor = DocumentProcessor(chunk_size, chunk_overlap, separators, pdf_extractor, chunker)
+
+
+def process_file_in_worker(file_path: str, chunks, batch_size: int = 128):
+    """Process-pool task: extract and chunk one file into `chunks`, a bounded queue
+
+    Chunks are put in lists of up to `batch_size` as they are produced,
+    then None marks the end of the file. A full queue blocks the worker, so
+    a large file never sits in memory whole. Errors reach the pipeline
+    through the future, which marks the file failed.
+    """
+    batch = []
+    for doc in _worker_processor.iter_file(file_path):
+        batch.append(doc)
+        if len(batch) >= batch_size:
+            chunks.put(batch)
+            batch = []
+    if batch:
+        chunks.put(batch)
+    chunks.put(None)
@@ -0,0 +1,185 @@
+"""
+Persistent embedding cache for the NPTE RAG system
+SQLite table of vectors keyed by (model, normalized text hash), evicted least-recently-used by total size
+"""
+
+import hashlib
+import logging
+import sqlite3
+import threading
+import time
+import unicodedata
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_for_cache(text: str) -> str:
+    """Canonical form used for the cache key: NFC with collapsed whitespace"""
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+class CachedEmbeddings(Embeddings):
+    """Drop-in Embeddings wrapper that only sends cache misses to the wrapped model
+
+    Vectors are stored as float32 blobs. When the cache grows past
+    `max_bytes`, the least recently used entries are evicted down to 90%
+    of the limit.
+    """
+
+    def __init__(self, embeddings: Embeddings, path: str, max_bytes: int = 512 * 1024 * 1024, model_name: Optional[str] = None):
+        self.embeddings = embeddings
+        self.path = path
+        self.max_bytes = max_bytes
+        self.model_name = model_name or getattr(embeddings, "model", type(embeddings).__name__)
+        self.hits = 0
+        self.misses = 0
+        self.evicted = 0
+
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        # One connection shared by the ingestion threads, serialized by the lock
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                """CREATE TABLE IF NOT EXISTS embeddings (
+                       model TEXT NOT NULL,
+                       text_hash TEXT NOT NULL,
+                       vector BLOB NOT NULL,
+                       last_used REAL NOT NULL,
+                       PRIMARY KEY (model, text_hash)
+                   )"""
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used)")
+            self._total_bytes = self._conn.execute("SELECT COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings").fetchone()[0]
+
+    @staticmethod
+    def _key(text: str) -> str:
+        return hashlib.sha256(normalize_for_cache(text).encode("utf-8")).hexdigest()
+
+    def _lookup(self, keys: List[str]) -> Dict[str, List[float]]:
+        found = {}
+        unique = list(dict.fromkeys(keys))
+        with self._lock:
+            # Stay well under SQLite's bound-parameter limit
+            for start in range(0, len(unique), 500):
+                batch = unique[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT text_hash, vector FROM embeddings WHERE model = ? AND text_hash IN ({placeholders})",
+                    [self.model_name, *batch],
+                ).fetchall()
+                for text_hash, blob in rows:
+                    found[text_hash] = np.frombuffer(blob, dtype=np.float32).tolist()
+            if found:
+                now = time.time()
+                with self._conn:
+                    self._conn.executemany(
+                        "UPDATE embeddings SET last_used = ? WHERE model = ? AND text_hash = ?",
+                        [(now, self.model_name, text_hash) for text_hash in found],
+                    )
+        return found
+
+    def _store(self, vectors: Dict[str, List[float]]):
+        now = time.time()
+        rows = [
+            (self.model_name, text_hash, np.asarray(vector, dtype=np.float32).tobytes(), now)
+            for text_hash, vector in vectors.items()
+        ]
+        with self._lock, self._conn:
+            # Another thread may have stored some of these keys since the lookup; REPLACE overwrites those rows
+            replaced = 0
+            for start in range(0, len(rows), 500):
+                batch = [row[1] for row in rows[start:start + 500]]
+                placeholders = ",".join("?" * len(batch))
+                replaced += self._conn.execute(
+                    f"SELECT COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings WHERE model = ? AND text_hash IN ({placeholders})",
+                    [self.model_name, *batch],
+                ).fetchone()[0]
+            self._conn.executemany("INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?, ?)", rows)
+            self._total_bytes += sum(len(row[2]) for row in rows) - replaced
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        """Delete least recently used rows until the cache is back under 90% of max_bytes"""
+        target = int(self.max_bytes * 0.9)
+        cursor = self._conn.execute("SELECT model, text_hash, LENGTH(vector) FROM embeddings ORDER BY last_used")
+        victims = []
+        for model, text_hash, size in cursor:
+            if self._total_bytes <= target:
+                break
+            victims.append((model, text_hash))
+            self._total_bytes -= size
+        self._conn.executemany("DELETE FROM embeddings WHERE model = ? AND text_hash = ?", victims)
+        self.evicted += len(victims)
+        logger.info(f"Evicted {len(victims)} cached embeddings")
+
+    def _partition(self, texts: List[str]) -> Tuple[List[str], Dict[str, List[float]], Dict[str, str]]:
+        """(keys, cached vectors, texts still to embed by key) for a batch"""
+        keys = [self._key(text) for text in texts]
+        cached = self._lookup(keys)
+
+        missing: Dict[str, str] = {}
+        for key, text in zip(keys, texts):
+            if key not in cached and key not in missing:
+                missing[key] = text
+        self.hits += len(texts) - len(missing)
+        self.misses += len(missing)
+        return keys, cached, missing
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys, cached, missing = self._partition(texts)
+        if missing:
+            fresh = dict(zip(missing, self.embeddings.embed_documents(list(missing.values()))))
+            self._store(fresh)
+            cached.update(fresh)
+        return [cached[key] for key in keys]
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        # SQLite lookups are sub-millisecond; only the embedding call is awaited
+        keys, cached, missing = self._partition(texts)
+        if missing:
+            fresh = dict(zip(missing, await self.embeddings.aembed_documents(list(missing.values()))))
+            self._store(fresh)
+            cached.update(fresh)
+        return [cached[key] for key in keys]
+
+    def _cached_query(self, text: str) -> Tuple[str, Optional[List[float]]]:
+        # Query and document vectors can differ per model, so queries get their own key space
+        key = "query:" + self._key(text)
+        cached = self._lookup([key])
+        if key in cached:
+            self.hits += 1
+            return key, cached[key]
+        self.misses += 1
+        return key, None
+
+    def embed_query(self, text: str) -> List[float]:
+        key, vector = self._cached_query(text)
+        if vector is None:
+            vector = self.embeddings.embed_query(text)
+            self._store({key: vector})
+        return vector
+
+    async def aembed_query(self, text: str) -> List[float]:
+        key, vector = self._cached_query(text)
+        if vector is None:
+            vector = await self.embeddings.aembed_query(text)
+            self._store({key: vector})
+        return vector
+
+    def stats(self) -> Dict:
+        return {
+            "model": self.model_name,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evicted": self.evicted,
+            "bytes": self._total_bytes,
+            "max_bytes": self.max_bytes,
+        }
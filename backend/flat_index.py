@@ -0,0 +1,194 @@
+"""
+Memory-mapped flat vector index for the NPTE RAG system
+An exact-search, read-only export of the Qdrant collection that many processes can share
+"""
+
+import json
+import logging
+import mmap
+import os
+import uuid
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from langchain.schema import Document
+
+logger = logging.getLogger(__name__)
+
+# Rows scored per step when the matrix has to be upcast from float16
+_BLOCK_ROWS = 16384
+DTYPES = ("float32", "float16")
+
+
+class FlatIndex:
+    """Brute-force cosine search over a memory-mapped matrix of unit vectors
+
+    On disk (one directory, one set of files per generation):
+      meta.json             - current generation, dtype, dimension, topic names
+      vectors-<gen>.npy     - (n, dim) float32/float16 unit vectors
+      topics-<gen>.npy      - (n,) uint16 index into meta["topics"]
+      payloads-<gen>.jsonl  - one {"page_content", "metadata"} object per row
+      offsets-<gen>.npy     - (n + 1,) int64 byte offsets into the payload file
+    Everything is opened with mmap, so readers share the OS page cache at
+    zero copy and opening costs only a few syscalls. Writers publish a new
+    generation by replacing meta.json last. Readers pick it up on their
+    next search, and mappings of the old files stay valid until then.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = Path(directory)
+        self._meta_mtime = None
+        self._payload_file = None
+        self._payloads = None
+        self._masks: Dict[str, np.ndarray] = {}
+        self._open()
+
+    @staticmethod
+    def exists(directory: str) -> bool:
+        return (Path(directory) / "meta.json").is_file()
+
+    def _open(self):
+        try:
+            self._load_generation()
+        except FileNotFoundError:
+            # A writer published and cleaned up between reading meta.json and the data files
+            self._load_generation()
+
+    def _load_generation(self):
+        meta_path = self.directory / "meta.json"
+        self._meta_mtime = meta_path.stat().st_mtime_ns
+        meta = json.loads(meta_path.read_text())
+        generation = meta["generation"]
+        self.dtype = meta["dtype"]
+        self.topics: List[str] = meta["topics"]
+        self.vectors = np.load(self.directory / f"vectors-{generation}.npy", mmap_mode="r")
+        self.topic_codes = np.load(self.directory / f"topics-{generation}.npy", mmap_mode="r")
+        self.offsets = np.load(self.directory / f"offsets-{generation}.npy", mmap_mode="r")
+        payload_file = open(self.directory / f"payloads-{generation}.jsonl", "rb")
+        self.close()
+        self._payload_file = payload_file
+        size = os.fstat(self._payload_file.fileno()).st_size
+        self._payloads = mmap.mmap(self._payload_file.fileno(), size, access=mmap.ACCESS_READ) if size else b""
+        self._masks = {}
+
+    def close(self):
+        if isinstance(self._payloads, mmap.mmap):
+            self._payloads.close()
+        if self._payload_file is not None:
+            self._payload_file.close()
+        self._payload_file = self._payloads = None
+
+    def refresh(self) -> bool:
+        """Switch to a newer generation if one was published; True if it did"""
+        if (self.directory / "meta.json").stat().st_mtime_ns == self._meta_mtime:
+            return False
+        self._open()
+        return True
+
+    def __len__(self) -> int:
+        return len(self.vectors)
+
+    def _topic_rows(self, topic: str) -> np.ndarray:
+        """Row numbers tagged with `topic`, from a cached boolean mask"""
+        if topic not in self._masks:
+            code = self.topics.index(topic) if topic in self.topics else -1
+            self._masks[topic] = np.flatnonzero(np.asarray(self.topic_codes) == code)
+        return self._masks[topic]
+
+    def _scores(self, query: np.ndarray, rows: Optional[np.ndarray]) -> np.ndarray:
+        matrix = self.vectors if rows is None else self.vectors[rows]
+        if matrix.dtype == np.float32:
+            return matrix @ query
+        # No BLAS for float16: upcast in blocks so memory stays bounded
+        return np.concatenate([
+            matrix[start:start + _BLOCK_ROWS].astype(np.float32) @ query
+            for start in range(0, len(matrix), _BLOCK_ROWS)
+        ]) if len(matrix) else np.empty(0, dtype=np.float32)
+
+    def search_rows(self, query_vector: Iterable[float], k: int = 5, topic: Optional[str] = None) -> List[Tuple[int, float]]:
+        """(row, cosine score) of the top-k rows, best first, optionally restricted to one topic"""
+        self.refresh()
+        if not len(self.vectors):
+            return []
+        query = np.asarray(query_vector, dtype=np.float32)
+        query = query / (np.linalg.norm(query) or 1.0)
+        rows = self._topic_rows(topic) if topic else None
+        scores = self._scores(query, rows)
+        if not len(scores):
+            return []
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        found = top if rows is None else rows[top]
+        return [(int(row), float(score)) for row, score in zip(found, scores[top])]
+
+    def payload(self, row: int) -> Dict:
+        return json.loads(self._payloads[int(self.offsets[row]):int(self.offsets[row + 1])])
+
+    def search(self, query_vector: Iterable[float], k: int = 5, topic: Optional[str] = None) -> List[Document]:
+        """Top-k chunks as Documents, shaped like NPTERAGSystem.search_by_vector results"""
+        documents = []
+        for row, score in self.search_rows(query_vector, k, topic):
+            payload = self.payload(row)
+            documents.append(Document(
+                page_content=payload.get("page_content") or "",
+                metadata={**(payload.get("metadata") or {}), "score": score},
+            ))
+        return documents
+
+    @classmethod
+    def build(cls, directory: str, vectors: np.ndarray, payloads: List[Dict], dtype: str = "float32") -> "FlatIndex":
+        """Write `vectors` (normalized here) and their payloads as a new generation"""
+        if dtype not in DTYPES:
+            raise ValueError(f"Unknown flat index dtype {dtype!r}; choose from {DTYPES}")
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(len(payloads), -1 if payloads else 0)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors = (vectors / np.where(norms == 0, 1, norms)).astype(dtype)
+
+        topics = sorted({(payload.get("metadata") or {}).get("topic") or "" for payload in payloads})
+        codes = {topic: i for i, topic in enumerate(topics)}
+        topic_codes = np.array([codes[(p.get("metadata") or {}).get("topic") or ""] for p in payloads], dtype=np.uint16)
+        encoded = [json.dumps(payload, ensure_ascii=False).encode("utf-8") for payload in payloads]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(line) for line in encoded], out=offsets[1:])
+
+        generation = uuid.uuid4().hex[:12]
+        np.save(directory / f"vectors-{generation}.npy", vectors)
+        np.save(directory / f"topics-{generation}.npy", topic_codes)
+        np.save(directory / f"offsets-{generation}.npy", offsets)
+        (directory / f"payloads-{generation}.jsonl").write_bytes(b"".join(encoded))
+
+        meta = {"generation": generation, "dtype": dtype, "dimension": vectors.shape[1], "count": len(payloads), "topics": topics}
+        tmp_path = directory / "meta.json.tmp"
+        tmp_path.write_text(json.dumps(meta))
+        os.replace(tmp_path, directory / "meta.json")
+        # Open mappings of older generations stay valid after unlink
+        for path in directory.iterdir():
+            if "-" in path.stem and not path.stem.endswith(generation):
+                path.unlink()
+        logger.info(f"Wrote flat index generation {generation}: {len(payloads)} vectors ({dtype}) to {directory}")
+        return cls(str(directory))
+
+    @classmethod
+    def from_qdrant(cls, client, collection_name: str, directory: str, dtype: str = "float32",
+                    content_key: str = "page_content", metadata_key: str = "metadata") -> "FlatIndex":
+        """Export every point of a Qdrant collection, in point-id order"""
+        vectors, payloads, ids = [], [], []
+        offset = None
+        while True:
+            points, offset = client.scroll(collection_name, limit=1024, offset=offset, with_vectors=True, with_payload=True)
+            for point in points:
+                ids.append(str(point.id))
+                vectors.append(point.vector)
+                payloads.append({
+                    "page_content": point.payload.get(content_key),
+                    "metadata": point.payload.get(metadata_key) or {},
+                })
+            if offset is None:
+                break
+        order = sorted(range(len(ids)), key=ids.__getitem__)
+        matrix = np.asarray([vectors[i] for i in order], dtype=np.float32)
+        return cls.build(directory, matrix, [payloads[i] for i in order], dtype=dtype)
@@ -0,0 +1,118 @@
+"""
+Incremental parser for a streamed top-level JSON object
+Emits each top-level field as soon as its value is complete
+"""
+
+import json
+from typing import Any, List, Tuple
+
+
+class IncrementalJSONParser:
+    """Feed JSON text piece by piece and collect completed top-level fields"""
+
+    def __init__(self):
+        self._text = ""
+        self._pos = 0
+        self._state = "start"
+        self._start = 0
+        self._key = None
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+
+    @property
+    def text(self) -> str:
+        """All text fed so far"""
+        return self._text
+
+    @property
+    def done(self) -> bool:
+        """True once the closing brace of the top-level object was seen"""
+        return self._state == "done"
+
+    def feed(self, chunk: str) -> List[Tuple[str, Any]]:
+        """Consume a chunk and return the (key, value) pairs completed by it"""
+        self._text += chunk
+        text = self._text
+        fields = []
+
+        while self._pos < len(text) and self._state != "done":
+            ch = text[self._pos]
+            state = self._state
+
+            if state == "start":
+                if ch == "{":
+                    self._state = "key"
+            elif state == "key":
+                if ch == '"':
+                    self._start = self._pos
+                    self._state = "in_key"
+                elif ch == "}":
+                    self._state = "done"
+            elif state == "in_key":
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._key = json.loads(text[self._start:self._pos + 1])
+                    self._state = "colon"
+            elif state == "colon":
+                if ch == ":":
+                    self._state = "value_start"
+            elif state == "value_start":
+                if not ch.isspace():
+                    self._start = self._pos
+                    self._depth = 0
+                    self._in_string = False
+                    self._state = "in_value"
+                    # Re-read this character as the first character of the value
+                    continue
+            elif state == "in_value":
+                self._scan_value(ch, fields)
+            elif state == "after_value":
+                if ch == ",":
+                    self._state = "key"
+                elif ch == "}":
+                    self._state = "done"
+
+            self._pos += 1
+
+        return fields
+
+    def _scan_value(self, ch: str, fields: List[Tuple[str, Any]]):
+        """Advance through a value, emitting it when it closes"""
+        if self._in_string:
+            if self._escape:
+                self._escape = False
+            elif ch == "\\":
+                self._escape = True
+            elif ch == '"':
+                self._in_string = False
+                if self._depth == 0:
+                    self._emit(self._text[self._start:self._pos + 1], fields)
+                    self._state = "after_value"
+        elif ch == '"':
+            self._in_string = True
+        elif ch in "{[":
+            self._depth += 1
+        elif ch in "}]":
+            if self._depth == 0:
+                # Closing brace of the top-level object ends a scalar value
+                self._emit(self._text[self._start:self._pos], fields)
+                self._state = "done"
+            else:
+                self._depth -= 1
+                if self._depth == 0:
+                    self._emit(self._text[self._start:self._pos + 1], fields)
+                    self._state = "after_value"
+        elif ch == "," and self._depth == 0:
+            self._emit(self._text[self._start:self._pos], fields)
+            self._state = "key"
+
+    def _emit(self, raw_value: str, fields: List[Tuple[str, Any]]):
+        """Decode a finished value; malformed values are left to the final parse"""
+        try:
+            fields.append((self._key, json.loads(raw_value.strip())))
+        except json.JSONDecodeError:
+            pass
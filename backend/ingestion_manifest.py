@@ -0,0 +1,155 @@
+"""
+Persistent ingestion manifest for the NPTE RAG system
+Records which file contents are already indexed so re-runs only touch what changed
+"""
+
+import hashlib
+import json
+import logging
+import os
+from pathlib import Path
+from typing import Dict, List, NamedTuple
+
+from dedup import group_identical_files
+
+logger = logging.getLogger(__name__)
+
+
+class IngestionPlan(NamedTuple):
+    """What one ingestion run has to do"""
+
+    ingest: List[str]                 # canonical files to extract, embed and upsert
+    delete: List[str]                 # sources whose existing chunks must go first
+    removed: List[str]                # files that disappeared from disk
+    aliases: Dict[str, List[str]]     # canonical file -> identical copies
+    alias_of: Dict[str, str]          # copy -> canonical file
+    hashes: Dict[str, str]            # file -> content hash
+
+
+def file_content_hash(file_path: str) -> str:
+    """SHA-256 of the file's bytes, read in 1 MiB blocks"""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as file:
+        for block in iter(lambda: file.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def pipeline_fingerprint(extractor_version: str, chunk_size: int, chunk_overlap: int, separators: List[str]) -> str:
+    """Identifies the extraction and splitting settings that produced a file's chunks"""
+    settings = json.dumps(
+        {
+            "extractor_version": extractor_version,
+            "chunk_size": chunk_size,
+            "chunk_overlap": chunk_overlap,
+            "separators": separators,
+        },
+        sort_keys=True,
+    )
+    return hashlib.sha256(settings.encode("utf-8")).hexdigest()[:16]
+
+
+class IngestionManifest:
+    """JSON map of source path -> content hash, pipeline fingerprint and chunk count
+
+    A file is unchanged when both its content hash and the fingerprint of
+    the pipeline that indexed it match. Anything else is re-ingested.
+    Entries also record a file's identical copies (`aliases`), or for a
+    copy the file it duplicates (`alias_of`), and the files holding the
+    kept versions of its near-duplicate chunks (`near_duplicate_of`).
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.entries: Dict[str, Dict] = {}
+        self.load()
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as file:
+                self.entries = json.load(file).get("files", {})
+        except (OSError, ValueError) as e:
+            # An unreadable manifest only costs a full re-ingest
+            logger.warning(f"Ignoring unreadable ingestion manifest {self.path}: {e}")
+            self.entries = {}
+
+    def save(self):
+        """Write atomically so an interrupted run never leaves a truncated manifest"""
+        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            json.dump({"files": self.entries}, file, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.path)
+
+    def plan(self, file_paths: List[str], fingerprint: str, scope: str, force: bool = False) -> IngestionPlan:
+        """Compare the files on disk with the manifest
+
+        Identical copies are grouped and only the canonical file of each
+        group is indexed. A canonical file is re-ingested when its content,
+        the pipeline fingerprint or its set of copies changed, and so is any
+        file whose near-duplicate chunks were dropped in favour of chunks
+        that are about to be deleted. `removed` only covers entries under
+        `scope`, so loading one directory never deletes another's chunks.
+        """
+        hashes = {}
+        for file_path in file_paths:
+            try:
+                hashes[file_path] = file_content_hash(file_path)
+            except OSError as e:
+                logger.error(f"Error hashing file {file_path}: {e}")
+
+        aliases = group_identical_files(hashes)
+        alias_of = {alias: canonical for canonical, copies in aliases.items() for alias in copies}
+
+        ingest, delete = [], []
+        for file_path in sorted(hashes):
+            entry = self.entries.get(file_path)
+            indexed = entry is not None and "alias_of" not in entry
+            if file_path in alias_of:
+                # Copies are never indexed themselves; drop chunks from when this was canonical
+                if indexed:
+                    delete.append(file_path)
+                continue
+            current = (
+                indexed
+                and entry["sha256"] == hashes[file_path]
+                and entry["fingerprint"] == fingerprint
+                and entry.get("aliases", []) == aliases[file_path]
+            )
+            if force or not current:
+                ingest.append(file_path)
+                if indexed:
+                    delete.append(file_path)
+
+        scope_path = Path(scope)
+        present = set(file_paths)
+        removed = [
+            source for source in self.entries
+            if source not in present and Path(source).is_relative_to(scope_path)
+        ]
+        delete += [source for source in removed if "alias_of" not in self.entries[source]]
+
+        # Re-ingest files whose dropped near-duplicates pointed at chunks that are going away
+        affected = set(delete)
+        grew = True
+        while grew:
+            grew = False
+            for file_path in sorted(hashes):
+                entry = self.entries.get(file_path)
+                if file_path in ingest or file_path in alias_of or entry is None:
+                    continue
+                if affected.intersection(entry.get("near_duplicate_of", [])):
+                    ingest.append(file_path)
+                    delete.append(file_path)
+                    affected.add(file_path)
+                    grew = True
+
+        return IngestionPlan(ingest, delete, removed, aliases, alias_of, hashes)
+
+    def record(self, file_path: str, sha256: str, fingerprint: str, chunks: int, **extra):
+        self.entries[file_path] = {"sha256": sha256, "fingerprint": fingerprint, "chunks": chunks, **extra}
+
+    def forget(self, file_path: str):
+        self.entries.pop(file_path, None)
@@ -0,0 +1,287 @@
+"""
+Streaming ingestion pipeline for the NPTE RAG system
+extract/clean/split -> embed -> upsert, connected by bounded queues so stages overlap
+"""
+
+import logging
+import multiprocessing
+import os
+import queue
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, List, Optional, Set
+
+from langchain.schema import Document
+from qdrant_client.models import PointStruct
+
+from dedup import MinHashIndex
+from document_processor import init_worker, process_file_in_worker
+
+logger = logging.getLogger(__name__)
+
+# End-of-stream marker passed between stages
+_DONE = object()
+
+
+def chunk_point_id(doc: Document) -> str:
+    """Deterministic point id, so re-ingesting a chunk overwrites it instead of duplicating it"""
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, f"{doc.metadata['source']}#{doc.metadata['chunk_id']}"))
+
+
+class IngestionPipeline:
+    """Bounded-memory ingestion into the RAG system's Qdrant collection
+
+    Files are extracted in a process pool with at most `2 * max_workers`
+    files in flight. Each worker streams its file's chunks back through its
+    own queue of at most `queue_batches` batches, so neither a large file
+    nor a file finished ahead of its turn piles up in memory. Chunks are
+    embedded and upserted in batches of `batch_size` as soon as they are
+    produced, so memory stays flat however large the corpus is and
+    completed batches survive a later failure.
+
+    `source_aliases` lists identical copies of a file; they are written to
+    each chunk's `metadata.aliases`. With a `dedup` index, a chunk that
+    nearly duplicates an indexed one is dropped before embedding and its
+    source is added to the kept point's aliases instead.
+    """
+
+    def __init__(
+        self,
+        rag_system,
+        batch_size: int = 128,
+        max_workers: Optional[int] = None,
+        queue_batches: int = 4,
+        source_aliases: Optional[Dict[str, List[str]]] = None,
+        dedup: Optional[MinHashIndex] = None,
+    ):
+        self.rag = rag_system
+        self.batch_size = batch_size
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.queue_batches = queue_batches
+        self.source_aliases = source_aliases or {}
+        self.dedup = dedup
+        self.stats = {"files": 0, "chunks": 0, "near_duplicates": 0, "upserted": 0, "failed_batches": 0, "seconds": 0.0}
+        # Per-file outcome, so callers can tell which files were fully indexed
+        self.file_chunks: Dict[str, int] = {}
+        self.failed_sources: Set[str] = set()
+        # source -> files holding the kept copies of its dropped chunks
+        self.near_duplicate_of: Dict[str, Set[str]] = {}
+        self._alias_updates: Dict[str, Set[str]] = {}
+        self._stats_lock = threading.Lock()
+
+    def run(self, file_paths: List[str]) -> Dict:
+        """Ingest files; returns counters for the run"""
+        if self.rag.vector_store is None:
+            self.rag.setup_collection()
+
+        start = time.monotonic()
+        chunk_queue = queue.Queue(maxsize=self.batch_size * self.queue_batches)
+        vector_queue = queue.Queue(maxsize=self.queue_batches)
+        embedder = threading.Thread(target=self._embed_stage, args=(chunk_queue, vector_queue), daemon=True)
+        upserter = threading.Thread(target=self._upsert_stage, args=(vector_queue,), daemon=True)
+        embedder.start()
+        upserter.start()
+
+        try:
+            for doc in self._extract_stage(file_paths):
+                self.stats["chunks"] += 1
+                source = doc.metadata["source"]
+                self.file_chunks[source] = self.file_chunks.get(source, 0) + 1
+                if self.source_aliases.get(source):
+                    doc.metadata["aliases"] = list(self.source_aliases[source])
+                if self._is_near_duplicate(doc):
+                    continue
+                chunk_queue.put(doc)
+        finally:
+            chunk_queue.put(_DONE)
+            embedder.join()
+            upserter.join()
+        self._apply_alias_updates()
+        self._forget_failed_sources()
+
+        self.stats["seconds"] = time.monotonic() - start
+        logger.info(f"Ingestion finished: {self.stats}")
+        return self.stats
+
+    def _is_near_duplicate(self, doc: Document) -> bool:
+        """Index the chunk, or record it as an alias of the indexed chunk it repeats"""
+        if self.dedup is None:
+            return False
+        source = doc.metadata["source"]
+        signature = self.dedup.signature(doc.page_content)
+        # A file never duplicates itself: its own signatures may be left from an earlier, failed run
+        match = self.dedup.find(signature, exclude_source=source)
+        if match is None:
+            self.dedup.add(chunk_point_id(doc), source, signature)
+            return False
+
+        point_id, kept_source = match
+        self.stats["near_duplicates"] += 1
+        self._alias_updates.setdefault(point_id, set()).update([source, *doc.metadata.get("aliases", [])])
+        self.near_duplicate_of.setdefault(source, set()).add(kept_source)
+        return True
+
+    def _forget_failed_sources(self):
+        """Keep only chunks that reached Qdrant in the dedup index
+
+        A file whose chunks were dropped as copies of a failed file's chunks
+        lost them too, so it is failed as well. Failed files are re-ingested
+        next run and must not match their own signatures then.
+        """
+        spread = True
+        while spread:
+            spread = False
+            for source, kept_sources in self.near_duplicate_of.items():
+                if source not in self.failed_sources and kept_sources & self.failed_sources:
+                    self.failed_sources.add(source)
+                    spread = True
+        if self.dedup is not None:
+            self.dedup.remove_sources(self.failed_sources)
+
+    def _apply_alias_updates(self):
+        """Add dropped chunks' sources to the aliases of the points that were kept"""
+        if not self._alias_updates:
+            return
+        metadata_key = self.rag.vector_store.metadata_payload_key
+        try:
+            records = self.rag.qdrant_client.retrieve(
+                collection_name=self.rag.collection_name,
+                ids=list(self._alias_updates),
+                with_payload=[metadata_key],
+            )
+            for record in records:
+                metadata = record.payload.get(metadata_key) or {}
+                aliases = set(metadata.get("aliases", [])) | self._alias_updates[str(record.id)]
+                aliases.discard(metadata.get("source"))
+                self.rag.qdrant_client.set_payload(
+                    collection_name=self.rag.collection_name,
+                    payload={"aliases": sorted(aliases)},
+                    points=[record.id],
+                    key=metadata_key,
+                )
+        except Exception as e:
+            logger.error(f"Error recording near-duplicate aliases: {e}")
+            # Those files' dropped chunks are not attributed anywhere; retry them next run
+            self.failed_sources.update(self.near_duplicate_of)
+
+    def _extract_stage(self, file_paths: List[str]) -> Iterable[Document]:
+        """Yield chunks file by file, in input order"""
+        processor = self.rag.processor
+        if self.max_workers == 1 or len(file_paths) <= 1:
+            for file_path in file_paths:
+                self.stats["files"] += 1
+                try:
+                    yield from processor.iter_file(file_path)
+                except Exception as e:
+                    logger.error(f"Error processing file {file_path}: {e}")
+                    self.failed_sources.add(file_path)
+            return
+
+        with ProcessPoolExecutor(
+            max_workers=min(self.max_workers, len(file_paths)),
+            initializer=init_worker,
+            initargs=(
+                processor.chunk_size,
+                processor.chunk_overlap,
+                processor.separators,
+                processor.pdf_extractor.name,
+                processor.chunker_name,
+            ),
+        ) as executor, multiprocessing.Manager() as manager:
+            # The manager shuts down first on exit, so workers blocked on a full queue fail instead of hanging
+            pending = deque()
+            paths = iter(file_paths)
+
+            def submit(file_path: str):
+                chunks = manager.Queue(maxsize=self.queue_batches)
+                future = executor.submit(process_file_in_worker, file_path, chunks, self.batch_size)
+                pending.append((file_path, chunks, future))
+
+            # Sliding window keeps only a few files in flight at once
+            for file_path in paths:
+                submit(file_path)
+                if len(pending) >= 2 * self.max_workers:
+                    break
+            try:
+                while pending:
+                    file_path, chunks, future = pending.popleft()
+                    next_path = next(paths, None)
+                    if next_path is not None:
+                        submit(next_path)
+                    self.stats["files"] += 1
+                    try:
+                        yield from self._drain(chunks, future)
+                    except Exception as e:
+                        logger.error(f"Error processing file {file_path}: {e}")
+                        self.failed_sources.add(file_path)
+            finally:
+                # Stopped early: don't start files nobody will read
+                for _, _, future in pending:
+                    future.cancel()
+
+    @staticmethod
+    def _drain(chunks, future) -> Iterable[Document]:
+        """Yield one worker file's chunks as its batches arrive; raises the worker's error"""
+        while True:
+            try:
+                batch = chunks.get(timeout=1.0)
+            except queue.Empty:
+                # A worker that raised never sends the end marker
+                if future.done() and future.exception() is not None:
+                    raise future.exception()
+                continue
+            if batch is None:
+                return
+            yield from batch
+
+    def _embed_stage(self, chunk_queue: queue.Queue, vector_queue: queue.Queue):
+        """Embed fixed-size batches of chunks"""
+        batch: List[Document] = []
+        while True:
+            item = chunk_queue.get()
+            if item is not _DONE:
+                batch.append(item)
+            if batch and (item is _DONE or len(batch) >= self.batch_size):
+                try:
+                    vectors = self.rag.embeddings.embed_documents([doc.page_content for doc in batch])
+                    vector_queue.put((batch, vectors))
+                except Exception as e:
+                    logger.error(f"Error embedding batch of {len(batch)} chunks: {e}")
+                    self._record_failed_batch(batch)
+                batch = []
+            if item is _DONE:
+                vector_queue.put(_DONE)
+                return
+
+    def _upsert_stage(self, vector_queue: queue.Queue):
+        """Write each embedded batch to Qdrant as soon as it arrives"""
+        content_key = self.rag.vector_store.content_payload_key
+        metadata_key = self.rag.vector_store.metadata_payload_key
+        while True:
+            item = vector_queue.get()
+            if item is _DONE:
+                return
+            batch, vectors = item
+            points = [
+                PointStruct(
+                    id=chunk_point_id(doc),
+                    vector=vector,
+                    payload={content_key: doc.page_content, metadata_key: doc.metadata},
+                )
+                for doc, vector in zip(batch, vectors)
+            ]
+            try:
+                self.rag.qdrant_client.upsert(collection_name=self.rag.collection_name, points=points, wait=True)
+                with self._stats_lock:
+                    self.stats["upserted"] += len(points)
+            except Exception as e:
+                logger.error(f"Error upserting batch of {len(points)} chunks: {e}")
+                self._record_failed_batch(batch)
+
+    def _record_failed_batch(self, batch: List[Document]):
+        with self._stats_lock:
+            self.stats["failed_batches"] += 1
+            self.failed_sources.update(doc.metadata["source"] for doc in batch)
@@ -0,0 +1,390 @@
+"""
+Pre-generated MCQ pool per topic
+Background workers keep each topic topped up so requests are served instantly
+"""
+
+import asyncio
+import hashlib
+import itertools
+import random
+import time
+from collections import OrderedDict, deque
+from typing import Deque, Dict, List, Optional, Set, Tuple
+
+from admission import Overloaded
+from mcq_schema import MCQGenerationError, has_placeholders
+from single_flight import SingleFlight
+
+# Topics offered by the frontend (frontend-vite/src/TopicInput.tsx), highest refill priority first
+NPTE_TOPICS = [
+    "Cardiovascular and pulmonary systems",
+    "Musculoskeletal system",
+    "Neuromuscular and nervous systems",
+    "Integumentary system",
+    "Metabolic and endocrine systems",
+    "Gastrointestinal system",
+    "Genitourinary system",
+    "Lymphatic system",
+    "System interactions",
+]
+
+
+def normalize_topic(topic: str) -> str:
+    """Normalize a topic string into a pool key"""
+    return " ".join(topic.lower().split())
+
+
+def mcq_fingerprint(mcq: Dict) -> str:
+    """Stable id for an MCQ, based on its question text"""
+    question = " ".join(str(mcq.get("question", "")).lower().split())
+    return hashlib.sha1(question.encode("utf-8")).hexdigest()
+
+
+# Refills started by a request that found its topic empty run ahead of every other topic
+_URGENT = float("-inf")
+
+
+class MCQPool:
+    """Warm per-topic MCQ pools refilled by background workers
+
+    `OllamaAgent.agenerate_mcq` is the producer; the request path only
+    consumes via `get`. A topic is refilled up to `depth` once it drops
+    below `low_water`. Lower priority numbers are refilled first. Refills
+    ask for up to `batch_size` distinct MCQs per LLM call.
+
+    A request that finds its topic empty does not generate by itself. It
+    moves the topic's refill to the front of the queue and waits for it.
+    The urgent refill asks for enough MCQs for every waiting request in one
+    batched call, so concurrent requests for the topic get distinct
+    questions from a single generation. A refill that fails, or leaves
+    nothing for a waiter, is retried up to `miss_attempts` times with
+    jittered exponential backoff. Then the request fails with
+    MCQGenerationError. If the LLM backend is saturated, a recently served
+    MCQ the session has not seen is returned instead.
+
+    Only the configured topics are pooled (matched after normalize_topic).
+    Free-text prompts are generated per request, so clients cannot grow the
+    pools or the refill queue. Concurrent identical prompts share one
+    generation.
+    """
+
+    def __init__(
+        self,
+        agent,
+        topics: Optional[List[str]] = None,
+        depth: int = 5,
+        low_water: int = 2,
+        workers: int = 2,
+        batch_size: int = 1,
+        priorities: Optional[Dict[str, int]] = None,
+        wait_timeout: float = 240.0,
+        max_sessions: int = 10000,
+        miss_attempts: int = 3,
+        retry_backoff: float = 1.0,
+    ):
+        self.agent = agent
+        self.depth = depth
+        self.low_water = min(low_water, depth)
+        self.num_workers = workers
+        self.batch_size = max(1, batch_size)
+        self.wait_timeout = wait_timeout
+        self.max_sessions = max_sessions
+        self.miss_attempts = max(1, miss_attempts)
+        self.retry_backoff = retry_backoff
+
+        topics = NPTE_TOPICS if topics is None else topics
+        # Default priority follows list order; explicit priorities override it
+        self._priorities: Dict[str, int] = {normalize_topic(t): i for i, t in enumerate(topics)}
+        for topic, priority in (priorities or {}).items():
+            self._priorities[normalize_topic(topic)] = priority
+        self._default_priority = len(self._priorities)
+
+        self._pools: Dict[str, Deque[Dict]] = {}
+        self._display: Dict[str, str] = {}
+        self._pending: Dict[str, int] = {}
+        # Jobs not yet started, seq -> (priority, count); a queue entry whose seq is gone was re-queued
+        self._queued: Dict[str, Dict[int, Tuple[float, int]]] = {}
+        self._waiting: Dict[str, int] = {}
+        self._refilled: Dict[str, asyncio.Event] = {}
+        self._last_error: Dict[str, Optional[Exception]] = {}
+        self._recent: Dict[str, Deque[Dict]] = {}
+        self._flights = SingleFlight()
+        self._seen: "OrderedDict[str, Set[str]]" = OrderedDict()
+        self._queue: Optional[asyncio.PriorityQueue] = None
+        self._seq = itertools.count()
+        self._workers: List[asyncio.Task] = []
+
+        self.served = 0
+        self.misses = 0
+        self.served_from_cache = 0
+        self.generated = 0
+        self.unpooled = 0
+        self.miss_refills = 0
+        self.coalesced = 0
+
+        for topic in topics:
+            self._ensure_topic(topic)
+
+    async def start(self):
+        """Start refill workers and schedule the initial fill"""
+        self._queue = asyncio.PriorityQueue()
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(self.num_workers)]
+        for key in self._pools:
+            self._schedule_refill(key)
+        print(f"[{time.strftime('%H:%M:%S')}] MCQ pool started: {len(self._pools)} topics, "
+              f"depth={self.depth}, low_water={self.low_water}, workers={self.num_workers}")
+
+    async def stop(self):
+        """Cancel refill workers"""
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    def _ensure_topic(self, topic: str) -> str:
+        """Register a pooled topic"""
+        key = normalize_topic(topic)
+        if key not in self._pools:
+            self._pools[key] = deque()
+            self._display[key] = topic.strip()
+            self._pending[key] = 0
+            self._queued[key] = {}
+            self._waiting[key] = 0
+            self._refilled[key] = asyncio.Event()
+            self._last_error[key] = None
+            self._recent[key] = deque(maxlen=self.depth * 4)
+        return key
+
+    def _enqueue(self, priority: float, key: str, count: int):
+        seq = next(self._seq)
+        self._queued[key][seq] = (priority, count)
+        self._queue.put_nowait((priority, seq, key, count))
+
+    def _schedule_refill(self, key: str, urgent: bool = False) -> bool:
+        """Queue enough generations to bring a topic back up to depth; True if a new job was queued
+
+        An urgent refill also covers every request waiting on the topic,
+        moves the topic's queued jobs to the front, and grows an unstarted
+        urgent job before adding another, so waiters that arrive together
+        share one batched call of up to max(batch_size, depth) MCQs.
+        """
+        if self._queue is None:
+            return False
+        priority = _URGENT if urgent else self._priorities.get(key, self._default_priority)
+        deficit = max(self.depth - len(self._pools[key]), self._waiting[key]) - self._pending[key]
+        chunk = max(self.batch_size, self.depth) if urgent else self.batch_size
+        added = False
+        if urgent:
+            for seq, (queued_priority, count) in list(self._queued[key].items()):
+                extra = min(chunk - count, deficit) if queued_priority == _URGENT else 0
+                if queued_priority != _URGENT:
+                    # The old heap entry stays behind; the worker skips it
+                    del self._queued[key][seq]
+                    self._enqueue(_URGENT, key, count)
+                elif extra > 0:
+                    self._queued[key][seq] = (_URGENT, count + extra)
+                    self._pending[key] += extra
+                    deficit -= extra
+        while deficit > 0:
+            count = min(deficit, chunk)
+            self._pending[key] += count
+            self._enqueue(priority, key, count)
+            deficit -= count
+            added = True
+        return added
+
+    def _notify_refilled(self, key: str):
+        """Wake the requests waiting on a topic's refills"""
+        self._refilled[key].set()
+        self._refilled[key] = asyncio.Event()
+
+    async def _worker(self):
+        """Take refill jobs by priority and produce MCQs"""
+        while True:
+            _, seq, key, _ = await self._queue.get()
+            job = self._queued[key].pop(seq, None)
+            if job is None:
+                # Re-queued as urgent; its count moved with it
+                self._queue.task_done()
+                continue
+            count = job[1]
+            try:
+                if count == 1:
+                    mcqs = [await self.agent.agenerate_mcq(self._display[key])]
+                else:
+                    mcqs = await self.agent.agenerate_mcq_batch(self._display[key], count)
+                # The agent raises on failure; never pool placeholder content regardless
+                usable = [mcq for mcq in mcqs if not has_placeholders(mcq)]
+                if len(usable) < len(mcqs):
+                    print(f"[{time.strftime('%H:%M:%S')}] MCQ pool dropped {len(mcqs) - len(usable)} placeholder MCQ(s) for '{key}'")
+                self._pools[key].extend(usable)
+                self.generated += len(usable)
+                self._last_error[key] = None if usable else MCQGenerationError("refill produced no usable MCQ")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self._last_error[key] = e
+                print(f"[{time.strftime('%H:%M:%S')}] MCQ pool refill failed for '{key}': {e}")
+            finally:
+                self._pending[key] -= count
+                self._notify_refilled(key)
+                self._queue.task_done()
+
+    def _session_seen(self, session_id: Optional[str]) -> Set[str]:
+        """Fingerprints already served to a session (anonymous requests share nothing)"""
+        if not session_id:
+            return set()
+        if session_id in self._seen:
+            self._seen.move_to_end(session_id)
+        else:
+            self._seen[session_id] = set()
+            if len(self._seen) > self.max_sessions:
+                self._seen.popitem(last=False)
+        return self._seen[session_id]
+
+    def _take(self, key: str, seen: Set[str]) -> Optional[Dict]:
+        """Remove and return the oldest MCQ this session has not seen"""
+        pool = self._pools[key]
+        for i, mcq in enumerate(pool):
+            fingerprint = mcq_fingerprint(mcq)
+            if fingerprint not in seen:
+                del pool[i]
+                seen.add(fingerprint)
+                return mcq
+        return None
+
+    def _take_recent(self, key: str, seen: Set[str]) -> Optional[Dict]:
+        """Reuse a recently served MCQ this session has not seen"""
+        for mcq in reversed(self._recent[key]):
+            fingerprint = mcq_fingerprint(mcq)
+            if fingerprint not in seen:
+                seen.add(fingerprint)
+                return mcq
+        return None
+
+    async def get(self, topic: str, session_id: Optional[str] = None) -> Dict:
+        """Serve an MCQ for topic, generating on a miss if the pool is empty"""
+        key = normalize_topic(topic)
+        seen = self._session_seen(session_id)
+        if key not in self._pools:
+            mcq = await self._generate_unpooled(topic.strip(), key, seen)
+            self.unpooled += 1
+            self.served += 1
+            return mcq
+
+        mcq = self._take(key, seen)
+        if mcq is None:
+            self.misses += 1
+            try:
+                mcq = await self._wait_for_refill(key, seen)
+            except Overloaded:
+                mcq = self._take_recent(key, seen)
+                if mcq is None:
+                    raise
+                self.served_from_cache += 1
+
+        self._recent[key].append(mcq)
+        self.served += 1
+        if len(self._pools[key]) < self.low_water:
+            self._schedule_refill(key)
+        return mcq
+
+    def _backoff(self, attempt: int) -> float:
+        """Jittered exponential delay before retry number `attempt`"""
+        return self.retry_backoff * 2 ** (attempt - 1) * random.uniform(0.5, 1.5)
+
+    def _timeout(self, key: str) -> TimeoutError:
+        return TimeoutError(f"No MCQ available for '{self._display.get(key, key)}' within {self.wait_timeout}s")
+
+    async def _wait_for_refill(self, key: str, seen: Set[str]) -> Dict:
+        """Wait for the topic's urgent refill and take an MCQ this session has not seen"""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.wait_timeout
+        error: Optional[Exception] = None
+        self._waiting[key] += 1
+        try:
+            for attempt in range(1, self.miss_attempts + 1):
+                if self._schedule_refill(key, urgent=True):
+                    self.miss_refills += 1
+                elif attempt == 1:
+                    # Joined a refill (or grew a batch) another request already started
+                    self.coalesced += 1
+                while True:
+                    mcq = self._take(key, seen)
+                    if mcq is not None:
+                        return mcq
+                    if not self._pending[key]:
+                        break
+                    # Captured before awaiting, so a refill finishing in between is not missed
+                    refilled = self._refilled[key]
+                    remaining = deadline - loop.time()
+                    if remaining <= 0:
+                        raise self._timeout(key)
+                    try:
+                        await asyncio.wait_for(refilled.wait(), remaining)
+                    except asyncio.TimeoutError:
+                        raise self._timeout(key)
+                error = self._last_error[key]
+                if isinstance(error, Overloaded):
+                    raise error
+                if attempt < self.miss_attempts:
+                    delay = self._backoff(attempt)
+                    if loop.time() + delay >= deadline:
+                        raise self._timeout(key)
+                    await asyncio.sleep(delay)
+            raise MCQGenerationError(
+                f"No MCQ for '{self._display[key]}' after {self.miss_attempts} refill attempts: "
+                f"{error or 'every refilled MCQ went to another request'}"
+            )
+        finally:
+            self._waiting[key] -= 1
+
+    async def _generate_unpooled(self, topic: str, key: str, seen: Set[str]) -> Dict:
+        """Generate for a topic without a pool; concurrent identical prompts share one generation"""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.wait_timeout
+        for attempt in range(1, self.miss_attempts + 1):
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                raise self._timeout(key)
+            try:
+                # The agent retries internally and raises MCQGenerationError when it cannot produce one
+                mcq = await self._flights.run(key, lambda: self.agent.agenerate_mcq(topic), timeout=remaining)
+            except asyncio.TimeoutError:
+                raise self._timeout(key)
+            fingerprint = mcq_fingerprint(mcq)
+            # Coalesced callers from different sessions may share a question; one session never repeats
+            if fingerprint not in seen:
+                seen.add(fingerprint)
+                return mcq
+            if attempt < self.miss_attempts:
+                await asyncio.sleep(min(self._backoff(attempt), max(0.0, deadline - loop.time())))
+        raise MCQGenerationError(f"No new MCQ for '{topic}' for this session after {self.miss_attempts} attempts")
+
+    def available(self, topic: str) -> int:
+        """Number of ready MCQs for topic"""
+        pool = self._pools.get(normalize_topic(topic))
+        return len(pool) if pool is not None else 0
+
+    def stats(self) -> Dict:
+        """Pool sizes and counters for monitoring"""
+        return {
+            "depth": self.depth,
+            "low_water": self.low_water,
+            "served": self.served,
+            "misses": self.misses,
+            "served_from_cache": self.served_from_cache,
+            "generated": self.generated,
+            "unpooled": self.unpooled,
+            "queued": sum(len(jobs) for jobs in self._queued.values()),
+            # Misses that joined a refill already in flight, plus coalesced free-text prompts
+            "coalescing": {
+                "coalesced": self.coalesced + self._flights.coalesced,
+                "miss_refills": self.miss_refills,
+                "unpooled": self._flights.stats(),
+            },
+            "topics": {
+                self._display[key]: {"ready": len(pool), "pending": self._pending[key]}
+                for key, pool in self._pools.items()
+            },
+        }
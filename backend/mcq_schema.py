@@ -0,0 +1,126 @@
+"""
+Strict MCQ schema shared by the Ollama and OpenAI agents
+The JSON schema constrains generation; the typed model validates the raw output in one pass
+"""
+
+import json
+from typing import Dict, List, Tuple
+
+from pydantic import BaseModel, ConfigDict, Field, field_validator, model_validator
+
+CHOICE_KEYS = ["0", "1", "2", "3"]
+
+# Phrases the model emits when it copies the template instead of writing content
+PLACEHOLDER_PHRASES = [
+    "Option A", "Option B", "Explanation for option", "Why A is wrong", "https://...", "Sample question about",
+]
+
+
+class MCQGenerationError(Exception):
+    """No valid MCQ could be produced; callers retry, back off or report the error"""
+
+# JSON schema passed to Ollama's structured `format` (matches app.MCQResponse)
+MCQ_JSON_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "question": {"type": "string"},
+        "choices": {"type": "array", "items": {"type": "string"}, "minItems": 4, "maxItems": 4},
+        "correct": {"type": "integer", "minimum": 0, "maximum": 3},
+        "explanations": {
+            "type": "object",
+            "properties": {key: {"type": "string"} for key in CHOICE_KEYS},
+            "required": CHOICE_KEYS,
+        },
+        "links": {
+            "type": "object",
+            "properties": {key: {"type": "array", "items": {"type": "string"}} for key in CHOICE_KEYS},
+            "required": CHOICE_KEYS,
+        },
+    },
+    "required": ["question", "choices", "correct", "explanations", "links"],
+}
+
+
+def batch_json_schema(count: int) -> Dict:
+    """JSON schema for {"questions": [...]} holding `count` MCQs"""
+    return {
+        "type": "object",
+        "properties": {
+            "questions": {"type": "array", "items": MCQ_JSON_SCHEMA, "minItems": count, "maxItems": count},
+        },
+        "required": ["questions"],
+    }
+
+
+class StrictMCQ(BaseModel):
+    """Typed MCQ that rejects drifted or placeholder output instead of patching it"""
+
+    model_config = ConfigDict(extra="ignore")
+
+    question: str = Field(min_length=20)
+    choices: List[str] = Field(min_length=4, max_length=4)
+    correct: int = Field(ge=0, le=3)
+    explanations: Dict[str, str]
+    links: Dict[str, List[str]]
+
+    @field_validator("explanations", "links")
+    @classmethod
+    def _one_entry_per_choice(cls, value: Dict) -> Dict:
+        if sorted(value) != CHOICE_KEYS:
+            raise ValueError(f"expected keys {CHOICE_KEYS}, got {sorted(value)}")
+        return value
+
+    @field_validator("choices")
+    @classmethod
+    def _distinct_choices(cls, value: List[str]) -> List[str]:
+        if len({choice.strip().lower() for choice in value}) != len(value):
+            raise ValueError("choices must be distinct")
+        return value
+
+    @model_validator(mode="after")
+    def _no_placeholders(self) -> "StrictMCQ":
+        texts = [self.question, *self.choices, *self.explanations.values()]
+        for phrase in PLACEHOLDER_PHRASES:
+            if any(phrase in text for text in texts):
+                raise ValueError(f"placeholder content: {phrase!r}")
+        return self
+
+
+def has_placeholders(mcq: Dict) -> bool:
+    """Whether an MCQ (e.g. one from lenient repair) still carries template text"""
+    texts = [str(mcq.get("question", "")), *map(str, mcq.get("choices") or []),
+             *map(str, (mcq.get("explanations") or {}).values())]
+    return any(phrase in text for phrase in PLACEHOLDER_PHRASES for text in texts)
+
+
+def parse_mcq_strict(raw: str) -> Dict:
+    """Validate a raw JSON model response; raises pydantic.ValidationError on drift"""
+    return StrictMCQ.model_validate_json(raw).model_dump()
+
+
+def parse_mcq_batch_strict(raw: str) -> Tuple[List[Dict], int]:
+    """Validate each item of a {"questions": [...]} response
+
+    Returns (valid MCQs with duplicates removed, number of rejected items).
+    Raises ValueError if the response is not a batch object at all.
+    """
+    data = json.loads(raw)
+    if not isinstance(data, dict) or not isinstance(data.get("questions"), list):
+        raise ValueError("expected an object with a 'questions' array")
+
+    mcqs = []
+    rejected = 0
+    seen_questions = set()
+    for item in data["questions"]:
+        try:
+            mcq = StrictMCQ.model_validate(item).model_dump()
+        except ValueError:
+            rejected += 1
+            continue
+        question_key = " ".join(mcq["question"].lower().split())
+        if question_key in seen_questions:
+            rejected += 1
+            continue
+        seen_questions.add(question_key)
+        mcqs.append(mcq)
+    return mcqs, rejected
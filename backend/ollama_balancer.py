@@ -0,0 +1,335 @@
+"""
+Load balancing and failover across several Ollama servers
+Least-outstanding-requests routing, health checks, per-endpoint circuit breakers and optional hedging
+"""
+
+import asyncio
+import random
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, List, Optional, Set
+
+import httpx
+
+# Latency samples needed before a hedge delay is trusted
+MIN_HEDGE_SAMPLES = 20
+
+
+class NoHealthyBackend(Exception):
+    """Every Ollama endpoint is unhealthy, open-circuited or already failed this request"""
+
+
+class BackendError(Exception):
+    """One endpoint failed (transport error, 5xx or unparsable body); the balancer may fail over"""
+
+
+class OllamaEndpoint:
+    """Routing state for one Ollama server"""
+
+    def __init__(self, url: str):
+        self.url = url.rstrip("/")
+        self.outstanding = 0
+        self.healthy = True
+        self.state = "closed"
+        self.opened_at = 0.0
+        self.trial_in_flight = False
+        self.consecutive_failures = 0
+        self.requests = 0
+        self.failures = 0
+        self.latencies = deque(maxlen=200)
+
+    def latency_percentile(self, percentile: float) -> Optional[float]:
+        """Observed latency at `percentile` (0-1), None until enough samples exist"""
+        if len(self.latencies) < MIN_HEDGE_SAMPLES:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(percentile * len(ordered)))]
+
+    def stats(self) -> Dict:
+        return {
+            "outstanding": self.outstanding,
+            "healthy": self.healthy,
+            "circuit": self.state,
+            "requests": self.requests,
+            "failures": self.failures,
+            "p50_s": self.latency_percentile(0.5),
+            "p95_s": self.latency_percentile(0.95),
+        }
+
+
+class OllamaBalancer:
+    """Spread Ollama calls over several endpoints
+
+    A circuit opens after `failure_threshold` consecutive failures. After
+    `reset_timeout` seconds one trial request is let through (half-open).
+    With `hedge_percentile` set, a request that outlives that latency
+    percentile is also sent to a second endpoint and the first answer wins.
+    """
+
+    def __init__(
+        self,
+        urls: List[str],
+        failure_threshold: int = 3,
+        reset_timeout: float = 30.0,
+        hedge_percentile: Optional[float] = None,
+        health_interval: float = 15.0,
+    ):
+        if not urls:
+            raise ValueError("At least one Ollama URL is required")
+        self.endpoints = [OllamaEndpoint(url) for url in urls]
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.hedge_percentile = hedge_percentile
+        self.health_interval = health_interval
+        self.hedged = 0
+        self.hedge_wins = 0
+        self._health_task: Optional[asyncio.Task] = None
+
+    def _can_route(self, endpoint: OllamaEndpoint, now: float) -> bool:
+        """Circuit-breaker admission for one endpoint"""
+        if endpoint.state == "closed":
+            return True
+        if endpoint.state == "open":
+            return now - endpoint.opened_at >= self.reset_timeout
+        return not endpoint.trial_in_flight
+
+    def pick(self, exclude: Set[str] = frozenset()) -> Optional[OllamaEndpoint]:
+        """Endpoint with the fewest outstanding requests that is allowed to take one"""
+        now = time.monotonic()
+        candidates = [ep for ep in self.endpoints if ep.url not in exclude and self._can_route(ep, now)]
+        healthy = [ep for ep in candidates if ep.healthy]
+        # If health checks mark everything down, still try rather than fail blind
+        candidates = healthy or candidates
+        if not candidates:
+            return None
+
+        fewest = min(ep.outstanding for ep in candidates)
+        endpoint = random.choice([ep for ep in candidates if ep.outstanding == fewest])
+        if endpoint.state != "closed":
+            endpoint.state = "half_open"
+            endpoint.trial_in_flight = True
+        return endpoint
+
+    def _record_success(self, endpoint: OllamaEndpoint, latency: Optional[float] = None):
+        endpoint.requests += 1
+        if latency is not None:
+            endpoint.latencies.append(latency)
+        endpoint.consecutive_failures = 0
+        endpoint.trial_in_flight = False
+        endpoint.state = "closed"
+
+    def _record_failure(self, endpoint: OllamaEndpoint):
+        endpoint.requests += 1
+        endpoint.failures += 1
+        endpoint.consecutive_failures += 1
+        endpoint.trial_in_flight = False
+        if endpoint.state == "half_open" or endpoint.consecutive_failures >= self.failure_threshold:
+            if endpoint.state != "open":
+                print(f"[{time.strftime('%H:%M:%S')}] Circuit open for Ollama endpoint {endpoint.url}")
+            endpoint.state = "open"
+            endpoint.opened_at = time.monotonic()
+
+    def _settle(self, endpoint: OllamaEndpoint, outcome: str, latency: float):
+        """Record how a request ended; every outcome releases a half-open trial
+
+        "success" and "answered" (a 4xx: the request was bad, the endpoint
+        is fine) close the circuit, but only successes feed the hedge
+        latency window. "cancelled" (e.g. the losing hedge) is neutral.
+        Anything else is a failure.
+        """
+        if outcome == "success":
+            self._record_success(endpoint, latency)
+        elif outcome == "answered":
+            self._record_success(endpoint)
+        elif outcome == "cancelled":
+            endpoint.trial_in_flight = False
+        else:
+            self._record_failure(endpoint)
+
+    @staticmethod
+    def _read_json(response: httpx.Response) -> Dict:
+        """Body of a finished response: 5xx and unparsable bodies raise BackendError, 4xx HTTPStatusError"""
+        if response.status_code >= 500:
+            raise BackendError(f"returned {response.status_code}")
+        # 4xx means the request itself is bad; the endpoint is fine, so no failover
+        response.raise_for_status()
+        try:
+            return response.json()
+        except ValueError as e:
+            raise BackendError(f"returned invalid JSON: {e}") from e
+
+    async def _attempt(self, client: httpx.AsyncClient, endpoint: OllamaEndpoint, path: str, payload: Dict, timeout) -> Dict:
+        """POST to one endpoint; transport errors, 5xx and bad JSON become BackendError"""
+        endpoint.outstanding += 1
+        start = time.monotonic()
+        outcome = "failure"
+        try:
+            data = self._read_json(await client.post(f"{endpoint.url}{path}", json=payload, timeout=timeout))
+            outcome = "success"
+            return data
+        except httpx.HTTPStatusError:
+            outcome = "answered"
+            raise
+        except (httpx.TransportError, BackendError) as e:
+            raise BackendError(f"{endpoint.url}: {e}") from e
+        except asyncio.CancelledError:
+            outcome = "cancelled"
+            raise
+        finally:
+            endpoint.outstanding -= 1
+            self._settle(endpoint, outcome, time.monotonic() - start)
+
+    async def _hedged(self, client, primary: OllamaEndpoint, tried: Set[str], path: str, payload: Dict, timeout, delay: float) -> Dict:
+        """Send to primary; if it outlives `delay`, also send to a second endpoint"""
+        first = asyncio.create_task(self._attempt(client, primary, path, payload, timeout))
+        done, _ = await asyncio.wait({first}, timeout=delay)
+        if done:
+            return first.result()
+
+        secondary = self.pick(exclude=tried)
+        if secondary is None:
+            return await first
+        tried.add(secondary.url)
+        self.hedged += 1
+        second = asyncio.create_task(self._attempt(client, secondary, path, payload, timeout))
+
+        pending = {first, second}
+        error = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is second:
+                            self.hedge_wins += 1
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def post_json(self, client: httpx.AsyncClient, path: str, payload: Dict, timeout=httpx.USE_CLIENT_DEFAULT) -> Dict:
+        """POST with routing, failover to other endpoints and optional hedging"""
+        tried: Set[str] = set()
+        last_error = None
+        while True:
+            endpoint = self.pick(exclude=tried)
+            if endpoint is None:
+                raise NoHealthyBackend(f"No Ollama endpoint available (last error: {last_error})")
+            tried.add(endpoint.url)
+            delay = endpoint.latency_percentile(self.hedge_percentile) if self.hedge_percentile else None
+            try:
+                if delay is None:
+                    return await self._attempt(client, endpoint, path, payload, timeout)
+                return await self._hedged(client, endpoint, tried, path, payload, timeout, delay)
+            except BackendError as e:
+                print(f"[{time.strftime('%H:%M:%S')}] Ollama endpoint failed, failing over: {e}")
+                last_error = e
+
+    def post_json_sync(self, client: httpx.Client, path: str, payload: Dict, timeout=httpx.USE_CLIENT_DEFAULT) -> Dict:
+        """Blocking post_json for scripts: same routing, circuit breakers and failover, without hedging"""
+        tried: Set[str] = set()
+        last_error = None
+        while True:
+            endpoint = self.pick(exclude=tried)
+            if endpoint is None:
+                raise NoHealthyBackend(f"No Ollama endpoint available (last error: {last_error})")
+            tried.add(endpoint.url)
+            endpoint.outstanding += 1
+            start = time.monotonic()
+            outcome = "failure"
+            try:
+                data = self._read_json(client.post(f"{endpoint.url}{path}", json=payload, timeout=timeout))
+                outcome = "success"
+                return data
+            except httpx.HTTPStatusError:
+                outcome = "answered"
+                raise
+            except (httpx.TransportError, BackendError) as e:
+                print(f"[{time.strftime('%H:%M:%S')}] Ollama endpoint failed, failing over: {endpoint.url}: {e}")
+                last_error = BackendError(f"{endpoint.url}: {e}")
+            finally:
+                endpoint.outstanding -= 1
+                self._settle(endpoint, outcome, time.monotonic() - start)
+
+    @asynccontextmanager
+    async def stream(self, client: httpx.AsyncClient, path: str, payload: Dict, timeout=httpx.USE_CLIENT_DEFAULT) -> AsyncIterator[httpx.Response]:
+        """Open a streaming POST, failing over only until the response has started
+
+        Errors raised while the body is read (by the transport or by the
+        caller) count as failures of the endpoint; cancellation is neutral.
+        """
+        tried: Set[str] = set()
+        last_error = None
+        while True:
+            endpoint = self.pick(exclude=tried)
+            if endpoint is None:
+                raise NoHealthyBackend(f"No Ollama endpoint available (last error: {last_error})")
+            tried.add(endpoint.url)
+
+            endpoint.outstanding += 1
+            start = time.monotonic()
+            outcome = "failure"
+            response = None
+            started = False
+            try:
+                request = client.build_request("POST", f"{endpoint.url}{path}", json=payload, timeout=timeout)
+                response = await client.send(request, stream=True)
+                if response.status_code >= 500:
+                    raise BackendError(f"{endpoint.url} returned {response.status_code}")
+                if response.status_code >= 400:
+                    outcome = "answered"
+                    response.raise_for_status()
+                started = True
+                yield response
+                outcome = "success"
+                return
+            except (httpx.TransportError, BackendError) as e:
+                if started:
+                    raise
+                last_error = e
+            except (asyncio.CancelledError, GeneratorExit):
+                outcome = "cancelled"
+                raise
+            finally:
+                if response is not None:
+                    await response.aclose()
+                endpoint.outstanding -= 1
+                self._settle(endpoint, outcome, time.monotonic() - start)
+
+    async def _check_health(self, client: httpx.AsyncClient):
+        """Probe each endpoint's /api/tags"""
+        for endpoint in self.endpoints:
+            try:
+                response = await client.get(f"{endpoint.url}/api/tags", timeout=5.0)
+                healthy = response.status_code == 200
+            except httpx.HTTPError:
+                healthy = False
+            if healthy != endpoint.healthy:
+                print(f"[{time.strftime('%H:%M:%S')}] Ollama endpoint {endpoint.url} is now {'healthy' if healthy else 'unhealthy'}")
+            endpoint.healthy = healthy
+
+    async def _health_loop(self, client: httpx.AsyncClient):
+        while True:
+            await self._check_health(client)
+            await asyncio.sleep(self.health_interval)
+
+    def start_health_checks(self, client: httpx.AsyncClient):
+        """Run periodic health checks in the background"""
+        if self._health_task is None and self.health_interval > 0:
+            self._health_task = asyncio.create_task(self._health_loop(client))
+
+    async def stop_health_checks(self):
+        if self._health_task is not None:
+            self._health_task.cancel()
+            await asyncio.gather(self._health_task, return_exceptions=True)
+            self._health_task = None
+
+    def stats(self) -> Dict:
+        return {
+            "hedged": self.hedged,
+            "hedge_wins": self.hedge_wins,
+            "endpoints": {ep.url: ep.stats() for ep in self.endpoints},
+        }
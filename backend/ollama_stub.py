@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Stub Ollama server for exercising load balancing, failover and hedging locally
+
+Run two stubs and point the backend at both:
+    python ollama_stub.py --port 11501 --delay 2
+    python ollama_stub.py --port 11502 --delay 8 --fail-rate 0.3
+    OLLAMA_BASE_URLS=http://localhost:11501,http://localhost:11502 uvicorn app:app --port 8000
+"""
+
+import argparse
+import json
+import random
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+STUB_MCQ = {
+    "question": "A 20-year-old soccer player reports lateral ankle pain after an inversion injury. "
+                "Which finding MOST strongly suggests a grade III lateral ankle sprain?",
+    "choices": [
+        "A. Negative anterior drawer test",
+        "B. Marked laxity on the anterior drawer and talar tilt tests",
+        "C. Tenderness at the base of the fifth metatarsal",
+        "D. Pain with resisted eversion only",
+    ],
+    "correct": 1,
+    "explanations": {
+        "0": "A negative anterior drawer argues against a complete ATFL tear.",
+        "1": "Complete ligament rupture produces gross laxity on both stress tests.",
+        "2": "Fifth metatarsal tenderness suggests a fracture per the Ottawa rules.",
+        "3": "Isolated pain with resisted eversion points to a peroneal strain.",
+    },
+    "links": {key: ["https://www.apta.org"] for key in ["0", "1", "2", "3"]},
+}
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    delay = 1.0
+    fail_rate = 0.0
+
+    def _send_json(self, status: int, body: dict):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path == "/api/tags":
+            self._send_json(200, {"models": [{"name": "qwen:latest"}]})
+        else:
+            self._send_json(404, {"error": "not found"})
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        payload = json.loads(self.rfile.read(length) or b"{}")
+        if self.path == "/api/embed":
+            self._embed(payload)
+            return
+        time.sleep(self.delay * random.uniform(0.5, 1.5))
+
+        if random.random() < self.fail_rate:
+            self._send_json(500, {"error": "stub failure"})
+            return
+
+        text = json.dumps(STUB_MCQ)
+        if not payload.get("stream"):
+            self._send_json(200, {"model": payload.get("model"), "response": text, "done": True})
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.end_headers()
+        for i in range(0, len(text), 16):
+            line = json.dumps({"response": text[i:i + 16], "done": False}) + "\n"
+            self.wfile.write(line.encode("utf-8"))
+            self.wfile.flush()
+            time.sleep(0.01)
+        self.wfile.write((json.dumps({"response": "", "done": True}) + "\n").encode("utf-8"))
+
+    def _embed(self, payload: dict):
+        """Deterministic 768-d vectors; cost is a fixed overhead plus a per-input share of --delay"""
+        inputs = payload.get("input", [])
+        inputs = [inputs] if isinstance(inputs, str) else inputs
+        time.sleep(self.delay * (0.05 + 0.01 * len(inputs)))
+        if random.random() < self.fail_rate:
+            self._send_json(503, {"error": "stub overloaded"})
+            return
+        vectors = []
+        for text in inputs:
+            rng = random.Random(text)
+            vectors.append([rng.uniform(-1, 1) for _ in range(768)])
+        self._send_json(200, {"model": payload.get("model"), "embeddings": vectors})
+
+    def log_message(self, format, *args):
+        print(f"[{time.strftime('%H:%M:%S')}] stub:{self.server.server_port} {format % args}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=11501)
+    parser.add_argument("--delay", type=float, default=1.0, help="Mean generation time in seconds")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="Fraction of requests answered with 500")
+    args = parser.parse_args()
+
+    StubHandler.delay = args.delay
+    StubHandler.fail_rate = args.fail_rate
+    server = ThreadingHTTPServer(("0.0.0.0", args.port), StubHandler)
+    print(f"🧪 Stub Ollama on :{args.port} (delay={args.delay}s, fail_rate={args.fail_rate})")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
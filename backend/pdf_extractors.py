@@ -0,0 +1,70 @@
+"""
+Pluggable PDF text extractors for the NPTE RAG system
+PyMuPDF is the default when installed; PyPDF2 is kept as the fallback
+"""
+
+import logging
+from typing import Dict, Iterator, Optional, Type
+
+import PyPDF2
+
+try:
+    import pymupdf
+except ImportError:  # pragma: no cover - optional dependency
+    try:
+        import fitz as pymupdf  # PyMuPDF releases before the module rename
+    except ImportError:
+        pymupdf = None
+
+logger = logging.getLogger(__name__)
+
+
+class PDFExtractor:
+    """Yields the text of a PDF one page at a time"""
+
+    name = "base"
+
+    def extract_pages(self, file_path: str) -> Iterator[str]:
+        raise NotImplementedError
+
+
+class PyMuPDFExtractor(PDFExtractor):
+    """MuPDF's C parser; much faster than PyPDF2 and keeps word spacing"""
+
+    name = "pymupdf"
+
+    def __init__(self):
+        if pymupdf is None:
+            raise ImportError("PyMuPDF is not installed (pip install pymupdf)")
+
+    def extract_pages(self, file_path: str) -> Iterator[str]:
+        with pymupdf.open(file_path) as document:
+            for page in document:
+                yield page.get_text("text")
+
+
+class PyPDF2Extractor(PDFExtractor):
+    """Pure-Python extractor, used when PyMuPDF is missing or fails on a file"""
+
+    name = "pypdf2"
+
+    def extract_pages(self, file_path: str) -> Iterator[str]:
+        with open(file_path, "rb") as file:
+            for page in PyPDF2.PdfReader(file).pages:
+                yield page.extract_text() or ""
+
+
+PDF_EXTRACTORS: Dict[str, Type[PDFExtractor]] = {
+    PyMuPDFExtractor.name: PyMuPDFExtractor,
+    PyPDF2Extractor.name: PyPDF2Extractor,
+}
+
+DEFAULT_PDF_EXTRACTOR = PyMuPDFExtractor.name if pymupdf is not None else PyPDF2Extractor.name
+
+
+def get_pdf_extractor(name: Optional[str] = None) -> PDFExtractor:
+    """Extractor by name; defaults to PyMuPDF when available"""
+    name = (name or DEFAULT_PDF_EXTRACTOR).lower()
+    if name not in PDF_EXTRACTORS:
+        raise ValueError(f"Unknown PDF extractor {name!r}; choose from {sorted(PDF_EXTRACTORS)}")
+    return PDF_EXTRACTORS[name]()
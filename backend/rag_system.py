@@ -5,12 +5,14 @@ Handles document processing, vector storage, and retrieval
 
 import os
 import json
-from typing import List, Dict, Optional, Any
+import asyncio
+from typing import List, Dict, Optional, Any, Sequence, Union
 from pathlib import Path
 import logging
+import time
+import warnings
 
 # LangChain imports
-from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_ollama import OllamaEmbeddings
 from langchain_community.vectorstores import Qdrant
 from langchain.schema import Document
@@ -18,34 +20,115 @@ from langchain.retrievers import MultiQueryRetriever
 from langchain.retrievers.document_compressors import LLMChainExtractor
 
 # Qdrant imports
-from qdrant_client import QdrantClient
-from qdrant_client.models import Distance, VectorParams
+from qdrant_client import AsyncQdrantClient, QdrantClient
+from qdrant_client.models import (
+    Disabled, Distance, FieldCondition, Filter, FilterSelector, MatchAny, MatchValue, PayloadSchemaType,
+    QueryRequest, SearchParams, VectorParams, VectorParamsDiff,
+)
 
 # Document processing
-import PyPDF2
-import docx
-import re
+from document_processor import SUPPORTED_SUFFIXES, DocumentProcessor
+from flat_index import FlatIndex
+from batched_embeddings import BatchedEmbeddings
+from bm25_index import BM25Index, reciprocal_rank_fusion
+from context_pool import ContextPool
+from dedup import MinHashIndex
+from embedding_cache import CachedEmbeddings
+from ingestion_manifest import IngestionManifest
+from ingestion_pipeline import IngestionPipeline
+from mcq_pool import NPTE_TOPICS, normalize_topic
+from retrieval_cache import RetrievalCache
+from vector_quantization import quantization_config, quantization_mode, quantization_search_params
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# The query MCQ generation retrieves context for; context pools are built for it
+MCQ_CONTEXT_QUERY = "Generate NPTE-style multiple choice questions about {topic}"
+
+# Metadata fields that get a keyword payload index; the LangChain wrapper nests them under "metadata"
+INDEXED_METADATA_FIELDS = ("topic", "source", "type")
+
 class NPTERAGSystem:
     """RAG system specifically designed for NPTE materials"""
     
     def __init__(self, collection_name: str = "npte_materials"):
         self.collection_name = collection_name
-        self.embeddings = OllamaEmbeddings(model="nomic-embed-text")
         # Use persistent storage instead of in-memory
         qdrant_path = "./qdrant_data"  # Local persistent storage
-        self.qdrant_client = QdrantClient(path=qdrant_path)
+        # Re-indexing only pays Ollama for chunk text it has never embedded
+        self.embeddings = CachedEmbeddings(
+            BatchedEmbeddings(
+                OllamaEmbeddings(model="nomic-embed-text"),
+                batch_size=int(os.getenv("EMBED_BATCH_SIZE", "16")),
+                concurrency=int(os.getenv("EMBED_CONCURRENCY", "4")),
+            ),
+            path=os.path.join(qdrant_path, "embedding_cache.sqlite"),
+            max_bytes=int(os.getenv("EMBEDDING_CACHE_MB", "512")) * 1024 * 1024,
+        )
+        # Quantization and on-disk vectors only take effect on a Qdrant server
+        self.qdrant_url = os.getenv("RAG_QDRANT_URL")
+        self.qdrant_path = qdrant_path
+        self._qdrant_client = None  # opened on first use; embedded Qdrant locks its directory
+        self._async_qdrant_client = None
+        self.quantization = os.getenv("VECTOR_QUANTIZATION", "none")  # none, int8 or binary
+        self.vectors_on_disk = os.getenv("VECTOR_ON_DISK", "0") == "1"
+        self.search_params = quantization_search_params(
+            self.quantization, float(os.getenv("QUANTIZATION_OVERSAMPLING", "4.0"))
+        )
+        # Kept beside the collection it describes
+        self.manifest_path = os.path.join(qdrant_path, f"{collection_name}_manifest.json")
+        self.minhash_path = os.path.join(qdrant_path, f"{collection_name}_minhash.npz")
+        self.epoch_path = os.path.join(qdrant_path, f"{collection_name}_epoch")
+        # Repeated MCQ queries skip both Ollama and the vector search until the collection changes
+        self.retrieval_cache = RetrievalCache(
+            max_entries=int(os.getenv("RETRIEVAL_CACHE_SIZE", "1024")),
+            ttl_seconds=float(os.getenv("RETRIEVAL_CACHE_TTL", "3600")),
+        )
+        # Top-N chunks per topic for the MCQ query, sampled per request (0 disables)
+        self.context_pool_size = int(os.getenv("CONTEXT_POOL_SIZE", "200"))
+        self.context_pools: Dict[str, ContextPool] = {}
         self.vector_store = None
         self.retriever = None
-        self.text_splitter = RecursiveCharacterTextSplitter(
+        # qdrant (default) or flat: serve searches from a memory-mapped export of the collection
+        self.vector_backend = os.getenv("VECTOR_BACKEND", "qdrant")
+        self.flat_index_path = os.path.join(qdrant_path, f"{collection_name}_flat")
+        self.flat_index_dtype = os.getenv("FLAT_INDEX_DTYPE", "float32")  # float32 or float16
+        self.flat_index = None
+        # hybrid (default): vector results fused with BM25 by reciprocal rank; dense: vectors only;
+        # lexical: BM25 only, without Ollama. Hybrid also falls back to BM25 when embedding fails
+        self.retrieval_mode = os.getenv("RETRIEVAL_MODE", "hybrid")
+        self.bm25_index_path = os.path.join(qdrant_path, f"{collection_name}_bm25")
+        self.bm25_index = None
+        self.fusion_depth = int(os.getenv("FUSION_DEPTH", "20"))  # candidates per ranker before fusion
+        self.processor = DocumentProcessor(
             chunk_size=800,         # Optimal for research paper precision
             chunk_overlap=100,      # Minimal overlap for dense content
-            separators=["\n\n", "\n", ". ", " ", ""]
+            pdf_extractor=os.getenv("PDF_EXTRACTOR"),  # pymupdf (default) or pypdf2
+            chunker=os.getenv("CHUNKER", "sentence"),  # sentence (default) or recursive
         )
+        self.text_splitter = self.processor.text_splitter
         
+    @property
+    def qdrant_client(self) -> QdrantClient:
+        if self._qdrant_client is None:
+            if self.qdrant_url:
+                self._qdrant_client = QdrantClient(url=self.qdrant_url, api_key=os.getenv("QDRANT_API_KEY"))
+            else:
+                self._qdrant_client = QdrantClient(path=self.qdrant_path)
+        return self._qdrant_client
+    
+    @qdrant_client.setter
+    def qdrant_client(self, client: QdrantClient):
+        self._qdrant_client = client
+    
+    @property
+    def async_qdrant_client(self) -> Optional[AsyncQdrantClient]:
+        """Async client for a Qdrant server; None for embedded Qdrant, whose directory only one client can open"""
+        if self._async_qdrant_client is None and self.qdrant_url:
+            self._async_qdrant_client = AsyncQdrantClient(url=self.qdrant_url, api_key=os.getenv("QDRANT_API_KEY"))
+        return self._async_qdrant_client
+    
     def setup_collection(self):
         """Initialize Qdrant collection"""
         try:
@@ -54,11 +137,14 @@ class NPTERAGSystem:
             if self.collection_name not in [c.name for c in collections.collections]:
                 self.qdrant_client.create_collection(
                     collection_name=self.collection_name,
-                    vectors_config=VectorParams(size=768, distance=Distance.COSINE)  # Ollama embedding dimension
+                    vectors_config=VectorParams(size=768, distance=Distance.COSINE, on_disk=self.vectors_on_disk),  # Ollama embedding dimension
+                    quantization_config=quantization_config(self.quantization),
                 )
                 logger.info(f"Created collection: {self.collection_name}")
             else:
                 logger.info(f"Collection {self.collection_name} already exists")
+                self._migrate_vector_storage()
+            self._ensure_payload_indexes()
                 
             # Initialize vector store
             self.vector_store = Qdrant(
@@ -77,146 +163,213 @@ class NPTERAGSystem:
             logger.error(f"Error setting up collection: {e}")
             raise
     
-    def process_pdf(self, file_path: str) -> List[Document]:
-        """Extract text from PDF and split into chunks"""
-        try:
-            with open(file_path, 'rb') as file:
-                pdf_reader = PyPDF2.PdfReader(file)
-                text = ""
-                for page in pdf_reader.pages:
-                    text += page.extract_text() + "\n"
-                
-            # Clean text
-            text = self._clean_text(text)
-            
-            # Split into chunks
-            chunks = self.text_splitter.split_text(text)
-            
-            # Create documents with metadata
-            documents = []
-            for i, chunk in enumerate(chunks):
-                doc = Document(
-                    page_content=chunk,
-                    metadata={
-                        "source": file_path,
-                        "chunk_id": i,
-                        "type": "pdf",
-                        "topic": self._extract_topic_from_filename(file_path)
-                    }
+    def _vector_storage(self) -> tuple:
+        """(quantization mode, originals on disk) the collection currently has"""
+        config = self.qdrant_client.get_collection(self.collection_name).config
+        return quantization_mode(config.quantization_config), bool(config.params.vectors.on_disk)
+    
+    def _migrate_vector_storage(self):
+        """Bring an existing collection to the configured quantization and on-disk setting
+        
+        The server re-encodes segments in the background; points stay
+        searchable throughout and nothing needs re-embedding.
+        """
+        wanted = (self.quantization.lower(), self.vectors_on_disk)
+        current = self._vector_storage()
+        if current == wanted:
+            return
+        logger.info(f"Migrating {self.collection_name} vectors from {current} to {wanted} (quantization, on disk)")
+        self.qdrant_client.update_collection(
+            collection_name=self.collection_name,
+            vectors_config={"": VectorParamsDiff(on_disk=self.vectors_on_disk)},
+            quantization_config=quantization_config(self.quantization) or Disabled.DISABLED,
+        )
+        if self._vector_storage() != wanted:
+            logger.warning("Embedded Qdrant ignores quantization and on-disk vectors; set RAG_QDRANT_URL to use them")
+    
+    def _ensure_payload_indexes(self):
+        """Create the keyword payload indexes that topic/source/type filters use
+        
+        Idempotent, so collections created before the indexes existed get
+        them on the next start. Embedded (path=) Qdrant accepts but ignores
+        payload indexes and filters by scanning; a Qdrant server uses them.
+        """
+        existing = self.qdrant_client.get_collection(self.collection_name).payload_schema or {}
+        for field in INDEXED_METADATA_FIELDS:
+            key = f"{Qdrant.METADATA_KEY}.{field}"
+            if key in existing:
+                continue
+            with warnings.catch_warnings():
+                # Embedded mode warns on every start that indexes have no effect
+                warnings.simplefilter("ignore", UserWarning)
+                self.qdrant_client.create_payload_index(
+                    collection_name=self.collection_name,
+                    field_name=key,
+                    field_schema=PayloadSchemaType.KEYWORD,
+                    wait=True,
                 )
-                documents.append(doc)
-                
-            logger.info(f"Processed PDF: {file_path} -> {len(documents)} chunks")
-            return documents
-            
+    
+    @staticmethod
+    def metadata_filter(**conditions: str) -> Optional[Filter]:
+        """Native Qdrant filter matching chunk metadata, e.g. metadata_filter(topic="Lymphatic system")"""
+        must = [
+            FieldCondition(key=f"{Qdrant.METADATA_KEY}.{field}", match=MatchValue(value=value))
+            for field, value in conditions.items() if value
+        ]
+        return Filter(must=must) if must else None
+    
+    def search_by_vector(self, query_vector: List[float], k: int = 5, query_filter: Optional[Filter] = None,
+                         search_params: Optional[SearchParams] = None) -> List[Document]:
+        """Top-k chunks for an embedded query, optionally restricted by a native Qdrant filter"""
+        response = self.qdrant_client.query_points(
+            collection_name=self.collection_name,
+            query=query_vector,
+            query_filter=query_filter,
+            search_params=search_params,
+            limit=k,
+            with_payload=[Qdrant.CONTENT_KEY, Qdrant.METADATA_KEY],
+        )
+        return [self._point_to_document(point) for point in response.points]
+    
+    @staticmethod
+    def _point_to_document(point) -> Document:
+        return Document(
+            page_content=point.payload.get(Qdrant.CONTENT_KEY) or "",
+            metadata={**(point.payload.get(Qdrant.METADATA_KEY) or {}), "score": point.score},
+        )
+    
+    def _search_many(self, query_vectors: List[List[float]], k: int, topics: List[Optional[str]]) -> List[List[Document]]:
+        """Top-k chunks for each query vector, in one Qdrant batch request"""
+        if self.flat_index is not None:
+            # Already in-process; a batch request would save nothing
+            return [self.flat_index.search(vector, k=k, topic=topic) for vector, topic in zip(query_vectors, topics)]
+        requests = [
+            QueryRequest(
+                query=vector,
+                filter=self.metadata_filter(topic=topic),
+                params=self.search_params,
+                limit=k,
+                with_payload=[Qdrant.CONTENT_KEY, Qdrant.METADATA_KEY],
+            )
+            for vector, topic in zip(query_vectors, topics)
+        ]
+        responses = self.qdrant_client.query_batch_points(collection_name=self.collection_name, requests=requests)
+        return [[self._point_to_document(point) for point in response.points] for response in responses]
+    
+    def open_flat_index(self) -> bool:
+        """Serve searches from the flat index without opening Qdrant; False if none has been built"""
+        if not FlatIndex.exists(self.flat_index_path):
+            return False
+        self.flat_index = FlatIndex(self.flat_index_path)
+        logger.info(f"Opened flat index {self.flat_index_path} ({len(self.flat_index)} chunks, {self.flat_index.dtype})")
+        return True
+    
+    def export_flat_index(self) -> FlatIndex:
+        """Write the collection out as a new flat index generation; open readers switch on their next search"""
+        if self.vector_store is None:
+            self.setup_collection()
+        index = FlatIndex.from_qdrant(
+            self.qdrant_client,
+            self.collection_name,
+            self.flat_index_path,
+            dtype=self.flat_index_dtype,
+            content_key=self.vector_store.content_payload_key,
+            metadata_key=self.vector_store.metadata_payload_key,
+        )
+        if self.vector_backend == "flat":
+            self.flat_index = index
+        return index
+    
+    def _search(self, query_vector: List[float], k: int, topic: Optional[str] = None) -> List[Document]:
+        """Top-k chunks from the active backend, optionally restricted to one topic"""
+        if self.flat_index is not None:
+            return self.flat_index.search(query_vector, k=k, topic=topic)
+        return self.search_by_vector(
+            query_vector, k=k, query_filter=self.metadata_filter(topic=topic), search_params=self.search_params
+        )
+    
+    def open_bm25_index(self) -> bool:
+        """Open the BM25 index for hybrid and lexical retrieval; False if none has been built with the current tokenizer"""
+        if not BM25Index.exists(self.bm25_index_path):
+            return False
+        self.bm25_index = BM25Index(self.bm25_index_path)
+        logger.info(f"Opened BM25 index {self.bm25_index_path} ({len(self.bm25_index)} chunks)")
+        return True
+    
+    def export_bm25_index(self) -> BM25Index:
+        """Rebuild the BM25 index from the collection's chunk text as a new generation"""
+        if self.vector_store is None:
+            self.setup_collection()
+        self.bm25_index = BM25Index.from_qdrant(
+            self.qdrant_client,
+            self.collection_name,
+            self.bm25_index_path,
+            content_key=self.vector_store.content_payload_key,
+            metadata_key=self.vector_store.metadata_payload_key,
+        )
+        return self.bm25_index
+    
+    def _lexical_index(self) -> Optional[BM25Index]:
+        """The BM25 index, unless retrieval is dense-only"""
+        return None if self.retrieval_mode == "dense" else self.bm25_index
+    
+    def _lexical_only(self) -> bool:
+        """Whether BM25 answers alone: lexical mode, or no vector backend is open"""
+        return self._lexical_index() is not None and (
+            self.retrieval_mode == "lexical" or (self.vector_store is None and self.flat_index is None)
+        )
+    
+    def _embedding_failed(self, error: Exception):
+        """Re-raise unless BM25 can answer instead"""
+        if self._lexical_index() is None:
+            raise error
+        logger.warning(f"Query embedding failed ({error}); answering from the BM25 index alone")
+    
+    def _query_vector(self, search_query: str) -> Optional[List[float]]:
+        """The query embedding, or None when BM25 answers alone"""
+        if self._lexical_only():
+            return None
+        try:
+            return self._embed_query(search_query)
         except Exception as e:
-            logger.error(f"Error processing PDF {file_path}: {e}")
-            return []
+            self._embedding_failed(e)
+            return None
+    
+    def _dense_depth(self, k: int) -> int:
+        return k if self._lexical_index() is None else max(k, self.fusion_depth)
+    
+    def _fuse(self, query: str, dense: List[Document], k: int, topic: Optional[str]) -> List[Document]:
+        """Dense results fused with BM25 results for the query text, or as-is without a BM25 index"""
+        lexical = self._lexical_index()
+        if lexical is None:
+            return dense
+        return reciprocal_rank_fusion([dense, lexical.search(query, self._dense_depth(k), topic)], k)
+    
+    def _retrieve(self, query: str, query_vector: Optional[List[float]], k: int, topic: Optional[str] = None) -> List[Document]:
+        """Top-k chunks by BM25 alone (no query vector), by vector, or both fused"""
+        if query_vector is None:
+            return self._lexical_index().search(query, k, topic)
+        return self._fuse(query, self._search(query_vector, self._dense_depth(k), topic), k, topic)
+    
+    def _retrieve_many(self, queries: List[str], query_vectors: Optional[List[List[float]]], k: int,
+                       topics: List[Optional[str]]) -> List[List[Document]]:
+        """_retrieve for many queries, with the vector searches in one batch request"""
+        if query_vectors is None:
+            return [self._lexical_index().search(query, k, topic) for query, topic in zip(queries, topics)]
+        found = self._search_many(query_vectors, self._dense_depth(k), topics)
+        return [self._fuse(query, dense, k, topic) for query, dense, topic in zip(queries, found, topics)]
+    
+    def process_pdf(self, file_path: str) -> List[Document]:
+        """Extract text from PDF and split into chunks"""
+        return self.processor.process_pdf(file_path)
     
     def process_docx(self, file_path: str) -> List[Document]:
         """Extract text from DOCX and split into chunks"""
-        try:
-            doc = docx.Document(file_path)
-            text = ""
-            for paragraph in doc.paragraphs:
-                text += paragraph.text + "\n"
-                
-            # Clean text
-            text = self._clean_text(text)
-            
-            # Split into chunks
-            chunks = self.text_splitter.split_text(text)
-            
-            # Create documents with metadata
-            documents = []
-            for i, chunk in enumerate(chunks):
-                doc = Document(
-                    page_content=chunk,
-                    metadata={
-                        "source": file_path,
-                        "chunk_id": i,
-                        "type": "docx",
-                        "topic": self._extract_topic_from_filename(file_path)
-                    }
-                )
-                documents.append(doc)
-                
-            logger.info(f"Processed DOCX: {file_path} -> {len(documents)} chunks")
-            return documents
-            
-        except Exception as e:
-            logger.error(f"Error processing DOCX {file_path}: {e}")
-            return []
+        return self.processor.process_docx(file_path)
     
     def process_text_file(self, file_path: str) -> List[Document]:
         """Process plain text files"""
-        try:
-            with open(file_path, 'r', encoding='utf-8') as file:
-                text = file.read()
-                
-            # Clean text
-            text = self._clean_text(text)
-            
-            # Split into chunks
-            chunks = self.text_splitter.split_text(text)
-            
-            # Create documents with metadata
-            documents = []
-            for i, chunk in enumerate(chunks):
-                doc = Document(
-                    page_content=chunk,
-                    metadata={
-                        "source": file_path,
-                        "chunk_id": i,
-                        "type": "txt",
-                        "topic": self._extract_topic_from_filename(file_path)
-                    }
-                )
-                documents.append(doc)
-                
-            logger.info(f"Processed text file: {file_path} -> {len(documents)} chunks")
-            return documents
-            
-        except Exception as e:
-            logger.error(f"Error processing text file {file_path}: {e}")
-            return []
-    
-    def _clean_text(self, text: str) -> str:
-        """Clean and normalize text"""
-        # Remove extra whitespace
-        text = re.sub(r'\s+', ' ', text)
-        # Remove special characters that might interfere
-        text = re.sub(r'[^\w\s\.\,\!\?\;\:\-\(\)]', '', text)
-        return text.strip()
-    
-    def _extract_topic_from_filename(self, filename: str) -> str:
-        """Extract topic from filename"""
-        filename_lower = filename.lower()
-        
-        # Map filename patterns to NPTE topics
-        topic_mapping = {
-            "cardiovascular": "Cardiovascular and pulmonary systems",
-            "cardio": "Cardiovascular and pulmonary systems",
-            "musculoskeletal": "Musculoskeletal system",
-            "musculo": "Musculoskeletal system",
-            "neuromuscular": "Neuromuscular and nervous systems",
-            "neuro": "Neuromuscular and nervous systems",
-            "integumentary": "Integumentary system",
-            "metabolic": "Metabolic and endocrine systems",
-            "endocrine": "Metabolic and endocrine systems",
-            "gastrointestinal": "Gastrointestinal system",
-            "gi": "Gastrointestinal system",
-            "genitourinary": "Genitourinary system",
-            "gu": "Genitourinary system",
-            "lymphatic": "Lymphatic system",
-            "system": "System interactions"
-        }
-        
-        for pattern, topic in topic_mapping.items():
-            if pattern in filename_lower:
-                return topic
-                
-        return "General"
+        return self.processor.process_text_file(file_path)
     
     def add_documents(self, documents: List[Document]):
         """Add documents to the vector store"""
@@ -226,31 +379,186 @@ class NPTERAGSystem:
                 
             # Add documents to vector store
             self.vector_store.add_documents(documents)
+            self.bump_collection_epoch()
             logger.info(f"Added {len(documents)} documents to vector store")
             
         except Exception as e:
             logger.error(f"Error adding documents: {e}")
             raise
     
+    def collection_epoch(self) -> int:
+        """Version of the collection contents, shared through a file so every process sees bumps"""
+        try:
+            with open(self.epoch_path) as file:
+                return int(file.read().strip() or 0)
+        except (FileNotFoundError, ValueError):
+            return 0
+    
+    def bump_collection_epoch(self) -> int:
+        """Mark the collection as changed, invalidating cached retrieval results"""
+        epoch = self.collection_epoch() + 1
+        os.makedirs(os.path.dirname(self.epoch_path) or ".", exist_ok=True)
+        tmp_path = f"{self.epoch_path}.tmp"
+        with open(tmp_path, "w") as file:
+            file.write(str(epoch))
+        os.replace(tmp_path, self.epoch_path)
+        return epoch
+    
+    def _embed_query(self, query: str) -> List[float]:
+        vector = self.retrieval_cache.get_embedding(query)
+        if vector is None:
+            start = time.perf_counter()
+            vector = self.embeddings.embed_query(query)
+            self.retrieval_cache.put_embedding(query, vector, time.perf_counter() - start)
+        return vector
+    
+    @staticmethod
+    def _search_query(query: str, topic: Optional[str]) -> str:
+        return f"Topic: {topic}. {query}" if topic else query
+    
+    def build_context_pool(self, topic: str) -> ContextPool:
+        """Retrieve the top `context_pool_size` chunks for a topic's MCQ query and keep them in memory"""
+        search_query = self._search_query(MCQ_CONTEXT_QUERY.format(topic=topic), topic)
+        epoch = self.collection_epoch()
+        query_vector = self._embed_query(search_query)
+        documents = self._search(query_vector, self.context_pool_size, topic) or self._search(query_vector, self.context_pool_size)
+        pool = ContextPool(topic, search_query, documents, epoch)
+        self.context_pools[normalize_topic(topic)] = pool
+        return pool
+    
+    def build_context_pools(self, topics: Optional[List[str]] = None) -> int:
+        """Build pools for the given topics (default: the NPTE topics); returns the chunks pooled"""
+        if self.context_pool_size <= 0 or self._lexical_only():
+            return 0
+        start = time.perf_counter()
+        pooled = sum(len(self.build_context_pool(topic)) for topic in (topics or NPTE_TOPICS))
+        logger.info(f"Built {len(topics or NPTE_TOPICS)} context pools ({pooled} chunks) in {time.perf_counter() - start:.2f}s")
+        return pooled
+    
+    def _context_pool_for(self, search_query: str, topic: Optional[str]) -> Optional[ContextPool]:
+        """The topic's pool if it was built for this query"""
+        pool = self.context_pools.get(normalize_topic(topic)) if topic else None
+        return pool if pool is not None and pool.query == search_query else None
+    
+    def _pooled_context(self, search_query: str, topic: Optional[str], k: int, epoch: int) -> Optional[List[Document]]:
+        """A sample from the topic's pool if it was built for this query, else None"""
+        pool = self._context_pool_for(search_query, topic)
+        if pool is None:
+            return None
+        if pool.epoch != epoch:
+            # Ingestion changed the collection since the pool was built
+            pool = self.build_context_pool(pool.topic)
+        return pool.sample(k) or None
+    
+    def _embed_queries(self, queries: List[str]) -> List[List[float]]:
+        """Query vectors for many queries, with every cache miss embedded in one batched call"""
+        vectors = [self.retrieval_cache.get_embedding(query) for query in queries]
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        if missing:
+            start = time.perf_counter()
+            embedded = self.embeddings.embed_documents([queries[i] for i in missing])
+            seconds = (time.perf_counter() - start) / len(missing)
+            for i, vector in zip(missing, embedded):
+                vectors[i] = vector
+                self.retrieval_cache.put_embedding(queries[i], vector, seconds)
+        return vectors
+    
+    def retrieve_many(self, queries: Sequence[str], topics: Union[None, str, Sequence[Optional[str]]] = None,
+                      k: int = 5) -> List[List[Document]]:
+        """Retrieve context for many queries at once; result i belongs to queries[i]
+        
+        `topics` is one topic for all queries or one per query. Results
+        match calling retrieve_relevant_context for each query, but the
+        queries that context pools and the result cache cannot answer
+        are embedded in one batched call and searched in one Qdrant batch
+        request. Topics without tagged chunks are retried unfiltered in a
+        second batch.
+        """
+        if topics is None or isinstance(topics, str):
+            topics = [topics] * len(queries)
+        if len(topics) != len(queries):
+            raise ValueError(f"Got {len(topics)} topics for {len(queries)} queries")
+        try:
+            if self.vector_store is None and self.flat_index is None and self.bm25_index is None:
+                logger.warning("Vector store not initialized. Returning empty context.")
+                return [[] for _ in queries]
+            
+            search_queries = [self._search_query(query, topic) for query, topic in zip(queries, topics)]
+            epoch = self.collection_epoch()
+            results: List[Optional[List[Document]]] = []
+            for search_query, topic in zip(search_queries, topics):
+                docs = self._pooled_context(search_query, topic, k, epoch)
+                if docs is None:
+                    docs = self.retrieval_cache.get_results(search_query, topic, k, epoch)
+                results.append(docs)
+            
+            pending = [i for i, docs in enumerate(results) if docs is None]
+            if pending:
+                start = time.perf_counter()
+                vectors = None
+                if not self._lexical_only():
+                    try:
+                        vectors = self._embed_queries([search_queries[i] for i in pending])
+                    except Exception as e:
+                        self._embedding_failed(e)
+                texts = [queries[i] for i in pending]
+                found = self._retrieve_many(texts, vectors, k, [topics[i] for i in pending])
+                retry = [j for j, docs in enumerate(found) if not docs and topics[pending[j]]]
+                if retry:
+                    unfiltered = self._retrieve_many(
+                        [texts[j] for j in retry], None if vectors is None else [vectors[j] for j in retry], k, [None] * len(retry)
+                    )
+                    for j, docs in zip(retry, unfiltered):
+                        found[j] = docs
+                seconds = (time.perf_counter() - start) / len(pending)
+                for i, docs in zip(pending, found):
+                    results[i] = docs
+                    if vectors is not None or self._lexical_only():
+                        # Not the fallback answer of an embedding outage
+                        self.retrieval_cache.put_results(search_queries[i], topics[i], k, epoch, docs, seconds)
+            logger.info(f"Retrieved context for {len(queries)} queries ({len(pending)} searched in one batch)")
+            return results
+            
+        except Exception as e:
+            logger.error(f"Error retrieving context: {e}")
+            return [[] for _ in queries]
+    
     def retrieve_relevant_context(self, query: str, topic: str = None, k: int = 5) -> List[Document]:
-        """Retrieve relevant context for MCQ generation"""
+        """Retrieve relevant context for MCQ generation
+        
+        When the topic has a context pool built for this query, a fresh
+        diverse sample of it is returned without any search.
+        """
         try:
-            if self.vector_store is None:
+            if self.vector_store is None and self.flat_index is None and self.bm25_index is None:
                 logger.warning("Vector store not initialized. Returning empty context.")
                 return []
             
             # Build search query
-            search_query = query
-            if topic:
-                search_query = f"Topic: {topic}. {query}"
+            search_query = self._search_query(query, topic)
             
-            # Retrieve documents
-            docs = self.vector_store.similarity_search(
-                search_query,
-                k=k,
-                filter={"topic": topic} if topic else None
-            )
+            epoch = self.collection_epoch()
+            docs = self._pooled_context(search_query, topic, k, epoch)
+            if docs is not None:
+                return docs
+            docs = self.retrieval_cache.get_results(search_query, topic, k, epoch)
+            if docs is not None:
+                return docs
+            start = time.perf_counter()
             
+            # Embed once; the topic filter goes to Qdrant's payload index or the flat index's topic mask.
+            # BM25 scores the query text itself, without the topic prefix; its topic filter is a row mask
+            query_vector = self._query_vector(search_query)
+            docs = []
+            if topic:
+                docs = self._retrieve(query, query_vector, k, topic)
+                if not docs:
+                    logger.info(f"No chunks tagged with topic {topic!r}; searching all topics")
+            if not docs:
+                docs = self._retrieve(query, query_vector, k)
+            if query_vector is not None or self._lexical_only():
+                # Not the fallback answer of an embedding outage
+                self.retrieval_cache.put_results(search_query, topic, k, epoch, docs, time.perf_counter() - start)
             logger.info(f"Retrieved {len(docs)} relevant documents for query: {query}")
             return docs
             
@@ -260,9 +568,12 @@ class NPTERAGSystem:
     
     def get_context_for_mcq_generation(self, topic: str) -> str:
         """Get formatted context for MCQ generation"""
-        query = f"Generate NPTE-style multiple choice questions about {topic}"
+        query = MCQ_CONTEXT_QUERY.format(topic=topic)
         docs = self.retrieve_relevant_context(query, topic)
-        
+        return self._format_context(docs)
+    
+    @staticmethod
+    def _format_context(docs: List[Document]) -> str:
         if not docs:
             return ""
         
@@ -273,41 +584,308 @@ class NPTERAGSystem:
         
         return "\n\n".join(context_parts)
     
-    def load_documents_from_directory(self, directory_path: str):
-        """Load all documents from a directory"""
+    # Async retrieval: the same lookups as above without blocking the event loop.
+    # Embeddings are awaited natively; searches use AsyncQdrantClient against a
+    # Qdrant server and a worker thread for embedded Qdrant or the flat index.
+    
+    async def _aembed_query(self, query: str) -> List[float]:
+        vector = self.retrieval_cache.get_embedding(query)
+        if vector is None:
+            start = time.perf_counter()
+            vector = await self.embeddings.aembed_query(query)
+            self.retrieval_cache.put_embedding(query, vector, time.perf_counter() - start)
+        return vector
+    
+    async def _aembed_queries(self, queries: List[str]) -> List[List[float]]:
+        vectors = [self.retrieval_cache.get_embedding(query) for query in queries]
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        if missing:
+            start = time.perf_counter()
+            embedded = await self.embeddings.aembed_documents([queries[i] for i in missing])
+            seconds = (time.perf_counter() - start) / len(missing)
+            for i, vector in zip(missing, embedded):
+                vectors[i] = vector
+                self.retrieval_cache.put_embedding(queries[i], vector, seconds)
+        return vectors
+    
+    async def _asearch(self, query_vector: List[float], k: int, topic: Optional[str] = None) -> List[Document]:
+        client = self.async_qdrant_client
+        if self.flat_index is not None or client is None:
+            return await asyncio.to_thread(self._search, query_vector, k, topic)
+        response = await client.query_points(
+            collection_name=self.collection_name,
+            query=query_vector,
+            query_filter=self.metadata_filter(topic=topic),
+            search_params=self.search_params,
+            limit=k,
+            with_payload=[Qdrant.CONTENT_KEY, Qdrant.METADATA_KEY],
+        )
+        return [self._point_to_document(point) for point in response.points]
+    
+    async def _asearch_many(self, query_vectors: List[List[float]], k: int, topics: List[Optional[str]]) -> List[List[Document]]:
+        client = self.async_qdrant_client
+        if self.flat_index is not None or client is None:
+            return await asyncio.to_thread(self._search_many, query_vectors, k, topics)
+        requests = [
+            QueryRequest(
+                query=vector,
+                filter=self.metadata_filter(topic=topic),
+                params=self.search_params,
+                limit=k,
+                with_payload=[Qdrant.CONTENT_KEY, Qdrant.METADATA_KEY],
+            )
+            for vector, topic in zip(query_vectors, topics)
+        ]
+        responses = await client.query_batch_points(collection_name=self.collection_name, requests=requests)
+        return [[self._point_to_document(point) for point in response.points] for response in responses]
+    
+    async def _aquery_vector(self, search_query: str) -> Optional[List[float]]:
+        if self._lexical_only():
+            return None
+        try:
+            return await self._aembed_query(search_query)
+        except Exception as e:
+            self._embedding_failed(e)
+            return None
+    
+    # BM25 scoring is sub-millisecond scatter-adds over memory-mapped postings, so it runs inline
+    
+    async def _aretrieve(self, query: str, query_vector: Optional[List[float]], k: int, topic: Optional[str] = None) -> List[Document]:
+        if query_vector is None:
+            return self._lexical_index().search(query, k, topic)
+        return self._fuse(query, await self._asearch(query_vector, self._dense_depth(k), topic), k, topic)
+    
+    async def _aretrieve_many(self, queries: List[str], query_vectors: Optional[List[List[float]]], k: int,
+                              topics: List[Optional[str]]) -> List[List[Document]]:
+        if query_vectors is None:
+            return [self._lexical_index().search(query, k, topic) for query, topic in zip(queries, topics)]
+        found = await self._asearch_many(query_vectors, self._dense_depth(k), topics)
+        return [self._fuse(query, dense, k, topic) for query, dense, topic in zip(queries, found, topics)]
+    
+    async def _apooled_context(self, search_query: str, topic: Optional[str], k: int, epoch: int) -> Optional[List[Document]]:
+        pool = self._context_pool_for(search_query, topic)
+        if pool is None:
+            return None
+        if pool.epoch != epoch:
+            pool = await asyncio.to_thread(self.build_context_pool, pool.topic)
+        return pool.sample(k) or None
+    
+    async def aretrieve_relevant_context(self, query: str, topic: str = None, k: int = 5) -> List[Document]:
+        """Async twin of retrieve_relevant_context"""
+        try:
+            if self.vector_store is None and self.flat_index is None and self.bm25_index is None:
+                logger.warning("Vector store not initialized. Returning empty context.")
+                return []
+            
+            search_query = self._search_query(query, topic)
+            epoch = self.collection_epoch()
+            docs = await self._apooled_context(search_query, topic, k, epoch)
+            if docs is not None:
+                return docs
+            docs = self.retrieval_cache.get_results(search_query, topic, k, epoch)
+            if docs is not None:
+                return docs
+            start = time.perf_counter()
+            
+            query_vector = await self._aquery_vector(search_query)
+            docs = []
+            if topic:
+                docs = await self._aretrieve(query, query_vector, k, topic)
+                if not docs:
+                    logger.info(f"No chunks tagged with topic {topic!r}; searching all topics")
+            if not docs:
+                docs = await self._aretrieve(query, query_vector, k)
+            if query_vector is not None or self._lexical_only():
+                self.retrieval_cache.put_results(search_query, topic, k, epoch, docs, time.perf_counter() - start)
+            logger.info(f"Retrieved {len(docs)} relevant documents for query: {query}")
+            return docs
+            
+        except Exception as e:
+            logger.error(f"Error retrieving context: {e}")
+            return []
+    
+    async def aretrieve_many(self, queries: Sequence[str], topics: Union[None, str, Sequence[Optional[str]]] = None,
+                             k: int = 5) -> List[List[Document]]:
+        """Async twin of retrieve_many"""
+        if topics is None or isinstance(topics, str):
+            topics = [topics] * len(queries)
+        if len(topics) != len(queries):
+            raise ValueError(f"Got {len(topics)} topics for {len(queries)} queries")
+        try:
+            if self.vector_store is None and self.flat_index is None and self.bm25_index is None:
+                logger.warning("Vector store not initialized. Returning empty context.")
+                return [[] for _ in queries]
+            
+            search_queries = [self._search_query(query, topic) for query, topic in zip(queries, topics)]
+            epoch = self.collection_epoch()
+            results: List[Optional[List[Document]]] = []
+            for search_query, topic in zip(search_queries, topics):
+                docs = await self._apooled_context(search_query, topic, k, epoch)
+                if docs is None:
+                    docs = self.retrieval_cache.get_results(search_query, topic, k, epoch)
+                results.append(docs)
+            
+            pending = [i for i, docs in enumerate(results) if docs is None]
+            if pending:
+                start = time.perf_counter()
+                vectors = None
+                if not self._lexical_only():
+                    try:
+                        vectors = await self._aembed_queries([search_queries[i] for i in pending])
+                    except Exception as e:
+                        self._embedding_failed(e)
+                texts = [queries[i] for i in pending]
+                found = await self._aretrieve_many(texts, vectors, k, [topics[i] for i in pending])
+                retry = [j for j, docs in enumerate(found) if not docs and topics[pending[j]]]
+                if retry:
+                    unfiltered = await self._aretrieve_many(
+                        [texts[j] for j in retry], None if vectors is None else [vectors[j] for j in retry], k, [None] * len(retry)
+                    )
+                    for j, docs in zip(retry, unfiltered):
+                        found[j] = docs
+                seconds = (time.perf_counter() - start) / len(pending)
+                for i, docs in zip(pending, found):
+                    results[i] = docs
+                    if vectors is not None or self._lexical_only():
+                        self.retrieval_cache.put_results(search_queries[i], topics[i], k, epoch, docs, seconds)
+            logger.info(f"Retrieved context for {len(queries)} queries ({len(pending)} searched in one batch)")
+            return results
+            
+        except Exception as e:
+            logger.error(f"Error retrieving context: {e}")
+            return [[] for _ in queries]
+    
+    async def aget_context_for_mcq_generation(self, topic: str) -> str:
+        """Async twin of get_context_for_mcq_generation"""
+        docs = await self.aretrieve_relevant_context(MCQ_CONTEXT_QUERY.format(topic=topic), topic)
+        return self._format_context(docs)
+    
+    async def aclose(self):
+        """Close the async Qdrant client, if one was opened"""
+        if self._async_qdrant_client is not None:
+            await self._async_qdrant_client.close()
+            self._async_qdrant_client = None
+    
+    def delete_sources(self, sources: List[str]):
+        """Remove every chunk that came from the given source files"""
+        if not sources:
+            return
+        if self.vector_store is None:
+            self.setup_collection()
+        self.qdrant_client.delete(
+            collection_name=self.collection_name,
+            points_selector=FilterSelector(
+                filter=Filter(must=[FieldCondition(key="metadata.source", match=MatchAny(any=sources))])
+            ),
+            wait=True,
+        )
+        self.bump_collection_epoch()
+        logger.info(f"Deleted chunks of {len(sources)} files from {self.collection_name}")
+    
+    def load_documents_from_directory(self, directory_path: str, max_workers: Optional[int] = None, batch_size: int = 128, force: bool = False, dedup: bool = True) -> Dict:
+        """Load all documents from a directory
+        
+        Runs the streaming ingestion pipeline: files are extracted in a
+        process pool of `max_workers` (default: CPU count; 1 = in-process)
+        in sorted order, and chunks are embedded and upserted to Qdrant in
+        batches of `batch_size` while extraction continues. A file that
+        fails is logged and skipped without affecting the others.
+        
+        The ingestion manifest makes re-runs incremental: unchanged files
+        are skipped, changed files have their old chunks replaced and
+        deleted files have their chunks removed. `force` re-ingests all.
+        
+        Identical copies of a file (e.g. documents/ and documents/data/)
+        are indexed once, with the copies listed in `metadata.aliases`.
+        With `dedup`, near-duplicate chunks (MinHash/LSH over word
+        shingles) are dropped before embedding and their sources added to
+        the aliases of the chunk that was kept.
+        """
         directory = Path(directory_path)
         
         if not directory.exists():
             logger.error(f"Directory does not exist: {directory_path}")
-            return
+            return {}
         
-        all_documents = []
+        file_paths = []
+        for file_path in sorted(directory.rglob("*")):
+            if not file_path.is_file():
+                continue
+            if file_path.suffix.lower() not in SUPPORTED_SUFFIXES:
+                logger.info(f"Skipping unsupported file: {file_path}")
+                continue
+            file_paths.append(str(file_path))
         
-        # Process all files in directory
-        for file_path in directory.rglob("*"):
-            if file_path.is_file():
-                try:
-                    if file_path.suffix.lower() == '.pdf':
-                        docs = self.process_pdf(str(file_path))
-                    elif file_path.suffix.lower() in ['.docx', '.doc']:
-                        docs = self.process_docx(str(file_path))
-                    elif file_path.suffix.lower() in ['.txt', '.md']:
-                        docs = self.process_text_file(str(file_path))
-                    else:
-                        logger.info(f"Skipping unsupported file: {file_path}")
-                        continue
-                    
-                    all_documents.extend(docs)
-                    
-                except Exception as e:
-                    logger.error(f"Error processing file {file_path}: {e}")
-                    continue
+        if self.vector_store is None:
+            self.setup_collection()
+        manifest = IngestionManifest(self.manifest_path)
+        minhash = MinHashIndex()
+        if dedup:
+            minhash.load(self.minhash_path)
+        if manifest.entries and self.qdrant_client.count(self.collection_name).count == 0:
+            # The collection was wiped or recreated; the manifest no longer describes it
+            manifest.entries = {}
+            minhash.clear()
         
-        if all_documents:
-            self.add_documents(all_documents)
-            logger.info(f"Successfully loaded {len(all_documents)} document chunks")
-        else:
+        fingerprint = self.processor.fingerprint()
+        plan = manifest.plan(file_paths, fingerprint, str(directory), force=force)
+        new = [path for path in plan.ingest if path not in manifest.entries]
+        changed = [path for path in plan.ingest if path in manifest.entries]
+        unchanged = [path for path in plan.aliases if path not in plan.ingest]
+        logger.info(
+            f"Ingestion plan: {len(new)} new, {len(changed)} changed, {len(plan.removed)} removed, "
+            f"{len(unchanged)} unchanged, {len(plan.alias_of)} identical copies skipped"
+        )
+        
+        # Drop stale chunks first; a changed file may now have fewer chunks
+        self.delete_sources(plan.delete)
+        minhash.remove_sources(plan.delete)
+        for source in plan.ingest + plan.removed:
+            manifest.forget(source)
+        
+        pipeline = IngestionPipeline(
+            self,
+            batch_size=batch_size,
+            max_workers=max_workers,
+            source_aliases=plan.aliases,
+            dedup=minhash if dedup else None,
+        )
+        stats = pipeline.run(plan.ingest)
+        
+        for file_path in plan.ingest:
+            if file_path not in pipeline.failed_sources:
+                manifest.record(
+                    file_path, plan.hashes[file_path], fingerprint, pipeline.file_chunks.get(file_path, 0),
+                    aliases=plan.aliases[file_path],
+                    near_duplicate_of=sorted(pipeline.near_duplicate_of.get(file_path, ())),
+                )
+        for alias, canonical in plan.alias_of.items():
+            if canonical in manifest.entries:
+                manifest.record(alias, plan.hashes[alias], fingerprint, 0, alias_of=canonical)
+            else:
+                manifest.forget(alias)
+        manifest.save()
+        if dedup:
+            minhash.save(self.minhash_path)
+        if stats["upserted"]:
+            self.bump_collection_epoch()
+        if self.vector_backend == "flat" and (stats["upserted"] or plan.delete or not FlatIndex.exists(self.flat_index_path)):
+            self.export_flat_index()
+        # Built whatever the retrieval mode, so switching modes needs no re-ingestion
+        if stats["upserted"] or plan.delete or not BM25Index.exists(self.bm25_index_path):
+            self.export_bm25_index()
+        if self.context_pools and (stats["upserted"] or plan.delete):
+            self.build_context_pools([pool.topic for pool in self.context_pools.values()])
+        
+        stats.update(new=len(new), changed=len(changed), removed=len(plan.removed),
+                     unchanged=len(unchanged), identical_copies=len(plan.alias_of))
+        if stats["upserted"]:
+            logger.info(f"Successfully loaded {stats['upserted']} document chunks from {stats['files']} files")
+        elif plan.ingest:
             logger.warning("No documents were successfully processed")
+        else:
+            logger.info("All documents are up to date")
+        return stats
 
 # Global RAG system instance
 rag_system = None
@@ -317,7 +895,19 @@ def initialize_rag_system():
     global rag_system
     if rag_system is None:
         rag_system = NPTERAGSystem()
-        rag_system.setup_collection()
+        if rag_system.retrieval_mode != "dense" and not rag_system.open_bm25_index():
+            logger.warning("No current BM25 index (run upload_documents.py to build it); retrieval is dense-only")
+        if rag_system._lexical_only():
+            logger.info("Lexical retrieval: serving from the BM25 index without Qdrant or Ollama")
+        elif rag_system.vector_backend != "flat" or not rag_system.open_flat_index():
+            if rag_system.vector_backend == "flat":
+                logger.warning("No flat index yet (run upload_documents.py); searching Qdrant instead")
+            rag_system.setup_collection()
+        try:
+            rag_system.build_context_pools()
+        except Exception as e:
+            # Requests fall back to searching per call
+            logger.warning(f"Could not build context pools: {e}")
         logger.info("RAG system initialized")
     return rag_system
 
@@ -327,4 +917,16 @@ def get_rag_context(topic: str) -> str:
     if rag_system is None:
         return ""
     
-    return rag_system.get_context_for_mcq_generation(topic) 
\ No newline at end of file
+    return rag_system.get_context_for_mcq_generation(topic) 
+
+async def aget_rag_context(topic: str) -> str:
+    """Async twin of get_rag_context, for event-loop callers"""
+    if rag_system is None:
+        return ""
+    return await rag_system.aget_context_for_mcq_generation(topic)
+
+def get_retrieval_stats() -> Optional[Dict]:
+    """Retrieval cache hit rates and time saved, for /api/metrics"""
+    if rag_system is None:
+        return None
+    return rag_system.retrieval_cache.stats()
@@ -0,0 +1,127 @@
+"""
+In-memory LRU/TTL cache for retrieval
+Query embeddings and top-k results, invalidated when the collection epoch changes
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Hashable, List, Optional, Tuple
+
+from langchain.schema import Document
+
+from embedding_cache import normalize_for_cache
+
+
+class _LRU:
+    """OrderedDict with a size bound and a per-entry time to live"""
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.entries: "OrderedDict[Hashable, Tuple[float, object]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+
+    def get(self, key: Hashable):
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        stored_at, value = entry
+        if time.monotonic() - stored_at > self.ttl_seconds:
+            del self.entries[key]
+            self.expired += 1
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key: Hashable, value):
+        self.entries[key] = (time.monotonic(), value)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self.entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "expired": self.expired,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+class RetrievalCache:
+    """Bounded caches of query embeddings and top-k results for repeated queries
+
+    MCQ generation sends the same templated query per topic, so both the
+    Ollama embedding and the vector search repeat until the corpus
+    changes. Queries are keyed after NFC + whitespace normalization.
+    Results are also keyed on the topic filter and k, and carry the
+    collection epoch they were computed at; a result from an older epoch
+    is discarded on lookup. Embeddings depend only on the model, so they
+    expire by TTL and LRU alone. Each entry remembers how long it took
+    to compute, and every hit adds that to `saved_seconds`. Callers share
+    the cached Document lists, so treat them as read-only.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl_seconds: float = 3600.0):
+        self._embeddings = _LRU(max_entries, ttl_seconds)
+        self._results = _LRU(max_entries, ttl_seconds)
+        self._lock = threading.Lock()
+        self.invalidated = 0
+        self.saved_seconds = 0.0
+
+    def get_embedding(self, query: str) -> Optional[List[float]]:
+        with self._lock:
+            entry = self._embeddings.get(normalize_for_cache(query))
+            if entry is None:
+                return None
+            vector, seconds = entry
+            self.saved_seconds += seconds
+            return vector
+
+    def put_embedding(self, query: str, vector: List[float], seconds: float):
+        with self._lock:
+            self._embeddings.put(normalize_for_cache(query), (vector, seconds))
+
+    def get_results(self, query: str, topic: Optional[str], k: int, epoch: int) -> Optional[List[Document]]:
+        key = (normalize_for_cache(query), topic or "", k)
+        with self._lock:
+            entry = self._results.get(key)
+            if entry is None:
+                return None
+            stored_epoch, documents, seconds = entry
+            if stored_epoch != epoch:
+                # Computed before the last ingestion; count the lookup as a miss
+                del self._results.entries[key]
+                self._results.hits -= 1
+                self._results.misses += 1
+                self.invalidated += 1
+                return None
+            self.saved_seconds += seconds
+            return documents
+
+    def put_results(self, query: str, topic: Optional[str], k: int, epoch: int, documents: List[Document], seconds: float):
+        with self._lock:
+            self._results.put((normalize_for_cache(query), topic or "", k), (epoch, documents, seconds))
+
+    def clear(self):
+        with self._lock:
+            self._embeddings.entries.clear()
+            self._results.entries.clear()
+
+    def stats(self) -> Dict:
+        """Hit rates and the compute time the hits saved"""
+        with self._lock:
+            return {
+                "embeddings": self._embeddings.stats(),
+                "results": self._results.stats(),
+                "invalidated": self.invalidated,
+                "saved_seconds": round(self.saved_seconds, 3),
+            }
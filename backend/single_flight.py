@@ -0,0 +1,50 @@
+"""
+Single-flight request coalescing
+Concurrent callers with the same key share one in-flight call
+"""
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+
+class SingleFlight:
+    """Deduplicate concurrent async calls by key
+
+    The first caller for a key (the leader) starts the call; callers that
+    arrive while it is running await the same result. All callers receive
+    the same object, so treat results as read-only.
+    """
+
+    def __init__(self):
+        self._flights: Dict[str, asyncio.Future] = {}
+        self.leaders = 0
+        self.coalesced = 0
+
+    async def run(self, key: str, factory: Callable[[], Awaitable[Any]], timeout: Optional[float] = None) -> Any:
+        """Run factory() once per key at a time and share its result"""
+        future = self._flights.get(key)
+        if future is None:
+            self.leaders += 1
+            future = asyncio.ensure_future(factory())
+            self._flights[key] = future
+            future.add_done_callback(lambda f, key=key: self._finish(key, f))
+        else:
+            self.coalesced += 1
+        # Shield so one caller timing out does not cancel the call for everyone else
+        return await asyncio.wait_for(asyncio.shield(future), timeout)
+
+    def _finish(self, key: str, future: asyncio.Future):
+        """Forget a completed flight"""
+        if self._flights.get(key) is future:
+            del self._flights[key]
+        if not future.cancelled():
+            # Mark the exception retrieved even if every caller timed out
+            future.exception()
+
+    def stats(self) -> Dict:
+        """Coalescing counters"""
+        return {
+            "leaders": self.leaders,
+            "coalesced": self.coalesced,
+            "in_flight": len(self._flights),
+        }
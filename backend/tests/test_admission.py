@@ -0,0 +1,100 @@
+import asyncio
+
+import pytest
+
+from admission import AdmissionController, DeadlineExceeded, Overloaded
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+def test_limits_concurrency():
+    async def scenario():
+        controller = AdmissionController(max_concurrency=2, max_queue=8, deadline=None)
+        running, peak = 0, 0
+
+        async def call():
+            nonlocal running, peak
+            async with controller.slot():
+                running += 1
+                peak = max(peak, running)
+                await asyncio.sleep(0.01)
+                running -= 1
+
+        await asyncio.gather(*(call() for _ in range(6)))
+        return controller, peak
+
+    controller, peak = run(scenario())
+    assert peak == 2
+    assert controller.admitted == 6
+    assert controller.stats()["peak_queued"] == 4
+    assert (controller.in_flight, controller.queued) == (0, 0)
+
+
+def test_rejects_when_slots_and_queue_are_full():
+    async def scenario():
+        controller = AdmissionController(max_concurrency=1, max_queue=1, deadline=None)
+        release = asyncio.Event()
+
+        async def hold():
+            async with controller.slot():
+                await release.wait()
+
+        tasks = [asyncio.create_task(hold()) for _ in range(2)]
+        await asyncio.sleep(0)
+        with pytest.raises(Overloaded) as rejected:
+            async with controller.slot():
+                pass
+        release.set()
+        await asyncio.gather(*tasks)
+        return controller, rejected.value
+
+    controller, error = run(scenario())
+    assert controller.rejected_full == 1
+    assert error.status_code == 429 and error.retry_after >= 1
+
+
+def test_queued_request_times_out_at_its_deadline():
+    async def scenario():
+        controller = AdmissionController(max_concurrency=1, max_queue=4, deadline=0.02)
+        release = asyncio.Event()
+
+        async def hold():
+            async with controller.slot():
+                await release.wait()
+
+        holder = asyncio.create_task(hold())
+        await asyncio.sleep(0)
+        with pytest.raises(DeadlineExceeded) as late:
+            async with controller.slot():
+                pass
+        release.set()
+        await holder
+        return controller, late.value
+
+    controller, error = run(scenario())
+    assert error.status_code == 503
+    assert controller.rejected_deadline == 1
+    assert controller.queued == 0
+
+
+def test_slot_is_released_when_the_body_raises():
+    async def scenario():
+        controller = AdmissionController(max_concurrency=1, max_queue=0)
+        with pytest.raises(RuntimeError):
+            async with controller.slot():
+                raise RuntimeError("backend failed")
+        async with controller.slot():
+            pass
+        return controller
+
+    assert run(scenario()).admitted == 2
+
+
+def test_retry_after_scales_with_backlog():
+    controller = AdmissionController(max_concurrency=2)
+    controller._service_ewma = 4.0
+    assert controller.retry_after() == 4
+    controller.in_flight, controller.queued = 2, 4
+    assert controller.retry_after() == 12
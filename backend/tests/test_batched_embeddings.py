@@ -0,0 +1,66 @@
+import asyncio
+
+import pytest
+from langchain_core.embeddings import Embeddings
+
+from batched_embeddings import BatchedEmbeddings
+
+
+class DeadServer(Embeddings):
+    def __init__(self):
+        self.calls = []
+
+    def embed_documents(self, texts):
+        self.calls.append(len(texts))
+        raise ConnectionError("embedding server is down")
+
+    async def aembed_documents(self, texts):
+        return self.embed_documents(texts)
+
+    def embed_query(self, text):
+        raise ConnectionError("embedding server is down")
+
+
+class FlakyServer(Embeddings):
+    """Fails the first `failures` calls"""
+
+    def __init__(self, failures: int):
+        self.failures = failures
+
+    def embed_documents(self, texts):
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("overloaded")
+        return [[float(len(text))] for text in texts]
+
+    async def aembed_documents(self, texts):
+        return self.embed_documents(texts)
+
+    def embed_query(self, text):
+        return [float(len(text))]
+
+
+def batched(server, **kwargs):
+    return BatchedEmbeddings(server, batch_size=16, backoff_base=0.0, **kwargs)
+
+
+def test_split_retries_share_the_attempt_budget():
+    server = DeadServer()
+    with pytest.raises(ConnectionError):
+        batched(server, max_attempts=4).embed_documents([f"text {i}" for i in range(16)])
+    # 16 -> 8 -> 4 -> 2, then the budget is spent
+    assert server.calls == [16, 8, 4, 2]
+
+
+def test_async_split_retries_share_the_attempt_budget():
+    server = DeadServer()
+    with pytest.raises(ConnectionError):
+        asyncio.run(batched(server, max_attempts=4).aembed_documents([f"text {i}" for i in range(16)]))
+    assert server.calls == [16, 8, 4, 2]
+
+
+def test_split_retry_recovers_in_order():
+    texts = [("x" * i) for i in range(1, 17)]
+    embeddings = batched(FlakyServer(failures=1))
+    assert embeddings.embed_documents(texts) == [[float(i)] for i in range(1, 17)]
+    assert embeddings.stats()["retries"] == 1
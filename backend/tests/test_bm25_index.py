@@ -0,0 +1,60 @@
+import json
+
+import pytest
+
+import bm25_index
+from bm25_index import BM25Index, chunk_key, reciprocal_rank_fusion, tokenize
+
+PAYLOADS = [
+    {"page_content": "The Kleiger test assesses the distal tibiofibular syndesmosis", "metadata": {"source": "a.pdf", "chunk_id": 0, "topic": "Musculoskeletal system"}},
+    {"page_content": "FEV1 falls in obstructive lung disease such as COPD", "metadata": {"source": "b.pdf", "chunk_id": 0, "topic": "Cardiovascular and pulmonary systems"}},
+    {"page_content": "Gait training with a cane after knee replacement", "metadata": {"source": "a.pdf", "chunk_id": 1, "topic": "Musculoskeletal system"}},
+]
+
+
+def test_tokenize_folds_possessives_and_plurals():
+    assert tokenize("Kleiger's tests of the FEV1") == ["kleiger", "test", "fev1"]
+
+
+def test_search_finds_exact_terms_and_filters_topic(tmp_path):
+    index = BM25Index.build(str(tmp_path), PAYLOADS)
+    assert [doc.metadata["chunk_id"] for doc in index.search("Kleiger test")] == [0]
+    assert index.search("fev1", topic="Cardiovascular and pulmonary systems")[0].metadata["source"] == "b.pdf"
+    assert index.search("fev1", topic="Musculoskeletal system") == []
+    assert index.search("unknownword") == []
+
+
+def test_reopen_sees_the_same_index(tmp_path):
+    BM25Index.build(str(tmp_path), PAYLOADS)
+    assert BM25Index.exists(str(tmp_path))
+    assert len(BM25Index(str(tmp_path))) == len(PAYLOADS)
+
+
+def set_tokenizer_version(directory, version):
+    meta_path = directory / "meta.json"
+    meta = json.loads(meta_path.read_text())
+    meta["tokenizer"] = version
+    meta_path.write_text(json.dumps(meta))
+
+
+def test_index_from_another_tokenizer_is_not_opened(tmp_path):
+    BM25Index.build(str(tmp_path), PAYLOADS)
+    set_tokenizer_version(tmp_path, "0")
+    assert not BM25Index.exists(str(tmp_path))
+    with pytest.raises(ValueError):
+        BM25Index(str(tmp_path))
+
+
+def test_refresh_keeps_generation_when_new_one_has_another_tokenizer(tmp_path, monkeypatch):
+    index = BM25Index.build(str(tmp_path), PAYLOADS)
+    monkeypatch.setattr(bm25_index, "TOKENIZER_VERSION", "next")
+    BM25Index.build(str(tmp_path), PAYLOADS[:1])
+    monkeypatch.undo()
+    assert not index.refresh()
+    assert len(index) == len(PAYLOADS)
+
+
+def test_reciprocal_rank_fusion_rewards_agreement(tmp_path):
+    a, b, c = BM25Index.build(str(tmp_path), PAYLOADS).search("kleiger fev1 cane", k=3)
+    fused = reciprocal_rank_fusion([[c, a], [a, b]], k=2)
+    assert [chunk_key(doc) for doc in fused] == [chunk_key(a), chunk_key(c)]
@@ -0,0 +1,183 @@
+import numpy as np
+import pytest
+
+from dedup import MinHashIndex, group_identical_files
+from document_processor import DocumentProcessor
+from ingestion_manifest import IngestionManifest
+from ingestion_pipeline import IngestionPipeline, chunk_point_id
+
+TEXT = "The patient ambulates with a straight cane after total knee arthroplasty and reports pain on stairs"
+
+
+def words(seed: int, count: int = 60) -> str:
+    rng = np.random.RandomState(seed)
+    return " ".join(f"w{n}" for n in rng.randint(0, 5000, size=count))
+
+
+def test_group_identical_files_prefers_shallowest_path():
+    groups = group_identical_files({"docs/data/a.pdf": "h1", "docs/a.pdf": "h1", "docs/b.pdf": "h2"})
+    assert groups == {"docs/a.pdf": ["docs/data/a.pdf"], "docs/b.pdf": []}
+
+
+def test_find_near_duplicate_and_not_unrelated():
+    index = MinHashIndex()
+    index.add("p1", "a.txt", index.signature(TEXT))
+    assert index.find(index.signature(TEXT + " today")) == ("p1", "a.txt")
+    assert index.find(index.signature(words(1))) is None
+
+
+def test_find_skips_excluded_source():
+    index = MinHashIndex()
+    index.add("p1", "a.txt", index.signature(TEXT))
+    assert index.find(index.signature(TEXT), exclude_source="a.txt") is None
+    index.add("p2", "b.txt", index.signature(TEXT))
+    assert index.find(index.signature(TEXT), exclude_source="a.txt") == ("p2", "b.txt")
+
+
+def test_remove_sources():
+    index = MinHashIndex()
+    index.add("p1", "a.txt", index.signature(TEXT))
+    index.add("p2", "b.txt", index.signature(words(2)))
+    index.remove_sources(["a.txt"])
+    assert len(index) == 1
+    assert index.find(index.signature(TEXT)) is None
+    assert index.find(index.signature(words(2))) == ("p2", "b.txt")
+
+
+def test_save_load_round_trip(tmp_path):
+    path = str(tmp_path / "minhash.npz")
+    index = MinHashIndex()
+    index.add("p1", "a.txt", index.signature(TEXT))
+    index.save(path)
+    index.add("p2", "b.txt", index.signature(words(3)))  # after the save; not persisted
+
+    loaded = MinHashIndex()
+    loaded.load(path)
+    assert loaded.ids == ["p1"] and loaded.sources == ["a.txt"]
+    assert loaded.find(loaded.signature(TEXT)) == ("p1", "a.txt")
+
+
+def test_load_ignores_other_settings(tmp_path):
+    path = str(tmp_path / "minhash.npz")
+    index = MinHashIndex(seed=7)
+    index.add("p1", "a.txt", index.signature(TEXT))
+    index.save(path)
+
+    other = MinHashIndex()
+    other.load(path)
+    assert len(other) == 0
+
+
+class FakeQdrant:
+    """Just enough of QdrantClient for the pipeline; fails the upserts listed in `fail_batches`"""
+
+    def __init__(self):
+        self.points = {}
+        self.upserts = 0
+        self.fail_batches = set()
+
+    def upsert(self, collection_name, points, wait):
+        self.upserts += 1
+        if self.upserts in self.fail_batches:
+            raise RuntimeError("upsert failed")
+        self.points.update({point.id: point for point in points})
+
+    def retrieve(self, collection_name, ids, with_payload):
+        return [point for point_id, point in self.points.items() if point_id in ids]
+
+    def set_payload(self, collection_name, payload, points, key):
+        pass
+
+
+class FakeEmbeddings:
+    def embed_documents(self, texts):
+        return [[float(len(text)), 1.0] for text in texts]
+
+
+class FakeVectorStore:
+    content_payload_key = "page_content"
+    metadata_payload_key = "metadata"
+
+
+class FakeRAG:
+    collection_name = "test"
+
+    def __init__(self):
+        self.processor = DocumentProcessor(chunk_size=200, chunk_overlap=20)
+        self.qdrant_client = FakeQdrant()
+        self.embeddings = FakeEmbeddings()
+        self.vector_store = FakeVectorStore()
+
+
+def ingest(rag, directory, state_dir):
+    """The manifest and MinHash bookkeeping of NPTERAGSystem.load_documents_from_directory"""
+    manifest = IngestionManifest(str(state_dir / "manifest.json"))
+    minhash = MinHashIndex()
+    minhash.load(str(state_dir / "minhash.npz"))
+    file_paths = sorted(str(path) for path in directory.iterdir())
+    fingerprint = rag.processor.fingerprint()
+    plan = manifest.plan(file_paths, fingerprint, str(directory))
+    minhash.remove_sources(plan.delete)
+    for source in plan.ingest + plan.removed:
+        manifest.forget(source)
+
+    pipeline = IngestionPipeline(rag, batch_size=20, max_workers=1, source_aliases=plan.aliases, dedup=minhash)
+    stats = pipeline.run(plan.ingest)
+    for file_path in plan.ingest:
+        if file_path not in pipeline.failed_sources:
+            manifest.record(file_path, plan.hashes[file_path], fingerprint, pipeline.file_chunks.get(file_path, 0))
+    manifest.save()
+    minhash.save(str(state_dir / "minhash.npz"))
+    return plan, pipeline, stats
+
+
+@pytest.fixture
+def corpus(tmp_path):
+    directory = tmp_path / "documents"
+    directory.mkdir()
+    # Distinct paragraphs, so no chunk is a near-duplicate of another
+    (directory / "notes.txt").write_text("\n\n".join(words(seed) + "." for seed in range(80)))
+    state_dir = tmp_path / "state"
+    state_dir.mkdir()
+    return directory, state_dir
+
+
+def test_rerun_after_failed_upsert_restores_every_point(corpus):
+    directory, state_dir = corpus
+    rag = FakeRAG()
+    expected = {chunk_point_id(doc) for doc in rag.processor.iter_file(str(directory / "notes.txt"))}
+    assert len(expected) > 40
+
+    rag.qdrant_client.fail_batches = {2}
+    _, pipeline, stats = ingest(rag, directory, state_dir)
+    assert pipeline.failed_sources == {str(directory / "notes.txt")}
+    assert stats["upserted"] == len(expected) - 20
+
+    rag.qdrant_client.fail_batches = set()
+    plan, pipeline, stats = ingest(rag, directory, state_dir)
+    assert plan.ingest == [str(directory / "notes.txt")]
+    assert stats["near_duplicates"] == 0
+    assert not pipeline.failed_sources
+    assert set(rag.qdrant_client.points) == expected
+
+    plan, _, _ = ingest(rag, directory, state_dir)
+    assert plan.ingest == []
+
+
+def test_copy_dropped_for_a_failed_chunk_is_retried(corpus):
+    directory, state_dir = corpus
+    text = (directory / "notes.txt").read_text()
+    # Not byte-identical, but its chunks are dropped in favour of notes.txt's
+    (directory / "notes_copy.txt").write_text(text + "\n\nOne more closing paragraph.")
+    rag = FakeRAG()
+
+    rag.qdrant_client.fail_batches = {1}
+    _, pipeline, _ = ingest(rag, directory, state_dir)
+    assert pipeline.failed_sources == {str(directory / "notes.txt"), str(directory / "notes_copy.txt")}
+
+    rag.qdrant_client.fail_batches = set()
+    plan, pipeline, _ = ingest(rag, directory, state_dir)
+    assert sorted(plan.ingest) == sorted(str(path) for path in directory.iterdir())
+    assert not pipeline.failed_sources
+    expected = {chunk_point_id(doc) for doc in rag.processor.iter_file(str(directory / "notes.txt"))}
+    assert expected <= set(rag.qdrant_client.points)
@@ -0,0 +1,49 @@
+import numpy as np
+
+from document_processor import DocumentProcessor
+
+
+def write_pages(path, pages: int = 6, paragraphs: int = 12, seed: int = 0):
+    """Text file of form-feed separated pages of sentence paragraphs"""
+    rng = np.random.RandomState(seed)
+
+    def sentence():
+        return " ".join(f"w{n}" for n in rng.randint(0, 1000, size=rng.randint(4, 25))).capitalize() + "."
+
+    path.write_text("\f".join(
+        "\n\n".join(" ".join(sentence() for _ in range(rng.randint(1, 6))) for _ in range(paragraphs))
+        for _ in range(pages)
+    ))
+
+
+def whole_document_chunks(processor, path):
+    units = (processor._normalize(text) for _, text in processor.iter_text_paragraphs(str(path)))
+    return processor.chunker.split_text(" ".join(unit for unit in units if unit))
+
+
+def test_sentence_chunker_streams_the_whole_document_split(tmp_path):
+    path = tmp_path / "notes.txt"
+    write_pages(path)
+    processor = DocumentProcessor(chunk_size=200, chunk_overlap=40)
+    streamed = list(processor.iter_file(str(path)))
+    # Long enough that the window restarts several times
+    assert len(streamed) > 3 * 8
+    assert [doc.page_content for doc in streamed] == whole_document_chunks(processor, path)
+
+
+def test_chunks_carry_ids_pages_and_topic(tmp_path):
+    path = tmp_path / "cardio_notes.txt"
+    write_pages(path, pages=3)
+    docs = list(DocumentProcessor(chunk_size=200, chunk_overlap=40).iter_file(str(path)))
+    assert [doc.metadata["chunk_id"] for doc in docs] == list(range(len(docs)))
+    pages = [doc.metadata["page"] for doc in docs]
+    assert pages == sorted(pages) and pages[0] == 1 and pages[-1] == 3
+    assert {doc.metadata["topic"] for doc in docs} == {"Cardiovascular and pulmonary systems"}
+
+
+def test_recursive_chunker_loses_no_text(tmp_path):
+    path = tmp_path / "notes.txt"
+    write_pages(path)
+    processor = DocumentProcessor(chunk_size=200, chunk_overlap=40, chunker="recursive")
+    streamed_words = set(" ".join(doc.page_content for doc in processor.iter_file(str(path))).split())
+    assert streamed_words == set(" ".join(whole_document_chunks(processor, path)).split())
@@ -0,0 +1,56 @@
+from langchain_core.embeddings import Embeddings
+
+from embedding_cache import CachedEmbeddings
+
+
+class CountingEmbeddings(Embeddings):
+    model = "fake"
+
+    def __init__(self):
+        self.embedded = []
+
+    def embed_documents(self, texts):
+        self.embedded.extend(texts)
+        return [[float(len(text)), 1.0, 2.0, 3.0] for text in texts]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+def stored_bytes(cache):
+    return cache._conn.execute("SELECT COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings").fetchone()[0]
+
+
+def test_hits_skip_the_model_and_normalize_whitespace(tmp_path):
+    model = CountingEmbeddings()
+    cache = CachedEmbeddings(model, str(tmp_path / "cache.sqlite"))
+    first = cache.embed_documents(["knee  flexion", "gait"])
+    assert cache.embed_documents(["knee flexion", "gait"]) == first
+    assert model.embedded == ["knee  flexion", "gait"]
+    assert (cache.hits, cache.misses) == (2, 2)
+
+
+def test_restoring_existing_keys_does_not_grow_the_size(tmp_path):
+    cache = CachedEmbeddings(CountingEmbeddings(), str(tmp_path / "cache.sqlite"))
+    cache.embed_documents(["a", "b"])
+    # e.g. two threads that both missed the same texts
+    cache._store({cache._key("a"): [1.0, 1.0, 2.0, 3.0], cache._key("b"): [1.0, 1.0, 2.0, 3.0]})
+    assert cache._total_bytes == stored_bytes(cache) == 2 * 4 * 4
+
+
+def test_eviction_keeps_recently_used_entries(tmp_path):
+    # Three 16-byte vectors fit; a fourth evicts down to 90% of the limit, i.e. one entry
+    cache = CachedEmbeddings(CountingEmbeddings(), str(tmp_path / "cache.sqlite"), max_bytes=56)
+    cache.embed_documents(["a", "b", "c"])
+    cache.embed_documents(["b", "c"])  # refreshes b and c
+    cache.embed_documents(["c"])
+    cache.embed_documents(["d"])
+    assert cache.evicted == 1
+    assert cache._total_bytes == stored_bytes(cache)
+    assert set(cache._lookup([cache._key(text) for text in "abcd"])) == {cache._key(text) for text in "bcd"}
+
+
+def test_size_survives_reopen(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    CachedEmbeddings(CountingEmbeddings(), path).embed_documents(["a", "b"])
+    assert CachedEmbeddings(CountingEmbeddings(), path)._total_bytes == 2 * 4 * 4
@@ -0,0 +1,53 @@
+import json
+
+from incremental_json import IncrementalJSONParser
+
+MCQ = {
+    "question": "Which test assesses the \"syndesmosis\", {not} [a] brace?",
+    "choices": {"A": "Kleiger", "B": "Thompson"},
+    "correct": "A",
+    "explanations": ["Kleiger: external rotation stress", "Thompson: Achilles"],
+    "difficulty": 3,
+    "reviewed": True,
+}
+
+
+def feed_in_pieces(text, size):
+    parser = IncrementalJSONParser()
+    fields = []
+    for start in range(0, len(text), size):
+        fields.extend(parser.feed(text[start:start + size]))
+    return parser, fields
+
+
+def test_every_split_yields_each_field_once_in_order():
+    text = json.dumps(MCQ, indent=2)
+    for size in (1, 2, 3, 7, len(text)):
+        parser, fields = feed_in_pieces(text, size)
+        assert fields == list(MCQ.items()), size
+        assert parser.done
+        assert parser.text == text
+
+
+def test_field_is_emitted_as_soon_as_it_closes():
+    parser = IncrementalJSONParser()
+    assert parser.feed('{"question": "Which') == []
+    assert parser.feed(' test?", "choices": {"A": ') == [("question", "Which test?")]
+    assert parser.feed('"x"}') == [("choices", {"A": "x"})]
+    assert not parser.done
+
+
+def test_trailing_scalar_is_emitted_at_the_closing_brace():
+    parser, fields = feed_in_pieces('{"a": 1, "b": null}', 1)
+    assert fields == [("a", 1), ("b", None)]
+    assert parser.done
+
+
+def test_text_after_the_object_is_ignored():
+    parser, fields = feed_in_pieces('```json\n{"a": 1}\n``` done', 4)
+    assert fields == [("a", 1)]
+
+
+def test_malformed_value_is_skipped():
+    _, fields = feed_in_pieces('{"a": tru, "b": "ok"}', 3)
+    assert fields == [("b", "ok")]
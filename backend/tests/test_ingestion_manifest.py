@@ -0,0 +1,103 @@
+import hashlib
+
+import pytest
+
+from ingestion_manifest import IngestionManifest, file_content_hash
+
+FINGERPRINT = "f1"
+
+
+@pytest.fixture
+def corpus(tmp_path):
+    directory = tmp_path / "documents"
+    (directory / "data").mkdir(parents=True)
+    for name, text in {"a.txt": "alpha", "b.txt": "beta", "c.txt": "gamma"}.items():
+        (directory / name).write_text(text)
+    return directory
+
+
+def paths(directory):
+    return sorted(str(path) for path in directory.rglob("*") if path.is_file())
+
+
+def record_all(manifest, plan, near_duplicate_of=None):
+    """What an ingestion run that succeeded for every file records"""
+    for path in plan.ingest:
+        manifest.record(path, plan.hashes[path], FINGERPRINT, 1, aliases=plan.aliases[path],
+                        near_duplicate_of=(near_duplicate_of or {}).get(path, []))
+    for alias, canonical in plan.alias_of.items():
+        manifest.record(alias, plan.hashes[alias], FINGERPRINT, 0, alias_of=canonical)
+
+
+def test_first_run_ingests_everything(tmp_path, corpus):
+    plan = IngestionManifest(str(tmp_path / "m.json")).plan(paths(corpus), FINGERPRINT, str(corpus))
+    assert plan.ingest == paths(corpus)
+    assert plan.delete == [] and plan.removed == []
+
+
+def test_unchanged_changed_and_removed_files(tmp_path, corpus):
+    manifest = IngestionManifest(str(tmp_path / "m.json"))
+    record_all(manifest, manifest.plan(paths(corpus), FINGERPRINT, str(corpus)))
+    manifest.save()
+
+    (corpus / "a.txt").write_text("alpha, revised")
+    (corpus / "c.txt").unlink()
+    plan = IngestionManifest(str(tmp_path / "m.json")).plan(paths(corpus), FINGERPRINT, str(corpus))
+    a, c = str(corpus / "a.txt"), str(corpus / "c.txt")
+    assert plan.ingest == [a]
+    assert plan.removed == [c]
+    assert sorted(plan.delete) == [a, c]
+
+
+def test_new_fingerprint_or_force_reingests(tmp_path, corpus):
+    manifest = IngestionManifest(str(tmp_path / "m.json"))
+    record_all(manifest, manifest.plan(paths(corpus), FINGERPRINT, str(corpus)))
+    assert manifest.plan(paths(corpus), FINGERPRINT, str(corpus)).ingest == []
+    assert manifest.plan(paths(corpus), "f2", str(corpus)).ingest == paths(corpus)
+    assert manifest.plan(paths(corpus), FINGERPRINT, str(corpus), force=True).ingest == paths(corpus)
+
+
+def test_identical_copy_is_an_alias_of_the_shallowest_path(tmp_path, corpus):
+    (corpus / "data" / "a.txt").write_text("alpha")
+    plan = IngestionManifest(str(tmp_path / "m.json")).plan(paths(corpus), FINGERPRINT, str(corpus))
+    a, copy = str(corpus / "a.txt"), str(corpus / "data" / "a.txt")
+    assert copy not in plan.ingest
+    assert plan.alias_of == {copy: a}
+    assert plan.aliases[a] == [copy]
+
+
+def test_new_copy_reingests_its_canonical_file(tmp_path, corpus):
+    manifest = IngestionManifest(str(tmp_path / "m.json"))
+    record_all(manifest, manifest.plan(paths(corpus), FINGERPRINT, str(corpus)))
+    (corpus / "data" / "a.txt").write_text("alpha")
+    plan = manifest.plan(paths(corpus), FINGERPRINT, str(corpus))
+    assert plan.ingest == [str(corpus / "a.txt")]
+
+
+def test_removed_only_covers_the_scope(tmp_path, corpus):
+    manifest = IngestionManifest(str(tmp_path / "m.json"))
+    manifest.record(str(tmp_path / "elsewhere" / "x.txt"), "h", FINGERPRINT, 1)
+    assert manifest.plan(paths(corpus), FINGERPRINT, str(corpus)).removed == []
+
+
+def test_dropping_kept_chunks_reingests_files_that_pointed_at_them(tmp_path, corpus):
+    manifest = IngestionManifest(str(tmp_path / "m.json"))
+    a, b = str(corpus / "a.txt"), str(corpus / "b.txt")
+    # b's near-duplicate chunks were dropped in favour of a's
+    record_all(manifest, manifest.plan(paths(corpus), FINGERPRINT, str(corpus)), near_duplicate_of={b: [a]})
+    (corpus / "a.txt").write_text("alpha, revised")
+    plan = manifest.plan(paths(corpus), FINGERPRINT, str(corpus))
+    assert sorted(plan.ingest) == [a, b]
+    assert sorted(plan.delete) == [a, b]
+
+
+def test_unreadable_manifest_starts_empty(tmp_path):
+    path = tmp_path / "m.json"
+    path.write_text("{not json")
+    assert IngestionManifest(str(path)).entries == {}
+
+
+def test_content_hash_reads_in_blocks(tmp_path):
+    path = tmp_path / "big.bin"
+    path.write_bytes(b"x" * ((1 << 20) + 5))
+    assert file_content_hash(str(path)) == hashlib.sha256(path.read_bytes()).hexdigest()
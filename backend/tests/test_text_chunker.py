@@ -0,0 +1,67 @@
+import numpy as np
+import pytest
+
+from document_processor import DocumentProcessor
+from text_chunker import SentenceChunker, normalize_text
+
+
+def prose(sentences: int = 80, seed: int = 0) -> str:
+    rng = np.random.RandomState(seed)
+    return " ".join(
+        " ".join(f"w{n}" for n in rng.randint(0, 1000, size=rng.randint(3, 30))).capitalize() + "."
+        for _ in range(sentences)
+    )
+
+
+def test_normalize_matches_clean_text_up_to_whitespace():
+    clean = DocumentProcessor()._clean_text
+    for text in ("Knee ROM: 0–120°, 4/5 strength!", "  tabs\tand\nnewlines  ", "(FEV1) ≥ 80% — normal; ok?"):
+        assert normalize_text(text) == " ".join(clean(text).split())
+
+
+@pytest.mark.parametrize("chunk_size,chunk_overlap", [(200, 40), (800, 100), (120, 0)])
+def test_chunks_respect_size_and_cover_the_text(chunk_size, chunk_overlap):
+    text = prose()
+    chunks = SentenceChunker(chunk_size, chunk_overlap).split_text(text)
+    assert all(len(chunk) <= chunk_size for chunk in chunks)
+    assert chunks[0] == text[:len(chunks[0])]
+    assert text.endswith(chunks[-1])
+    # Consecutive chunks overlap or touch; nothing between them is skipped
+    position = 0
+    for chunk in chunks:
+        start = text.find(chunk, max(0, position - chunk_size))
+        assert 0 <= start <= position + 1
+        position = start + len(chunk)
+    assert position == len(text)
+
+
+def test_cuts_at_sentence_ends():
+    chunks = SentenceChunker(200, 40).split_text(prose())
+    assert all(chunk.endswith(".") for chunk in chunks)
+
+
+def test_overlap_is_whole_sentences_within_the_limit():
+    text = prose(sentences=200, seed=1)
+    chunks = SentenceChunker(200, 60).split_text(text)
+    previous_end, overlapped = len(chunks[0]), 0
+    for chunk in chunks[1:]:
+        start = text.find(chunk, previous_end - 62)
+        overlap = previous_end - start
+        assert -1 <= overlap <= 60
+        if overlap > 0:
+            overlapped += 1
+            assert text[start - 2:start] == ". "
+        previous_end = start + len(chunk)
+    assert overlapped
+
+
+def test_sentence_longer_than_chunk_is_cut_at_spaces():
+    text = " ".join(f"word{i}" for i in range(100)) + "."
+    chunks = SentenceChunker(100, 20).split_text(text)
+    assert all(len(chunk) <= 100 for chunk in chunks)
+    assert {word for chunk in chunks for word in chunk.split()} == set(text.split())
+
+
+def test_overlap_must_be_smaller_than_chunk():
+    with pytest.raises(ValueError):
+        SentenceChunker(100, 100)
@@ -5,11 +5,23 @@ Utility script to upload and process documents for the RAG system
 
 import os
 import sys
+import argparse
 from pathlib import Path
 from rag_system import initialize_rag_system
 
 def main():
     """Main function to upload documents"""
+    parser = argparse.ArgumentParser(description="Upload and process documents for the RAG system")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Extraction processes (default: CPU count, 1 = single process)")
+    parser.add_argument("--batch-size", type=int, default=128,
+                        help="Chunks embedded and upserted per batch")
+    parser.add_argument("--force", action="store_true",
+                        help="Re-ingest every file, ignoring the ingestion manifest")
+    parser.add_argument("--no-dedup", action="store_true",
+                        help="Keep near-duplicate chunks (identical files are still indexed once)")
+    args = parser.parse_args()
+    
     print("📚 NPTE RAG Document Upload Utility")
     print("=" * 50)
     
@@ -44,7 +56,13 @@ def main():
     # Process documents
     print("\n🔄 Processing documents...")
     try:
-        rag_system.load_documents_from_directory(str(documents_path))
+        rag_system.load_documents_from_directory(
+            str(documents_path),
+            max_workers=args.workers,
+            batch_size=args.batch_size,
+            force=args.force,
+            dedup=not args.no_dedup,
+        )
         print("✅ Documents processed successfully!")
         print("\n🎯 Your RAG system is now ready to generate MCQs with your materials!")
         
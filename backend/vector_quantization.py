@@ -0,0 +1,61 @@
+"""
+Quantized vector storage settings for the NPTE RAG collection
+Maps a mode name to Qdrant's quantization config and the matching search params
+"""
+
+from typing import Optional
+
+from qdrant_client.models import (
+    BinaryQuantization,
+    BinaryQuantizationConfig,
+    QuantizationSearchParams,
+    ScalarQuantization,
+    ScalarQuantizationConfig,
+    ScalarType,
+    SearchParams,
+)
+
+# none: float32 only; int8: 4x smaller, ~lossless after rescoring;
+# binary: 32x smaller, needs more oversampling
+QUANTIZATION_MODES = ("none", "int8", "binary")
+
+
+def quantization_config(mode: str):
+    """Qdrant quantization config for `mode`, or None for plain float32
+
+    Quantized vectors are always kept in RAM; with on-disk originals only
+    the rescoring step reads full-precision vectors from disk.
+    """
+    mode = (mode or "none").lower()
+    if mode not in QUANTIZATION_MODES:
+        raise ValueError(f"Unknown quantization {mode!r}; choose from {QUANTIZATION_MODES}")
+    if mode == "int8":
+        return ScalarQuantization(scalar=ScalarQuantizationConfig(type=ScalarType.INT8, quantile=0.99, always_ram=True))
+    if mode == "binary":
+        return BinaryQuantization(binary=BinaryQuantizationConfig(always_ram=True))
+    return None
+
+
+def quantization_mode(config) -> str:
+    """Mode name of a collection's current quantization config"""
+    if isinstance(config, ScalarQuantization):
+        return "int8"
+    if isinstance(config, BinaryQuantization):
+        return "binary"
+    return "none"
+
+
+def quantization_search_params(mode: str, oversampling: float = 4.0) -> Optional[SearchParams]:
+    """Search over quantized vectors for k * oversampling candidates, then rescore them in float32"""
+    if quantization_config(mode) is None:
+        return None
+    return SearchParams(quantization=QuantizationSearchParams(ignore=False, rescore=True, oversampling=oversampling))
+
+
+def bytes_per_vector(mode: str, dimension: int) -> int:
+    """RAM used per vector by the quantized copy (float32 for mode none)"""
+    if mode == "int8":
+        return dimension + 4  # one byte per dimension plus a per-vector offset
+    if mode == "binary":
+        return (dimension + 7) // 8
+    return dimension * 4
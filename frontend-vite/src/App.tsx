@@ -1,6 +1,7 @@
 import React, { useState } from 'react';
 import './App.css';
 import TopicInput from './TopicInput';
+import { SESSION_ID } from './session';
 
 interface MCQ {
   question: string;
@@ -86,7 +87,7 @@ const App: React.FC = () => {
       const response = await fetch('http://localhost:8000/api/ask', {
         method: 'POST',
         headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify({ prompt: currentTopic }),
+        body: JSON.stringify({ prompt: currentTopic, session_id: SESSION_ID }),
       });
       
       if (response.ok) {
@@ -1,4 +1,5 @@
 import React, { useState } from 'react';
+import { SESSION_ID } from './session';
 
 interface MCQ {
   question: string;
@@ -45,7 +46,7 @@ const TopicInput: React.FC<TopicInputProps> = ({ onQuestionReceived, onTopicSele
       const response = await fetch('http://localhost:8000/api/ask', {
         method: 'POST',
         headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify({ prompt: topic }),
+        body: JSON.stringify({ prompt: topic, session_id: SESSION_ID }),
       });
       
       if (response.ok) {
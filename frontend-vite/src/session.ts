@@ -0,0 +1,2 @@
+// One id per browser tab, so the backend never serves the same question twice in a session
+export const SESSION_ID: string = crypto.randomUUID();